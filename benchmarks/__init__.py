@@ -0,0 +1,3 @@
+"""
+Benchmarks offline del pipeline de ingesta (sin Drive ni OpenAI reales)
+"""
@@ -0,0 +1,224 @@
+"""
+Dobles locales de OpenAI y Google Drive para benchmarks
+
+Reproducen la interfaz que usa el pipeline (chat.completions.create,
+list_modified_since, download_file...) con latencia configurable e
+inyección de errores 429, sin red.
+"""
+import hashlib
+import json
+import random
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+import openai
+
+from benchmarks.synthetic_invoices import PROVEEDORES, SyntheticInvoice
+
+
+class LatencyModel:
+    """Latencia en ms alrededor de una media (uniforme ±jitter), reproducible"""
+
+    def __init__(self, mean_ms: float, jitter: float = 0.5, seed: int = 0):
+        self.mean_ms = mean_ms
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self) -> float:
+        """Dormir la latencia simulada y devolverla en segundos"""
+        with self._lock:
+            factor = self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        seconds = max(self.mean_ms * factor, 0) / 1000
+        if seconds:
+            time.sleep(seconds)
+        return seconds
+
+
+class _FakeRawResponse:
+    """Respuesta de with_raw_response: cabeceras + parse()"""
+
+    def __init__(self, parsed, headers: Dict[str, str]):
+        self._parsed = parsed
+        self.headers = headers
+
+    def parse(self):
+        return self._parsed
+
+
+class _FakeCompletions:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self._client = client
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def create(self, **kwargs):
+        return self._client._complete(kwargs)
+
+    def _create_raw(self, **kwargs):
+        return _FakeRawResponse(self._client._complete(kwargs), self._client.ratelimit_headers())
+
+
+class FakeOpenAIClient:
+    """
+    Sustituto de openai.OpenAI para InvoiceExtractor.client
+
+    La respuesta es determinista por imagen (se deriva del hash del base64),
+    así cada factura sintética produce datos distintos y estables entre runs.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 800,
+        rate_limit_ratio: float = 0.0,
+        low_confidence_ratio: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency = LatencyModel(latency_ms, seed=seed)
+        self.rate_limit_ratio = rate_limit_ratio
+        self.low_confidence_ratio = low_confidence_ratio
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    def ratelimit_headers(self) -> Dict[str, str]:
+        """Cabeceras x-ratelimit simuladas (cuota holgada)"""
+        return {
+            'x-ratelimit-limit-requests': '5000',
+            'x-ratelimit-remaining-requests': '4999',
+            'x-ratelimit-limit-tokens': '2000000',
+            'x-ratelimit-remaining-tokens': '1998000',
+        }
+
+    def _complete(self, kwargs: dict):
+        with self._lock:
+            self.calls += 1
+            inject_429 = self._rng.random() < self.rate_limit_ratio
+            low_confidence = self._rng.random() < self.low_confidence_ratio
+        self.latency.sleep()
+
+        if inject_429:
+            with self._lock:
+                self.rate_limited += 1
+            request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+            raise openai.RateLimitError(
+                "Rate limit reached (simulado)",
+                response=httpx.Response(429, request=request, headers={**self.ratelimit_headers(), 'retry-after': '1'}),
+                body=None
+            )
+
+        image_url = kwargs['messages'][0]['content'][1]['image_url']['url']
+        digest = hashlib.sha1(image_url.encode('ascii')).digest()
+        proveedor, nif = PROVEEDORES[digest[0] % len(PROVEEDORES)]
+        base = round(20 + int.from_bytes(digest[1:4], 'big') % 300000 / 100, 2)
+        iva = (21.0, 10.0, 4.0)[digest[4] % 3]
+        impuestos = round(base * iva / 100, 2)
+        content = json.dumps({
+            'nombre_proveedor': proveedor,
+            'proveedor_nif': nif,
+            'nombre_cliente': 'MANTUA EAGLE SL',
+            'importe_total': round(base + impuestos, 2),
+            'base_imponible': base,
+            'impuestos_total': impuestos,
+            'iva_porcentaje': iva,
+            'fecha_emision': f"2025-{1 + digest[5] % 12:02d}-{1 + digest[6] % 28:02d}",
+            'confianza': 'baja' if low_confidence else 'alta',
+        })
+
+        return SimpleNamespace(
+            id=f"chatcmpl-fake-{digest.hex()[:12]}",
+            model='fake-vision',
+            choices=[SimpleNamespace(finish_reason='stop', message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=1100, completion_tokens=120, total_tokens=1220),
+        )
+
+
+class FakeDriveClient:
+    """
+    Sustituto de DriveIncrementalClient / DriveClient sobre un directorio local
+
+    Sirve las facturas sintéticas como archivos de una carpeta de Drive,
+    paginadas según page_size, con latencia de descarga configurable.
+    """
+
+    def __init__(
+        self,
+        invoices: List[SyntheticInvoice],
+        id_prefix: str,
+        latency_ms: float = 50,
+        page_size: int = 100,
+        seed: int = 0
+    ):
+        self.latency = LatencyModel(latency_ms, seed=seed + 2)
+        self.page_size = page_size
+        modified = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+        self._files: Dict[str, dict] = {}
+        self._paths: Dict[str, str] = {}
+        for idx, invoice in enumerate(invoices, 1):
+            file_id = f"{id_prefix}{idx:06d}"
+            self._paths[file_id] = invoice.path
+            self._files[file_id] = {
+                'id': file_id,
+                'name': invoice.file_name,
+                'mimeType': 'application/pdf',
+                'modifiedTime': modified,
+                'size': str(Path(invoice.path).stat().st_size),
+                'md5Checksum': hashlib.md5(Path(invoice.path).read_bytes()).hexdigest(),
+                'parents': ['benchmark'],
+            }
+        self.download_seconds: List[float] = []
+        self.continuation: Optional[dict] = None
+
+    def files(self) -> List[dict]:
+        """Metadatos de todos los archivos (copias)"""
+        return [dict(f) for f in self._files.values()]
+
+    def validate_folder_access(self, folder_id: str) -> bool:
+        return True
+
+    def list_modified_since(
+        self,
+        folder_id: str,
+        since_time: Optional[datetime] = None,
+        max_pages: Optional[int] = None,
+        continuation: Optional[dict] = None
+    ) -> Iterator[List[Dict]]:
+        files = self.files()
+        first = continuation['pages_fetched'] * self.page_size if continuation else 0
+        self.continuation = None
+        for page_num, start in enumerate(range(first, len(files), self.page_size), 1):
+            if max_pages and page_num > max_pages:
+                break
+            pages_fetched = start // self.page_size + 1
+            self.continuation = (
+                {'page_token': str(pages_fetched), 'pages_fetched': pages_fetched}
+                if start + self.page_size < len(files) else None
+            )
+            yield files[start:start + self.page_size]
+
+    def get_file_count_since(self, folder_id: str, since_time: Optional[datetime] = None) -> int:
+        return len(self._files)
+
+    def get_file_by_id(self, file_id: str) -> Optional[dict]:
+        metadata = self._files.get(file_id)
+        return dict(metadata) if metadata else None
+
+    def get_files_by_ids(self, file_ids: List[str]) -> Dict[str, dict]:
+        return {file_id: dict(self._files[file_id]) for file_id in file_ids if file_id in self._files}
+
+    def download_file(self, file_id: str, dest_path: str, file_size: int = None) -> bool:
+        source = self._paths.get(file_id)
+        if not source:
+            return False
+        start = time.perf_counter()
+        self.latency.sleep()
+        shutil.copyfile(source, dest_path)
+        self.download_seconds.append(time.perf_counter() - start)
+        return True
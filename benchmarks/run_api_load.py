@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API (mezcla de peticiones del dashboard)
+
+Lanza N usuarios virtuales que repiten los escenarios del frontend con
+sesión autenticada: carga del dashboard de un mes (las 6 peticiones en
+paralelo de useInvoiceData), paginación de facturas fallidas, listado y
+autocompletado de proveedores, rentabilidad/costos de personal y estado
+de carga. Informa p50/p95/p99 y tasa de error por endpoint.
+
+La cookie de sesión se firma con SESSION_SECRET_KEY (la misma que usa la
+API), así no hace falta pasar por el login de Google.
+
+Uso:
+    # Contra una API arrancada (uvicorn src.api.main:app) sobre el dataset de seed_api_dataset
+    SESSION_SECRET_KEY=... python -m benchmarks.run_api_load --base-url http://127.0.0.1:8000 \\
+        --users 20 --duration 120 --output-json benchmarks/baselines/api_load.json
+
+    # En el mismo proceso (ASGI, sin red ni uvicorn; usa DATABASE_URL)
+    python -m benchmarks.run_api_load --in-process --users 10 --duration 60
+
+    # Comparar contra el baseline (código 1 si hay regresión)
+    python -m benchmarks.run_api_load --users 20 --duration 120 --baseline benchmarks/baselines/api_load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from base64 import b64encode
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from itsdangerous import TimestampSigner
+
+# Añadir raíz del proyecto al path (los módulos usan imports src.*)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.pipeline.stage_timings import summarize_stage_timings
+
+# Clave por defecto de src/api/main.py cuando SESSION_SECRET_KEY no está configurada
+DEFAULT_SESSION_SECRET = 'change-this-secret-key-in-production-use-env-var'
+AUTOCOMPLETE_PREFIXES = ['Su', 'Dis', 'Caf', 'Lim', 'Pan', 'Car', 'Beb', 'Ene', 'Tel', 'Man', 'Fru', 'Ges']
+
+
+def parse_args():
+    """Parsear argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Prueba de carga de la API')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--base-url', default='http://127.0.0.1:8000', help='URL de la API')
+    target.add_argument('--in-process', action='store_true',
+                        help='Ejecutar la app ASGI en este proceso (sin uvicorn)')
+    parser.add_argument('--users', type=int, default=10, help='Usuarios virtuales concurrentes')
+    parser.add_argument('--duration', type=float, default=60, help='Duración en segundos')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Segundos hasta tener todos los usuarios activos')
+    parser.add_argument('--think-time-ms', type=float, default=1000,
+                        help='Pausa media entre escenarios de un usuario (exponencial)')
+    parser.add_argument('--year-from', type=int, default=2023, help='Primer año consultado')
+    parser.add_argument('--year-to', type=int, default=2025, help='Último año consultado')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout por petición en segundos')
+    parser.add_argument('--user-email', default=None, help='Email de la sesión (por defecto el primero de ALLOWED_EMAILS)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de la secuencia de escenarios')
+    parser.add_argument('--output-json', help='Guardar resultados en JSON')
+    parser.add_argument('--baseline', help='JSON de un run anterior para comparar')
+    parser.add_argument('--max-regression-pct', type=float, default=25.0,
+                        help='Aumento máximo tolerado del p95 por endpoint frente al baseline')
+    parser.add_argument('--max-error-rate-increase', type=float, default=0.01,
+                        help='Aumento máximo tolerado de la tasa de error por endpoint (0.01 = 1 punto)')
+    return parser.parse_args()
+
+
+def session_cookie(email: str, secret: str) -> str:
+    """
+    Cookie 'session' firmada como la firma starlette.middleware.sessions.SessionMiddleware
+
+    Args:
+        email: Email del usuario (debe estar en ALLOWED_EMAILS)
+        secret: SESSION_SECRET_KEY de la API
+
+    Returns:
+        Valor de la cookie
+    """
+    data = b64encode(json.dumps({'user': {'email': email, 'name': 'Load Test'}}).encode('utf-8'))
+    return TimestampSigner(str(secret)).sign(data).decode('utf-8')
+
+
+class LoadRecorder:
+    """Latencias y errores por endpoint (nombre de ruta, no URL concreta)"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status_counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, ms: float, status: int):
+        self.latencies.setdefault(name, []).append(ms)
+        statuses = self.status_counts.setdefault(name, {})
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 0 or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        """Percentiles (ms), peticiones/s y tasa de error por endpoint"""
+        percentiles = summarize_stage_timings(
+            [{name: ms} for name, values in self.latencies.items() for ms in values]
+        )
+        endpoints = {}
+        for name, stats in percentiles.items():
+            errors = self.errors.get(name, 0)
+            endpoints[name] = {
+                'requests': stats['count'],
+                'rps': round(stats['count'] / elapsed, 2),
+                'errors': errors,
+                'error_rate': round(errors / stats['count'], 4),
+                'p50_ms': round(stats['p50'], 1),
+                'p95_ms': round(stats['p95'], 1),
+                'p99_ms': round(stats['p99'], 1),
+                'max_ms': round(stats['max'], 1),
+                'status': self.status_counts.get(name, {}),
+            }
+        return endpoints
+
+
+class VirtualUser:
+    """Usuario del dashboard: elige escenarios al azar (con pesos) y espera entre ellos"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: LoadRecorder, args, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+        self.scenarios = [
+            (self.dashboard, 6),
+            (self.failed_paging, 1),
+            (self.proveedores, 2),
+            (self.rentabilidad, 1),
+            (self.estado_carga, 1),
+        ]
+
+    async def request(self, name: str, path: str, params: Optional[dict] = None) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(path, params=params)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        self.recorder.record(name, (time.perf_counter() - start) * 1000, status)
+        return response
+
+    def _month_year(self):
+        return self.rng.randint(1, 12), self.rng.randint(self.args.year_from, self.args.year_to)
+
+    async def dashboard(self):
+        """Carga del dashboard de un mes (useInvoiceData lanza las 6 peticiones en paralelo)"""
+        month, year = self._month_year()
+        params = {'month': month, 'year': year}
+        await asyncio.gather(
+            self.request('GET /api/facturas/summary', '/api/facturas/summary', params),
+            self.request('GET /api/facturas/by_day', '/api/facturas/by_day', params),
+            self.request('GET /api/facturas/recent', '/api/facturas/recent', {**params, 'limit': 5}),
+            self.request('GET /api/facturas/categories', '/api/facturas/categories', params),
+            self.request('GET /api/facturas/failed', '/api/facturas/failed'),
+            self.request('GET /api/facturas/list', '/api/facturas/list', params),
+        )
+
+    async def failed_paging(self):
+        """Panel de facturas fallidas: filtro por mes y hasta 3 páginas con el cursor"""
+        month, year = self._month_year()
+        params = {'month': month, 'year': year, 'limit': 50}
+        for _ in range(3):
+            response = await self.request('GET /api/facturas/failed', '/api/facturas/failed', params)
+            cursor = response.headers.get('X-Next-Cursor') if response is not None else None
+            if not cursor:
+                break
+            params = {**params, 'cursor': cursor}
+
+    async def proveedores(self):
+        """Listado de proveedores y autocompletado mientras se escribe"""
+        await self.request('GET /api/proveedores', '/api/proveedores',
+                           {'limit': 100, 'skip': self.rng.choice([0, 0, 100, 200])})
+        prefix = self.rng.choice(AUTOCOMPLETE_PREFIXES)
+        for end in range(1, len(prefix) + 1):
+            await self.request('GET /api/proveedores/autocomplete', '/api/proveedores/autocomplete',
+                               {'q': prefix[:end], 'limit': 10})
+
+    async def rentabilidad(self):
+        """Análisis de rentabilidad: ingresos vs gastos y costos de personal del año"""
+        _, year = self._month_year()
+        await asyncio.gather(
+            self.request('GET /api/ingresos/rentabilidad/{year}', f'/api/ingresos/rentabilidad/{year}'),
+            self.request('GET /api/costos-personal/{year}', f'/api/costos-personal/{year}'),
+        )
+
+    async def estado_carga(self):
+        """Panel de carga de datos"""
+        await asyncio.gather(
+            self.request('GET /api/system/sync-status', '/api/system/sync-status'),
+            self.request('GET /api/system/data-load-stats', '/api/system/data-load-stats'),
+            self.request('GET /api/categorias', '/api/categorias'),
+        )
+
+    async def run(self, start_delay: float, deadline: float):
+        await asyncio.sleep(start_delay)
+        funcs, weights = zip(*self.scenarios)
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(funcs, weights=weights)[0]
+            await scenario()
+            if self.args.think_time_ms > 0:
+                await asyncio.sleep(self.rng.expovariate(1000 / self.args.think_time_ms))
+
+
+async def run_load(args) -> dict:
+    """Ejecutar la prueba y devolver el informe"""
+    secret = os.getenv('SESSION_SECRET_KEY') or DEFAULT_SESSION_SECRET
+    email = args.user_email or os.getenv('ALLOWED_EMAILS', '').split(',')[0].strip()
+    if not email:
+        raise SystemExit("❌ Configurar --user-email o ALLOWED_EMAILS")
+
+    cookies = {'session': session_cookie(email, secret)}
+    limits = httpx.Limits(max_connections=args.users * 6, max_keepalive_connections=args.users * 6)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.in_process:
+        from src.api.main import app
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        base_url = 'http://loadtest'
+    else:
+        app, transport, base_url = None, None, args.base_url.rstrip('/')
+
+    recorder = LoadRecorder()
+    rng = random.Random(args.seed)
+
+    async def _run(client):
+        start = time.perf_counter()
+        deadline = start + args.duration
+        users = [VirtualUser(client, recorder, args, random.Random(rng.random())) for _ in range(args.users)]
+        await asyncio.gather(*(
+            user.run(args.ramp_up * idx / max(args.users, 1), deadline) for idx, user in enumerate(users)
+        ))
+        return time.perf_counter() - start
+
+    async with httpx.AsyncClient(base_url=base_url, cookies=cookies, limits=limits,
+                                 timeout=timeout, transport=transport) as client:
+        if app is not None:
+            async with app.router.lifespan_context(app):
+                elapsed = await _run(client)
+        else:
+            elapsed = await _run(client)
+
+    endpoints = recorder.summary(elapsed)
+    total = sum(e['requests'] for e in endpoints.values())
+    errors = sum(e['errors'] for e in endpoints.values())
+    return {
+        'params': {k: v for k, v in vars(args).items() if k not in ('output_json', 'baseline')},
+        'elapsed_s': round(elapsed, 2),
+        'total_requests': total,
+        'rps': round(total / elapsed, 2) if elapsed else None,
+        'error_rate': round(errors / total, 4) if total else None,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(report: dict):
+    """Tabla de resultados por endpoint"""
+    print()
+    print("=" * 100)
+    print(f"  {report['total_requests']} peticiones en {report['elapsed_s']}s "
+          f"({report['rps']} req/s, error {report['error_rate'] * 100 if report['error_rate'] is not None else 0:.2f}%)")
+    print("=" * 100)
+    print(f"  {'endpoint':<42}{'n':>7}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, e in sorted(report['endpoints'].items()):
+        print(f"  {name:<42}{e['requests']:>7}{e['error_rate'] * 100:>8.2f}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}{e['max_ms']:>10}")
+
+
+def compare_with_baseline(report: dict, baseline_path: str, max_regression_pct: float,
+                          max_error_rate_increase: float) -> List[str]:
+    """
+    Comparar p95 y tasa de error por endpoint contra un baseline
+
+    Returns:
+        Lista de regresiones (vacía si no hay)
+    """
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    regressions = []
+    for name, current in sorted(report['endpoints'].items()):
+        base = baseline.get('endpoints', {}).get(name)
+        if not base:
+            continue
+        if base['p95_ms'] > 0:
+            rise = (current['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+            if rise > max_regression_pct:
+                regressions.append(f"{name}: p95 {base['p95_ms']} → {current['p95_ms']} ms (+{rise:.1f}%)")
+        if current['error_rate'] - base['error_rate'] > max_error_rate_increase:
+            regressions.append(f"{name}: tasa de error {base['error_rate']:.2%} → {current['error_rate']:.2%}")
+    return regressions
+
+
+def main():
+    """Función principal"""
+    args = parse_args()
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.output_json:
+        Path(args.output_json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output_json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n📄 Resultados guardados en: {args.output_json}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(report, args.baseline, args.max_regression_pct,
+                                            args.max_error_rate_increase)
+        if regressions:
+            print("\n❌ Regresiones frente al baseline:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("\n✅ Sin regresiones frente al baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
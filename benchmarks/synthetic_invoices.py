@@ -0,0 +1,198 @@
+"""
+Generación de facturas PDF sintéticas para benchmarks
+
+Dos variantes:
+- text: PDF con capa de texto (generado a mano, sin dependencias)
+- scanned: página rasterizada con Pillow (como un escaneo), sin capa de texto
+"""
+import json
+import random
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+from PIL import Image, ImageDraw, ImageFont
+
+PROVEEDORES = [
+    ('Suministros Levante SL', 'B12345678'),
+    ('Energya-VM Comercializadora SL', 'B87654321'),
+    ('Distribuciones Hosteleras del Sur SA', 'A28123456'),
+    ('Cafés Montaña SL', 'B46123987'),
+    ('Limpiezas Integrales Mediterráneo SL', 'B97456123'),
+    ('Bebidas y Refrescos Costa SA', 'A46987321'),
+    ('Panadería Artesana La Espiga SL', 'B12987654'),
+    ('Telecomunicaciones Iberia SA', 'A78123654'),
+    ('Mantenimiento Técnico Valencia SL', 'B98765432'),
+    ('Carnes Selectas del Norte SL', 'B31456789'),
+]
+
+A4_POINTS = (595, 842)
+SCAN_DPI = 150
+
+
+@dataclass
+class SyntheticInvoice:
+    """Datos de una factura sintética y el PDF generado"""
+    file_name: str
+    path: str
+    variant: str
+    proveedor: str
+    proveedor_nif: str
+    numero_factura: str
+    fecha_emision: str
+    base_imponible: float
+    iva_porcentaje: float
+    impuestos_total: float
+    importe_total: float
+
+    def lines(self) -> List[str]:
+        """Líneas de texto de la factura"""
+        return [
+            self.proveedor,
+            f"NIF: {self.proveedor_nif}",
+            "",
+            f"FACTURA N. {self.numero_factura}",
+            f"Fecha de emision: {self.fecha_emision}",
+            "Cliente: MANTUA EAGLE SL",
+            "",
+            "Concepto                               Importe",
+            f"Suministros varios                     {self.base_imponible:.2f} EUR",
+            "",
+            f"Base imponible:                        {self.base_imponible:.2f} EUR",
+            f"IVA {self.iva_porcentaje:.0f}%:                               {self.impuestos_total:.2f} EUR",
+            f"TOTAL FACTURA:                         {self.importe_total:.2f} EUR",
+        ]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def text_pdf_bytes(lines: List[str]) -> bytes:
+    """
+    PDF de una página con capa de texto (Helvetica, WinAnsi)
+
+    Args:
+        lines: Líneas de texto
+
+    Returns:
+        Contenido del PDF
+    """
+    ops = ["BT", "/F1 11 Tf", "15 TL", "50 790 Td"]
+    for line in lines:
+        ops.append(f"({_pdf_escape(line)}) Tj T*")
+    ops.append("ET")
+    stream = "\n".join(ops).encode('cp1252', errors='replace')
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {A4_POINTS[0]} {A4_POINTS[1]}] "
+        f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>".encode('ascii'),
+        b"<< /Length " + str(len(stream)).encode('ascii') + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('ascii')
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode('ascii')
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode('ascii')
+    return bytes(output)
+
+
+def _load_font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def write_scanned_pdf(lines: List[str], path: Path, rng: random.Random):
+    """
+    PDF de una página rasterizada (sin capa de texto), con ligera rotación y ruido de escaneo
+
+    Args:
+        lines: Líneas de texto
+        path: Ruta de destino
+        rng: Generador aleatorio (reproducible)
+    """
+    width = int(A4_POINTS[0] / 72 * SCAN_DPI)
+    height = int(A4_POINTS[1] / 72 * SCAN_DPI)
+    img = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    font = _load_font(24)
+
+    y = 120
+    for line in lines:
+        draw.text((100, y), line, fill=0, font=font)
+        y += 36
+
+    # Motas de escaneo
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.point((x, y), fill=rng.randrange(80, 200))
+
+    img = img.rotate(rng.uniform(-1.0, 1.0), fillcolor=255)
+    img.convert('RGB').save(path, 'PDF', resolution=SCAN_DPI)
+
+
+def generate_invoices(output_dir: Path, count: int, scanned_ratio: float = 0.3, seed: int = 42) -> List[SyntheticInvoice]:
+    """
+    Generar facturas sintéticas y un manifest.json con sus datos
+
+    Args:
+        output_dir: Directorio de destino
+        count: Número de facturas
+        scanned_ratio: Fracción de facturas escaneadas (sin capa de texto)
+        seed: Semilla para que el lote sea reproducible
+
+    Returns:
+        Lista de SyntheticInvoice
+    """
+    rng = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    invoices = []
+
+    for idx in range(1, count + 1):
+        proveedor, nif = PROVEEDORES[idx % len(PROVEEDORES)]
+        iva = rng.choice([21.0, 21.0, 10.0, 4.0])
+        base = round(rng.uniform(20, 3000), 2)
+        impuestos = round(base * iva / 100, 2)
+        variant = 'scanned' if rng.random() < scanned_ratio else 'text'
+        file_name = f"bench_{idx:05d}_{variant}.pdf"
+
+        invoice = SyntheticInvoice(
+            file_name=file_name,
+            path=str(output_dir / file_name),
+            variant=variant,
+            proveedor=proveedor,
+            proveedor_nif=nif,
+            numero_factura=f"F{seed:02d}-{idx:06d}",
+            fecha_emision=(date(2025, 1, 1) + timedelta(days=rng.randrange(365))).isoformat(),
+            base_imponible=base,
+            iva_porcentaje=iva,
+            impuestos_total=impuestos,
+            importe_total=round(base + impuestos, 2),
+        )
+
+        if variant == 'scanned':
+            write_scanned_pdf(invoice.lines(), Path(invoice.path), rng)
+        else:
+            Path(invoice.path).write_bytes(text_pdf_bytes(invoice.lines()))
+        invoices.append(invoice)
+
+    (output_dir / 'manifest.json').write_text(
+        json.dumps([asdict(i) for i in invoices], indent=2, ensure_ascii=False),
+        encoding='utf-8'
+    )
+    return invoices
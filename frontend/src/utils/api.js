@@ -160,10 +160,19 @@ export async function fetchSyncStatus() {
 
 /**
  * Obtener todas las facturas fallidas (sin filtro de mes)
+ * Recorre las páginas del endpoint siguiendo next_cursor
  */
 export async function fetchFailedInvoices() {
-  const response = await fetchAPI(`/facturas/failed`);
-  return response.data || [];
+  const items = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: '500' });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetchAPI(`/facturas/failed?${params.toString()}`);
+    items.push(...(response.data || []));
+    cursor = response.next_cursor || null;
+  } while (cursor);
+  return items;
 }
 
 /**
@@ -0,0 +1,34 @@
+-- Migración: Versión de datos del dashboard como secuencia (data_version_seq)
+-- Fecha: 2026-10-19
+-- Descripción: La caché de respuestas de la API se invalida con una versión de datos que
+--              avanza tras cada escritura. Antes era la fila sync_state['data_version'],
+--              actualizada con INSERT ... ON CONFLICT DO UPDATE dentro de cada transacción:
+--              la fila quedaba bloqueada hasta el commit y serializaba a los escritores
+--              concurrentes (workers de ingest_queue, API). nextval no bloquea filas y se
+--              pide después del commit. Aplicar ANTES de desplegar el código.
+
+-- ============================================================================
+-- CREAR SECUENCIA
+-- ============================================================================
+
+CREATE SEQUENCE IF NOT EXISTS data_version_seq;
+
+-- Continuar desde la versión anterior para no reutilizar claves de caché ya emitidas
+SELECT setval('data_version_seq', GREATEST(value::BIGINT, 1))
+FROM sync_state
+WHERE key = 'data_version' AND value ~ '^[0-9]+$';
+
+DELETE FROM sync_state WHERE key = 'data_version';
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON SEQUENCE data_version_seq IS 'Versión de datos del dashboard (invalidación de la caché de respuestas de la API)';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar (tras revertir el código):
+-- DROP SEQUENCE IF EXISTS data_version_seq;
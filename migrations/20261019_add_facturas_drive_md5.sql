@@ -0,0 +1,30 @@
+-- Migración: Guardar md5Checksum de Drive en facturas
+-- Fecha: 2026-10-19
+-- Descripción: El listado incremental pide md5Checksum y descarta antes de descargar los
+--              archivos que ya están en facturas con el mismo md5 (o, si falta, el mismo
+--              modifiedTime). Con el solape de SYNC_WINDOW_MINUTES es la mayoría de lo listado,
+--              y antes solo se descartaban (DuplicateDecision.IGNORE) tras descargar y extraer.
+--              Aplicar ANTES de desplegar el código (el modelo Factura incluye la columna).
+--              Las facturas existentes se comparan por drive_modified_time hasta que se reprocesan.
+
+-- ============================================================================
+-- AGREGAR COLUMNA
+-- ============================================================================
+
+ALTER TABLE facturas
+ADD COLUMN IF NOT EXISTS drive_md5_checksum TEXT;
+
+-- La búsqueda es por drive_file_id (índice único existente): no hace falta índice nuevo
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON COLUMN facturas.drive_md5_checksum IS 'md5Checksum de Drive del archivo procesado (detección de archivos sin cambios)';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar (con SKIP_UNCHANGED_FILES=false o tras revertir el código):
+-- ALTER TABLE facturas DROP COLUMN IF EXISTS drive_md5_checksum;
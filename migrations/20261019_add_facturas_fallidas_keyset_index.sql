@@ -0,0 +1,15 @@
+-- Migración: Índice para paginación keyset de facturas fallidas (/api/facturas/failed)
+-- Fecha: 2026-10-19
+-- Descripción: Índice parcial sobre facturas en estado 'error'/'revisar' ordenado por la
+--              fecha de orden (fecha_emision > fecha_recepcion > creado_en) e id, ambos DESC.
+--              La expresión debe coincidir con FACTURA_FECHA_ORDEN en src/db/models.py.
+
+CREATE INDEX IF NOT EXISTS idx_facturas_fallidas_keyset
+ON facturas (
+    (COALESCE(fecha_emision, CAST(fecha_recepcion AS DATE), CAST(creado_en AS DATE), DATE '1900-01-01')) DESC,
+    id DESC
+)
+WHERE estado IN ('error', 'revisar');
+
+-- Para revertir esta migración, ejecutar:
+-- DROP INDEX IF EXISTS idx_facturas_fallidas_keyset;
@@ -0,0 +1,30 @@
+-- Migración: Añadir tiempos por etapa a ingest_events
+-- Fecha: 2026-10-19
+-- Descripción: process_batch registra por cada archivo un evento 'ingest_timings' con los
+--              milisegundos de cada etapa (validate, render, encode, api, fallback, dto,
+--              duplicate_lookup, upsert, quarantine_move, total) en la columna JSONB timings_ms.
+--
+-- Ejemplo de análisis de tendencia (p95 diario de la llamada a OpenAI):
+--   SELECT date_trunc('day', ts) AS dia,
+--          percentile_cont(0.95) WITHIN GROUP (ORDER BY (timings_ms->>'api')::numeric) AS api_p95_ms
+--   FROM ingest_events
+--   WHERE etapa = 'ingest_timings' AND timings_ms ? 'api'
+--   GROUP BY 1 ORDER BY 1;
+
+-- ============================================================================
+-- AÑADIR COLUMNA
+-- ============================================================================
+
+ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS timings_ms JSONB;
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_ingest_events_timings_ts
+ON ingest_events (ts)
+WHERE etapa = 'ingest_timings';
+
+-- Para revertir esta migración, ejecutar:
+-- DROP INDEX IF EXISTS idx_ingest_events_timings_ts;
+-- ALTER TABLE ingest_events DROP COLUMN IF EXISTS timings_ms;
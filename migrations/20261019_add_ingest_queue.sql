@@ -0,0 +1,54 @@
+-- Migración: Cola persistente de ingesta (ingest_queue)
+-- Fecha: 2026-10-19
+-- Descripción: El listado de Drive encola cada archivo (id, modifiedTime, metadatos) y los
+--              workers lo reclaman con SELECT ... FOR UPDATE SKIP LOCKED y un lease con
+--              caducidad. Si un proceso muere a mitad de lote, sus archivos vuelven a estar
+--              disponibles al expirar el lease, sin depender del solape de SYNC_WINDOW_MINUTES.
+--              Activar con INGEST_QUEUE_ENABLED=true; workers extra: python scripts/run_ingest_worker.py
+
+-- ============================================================================
+-- CREAR TABLA ingest_queue
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS ingest_queue (
+    drive_file_id TEXT PRIMARY KEY,
+    drive_file_name TEXT NOT NULL,
+    drive_modified_time TIMESTAMP,
+    file_metadata JSONB NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expira_en TIMESTAMP,
+    ultimo_error TEXT,
+    encolado_en TIMESTAMP DEFAULT NOW(),
+    actualizado_en TIMESTAMP DEFAULT NOW(),
+
+    CONSTRAINT check_ingest_queue_estado CHECK (estado IN ('pendiente', 'en_proceso', 'completado', 'error'))
+);
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+-- Reclamación por orden de modifiedTime; los completados (la mayoría) quedan fuera del índice
+CREATE INDEX IF NOT EXISTS idx_ingest_queue_reclamables
+ON ingest_queue(drive_modified_time)
+WHERE estado IN ('pendiente', 'en_proceso');
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON TABLE ingest_queue IS 'Cola persistente de archivos Drive pendientes de ingesta';
+COMMENT ON COLUMN ingest_queue.drive_modified_time IS 'modifiedTime de Drive en UTC; una versión más reciente vuelve a encolar el archivo';
+COMMENT ON COLUMN ingest_queue.file_metadata IS 'Metadatos del archivo tal como los devuelve Drive';
+COMMENT ON COLUMN ingest_queue.intentos IS 'Reclamaciones del archivo; al llegar a INGEST_QUEUE_MAX_ATTEMPTS queda en error';
+COMMENT ON COLUMN ingest_queue.lease_owner IS 'Worker (host:pid) que tiene reclamado el archivo';
+COMMENT ON COLUMN ingest_queue.lease_expira_en IS 'Hora UTC a partir de la cual otro worker puede reclamarlo';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar (con INGEST_QUEUE_ENABLED=false):
+-- DROP TABLE IF EXISTS ingest_queue;
@@ -0,0 +1,60 @@
+-- Migración: Tabla proveedor_alias (alias normalizados de proveedores maestros)
+-- Fecha: 2026-10-19
+-- Descripción: Cada variante de nombre de proveedor se guarda una vez con su forma normalizada
+--              precalculada (normalizar_nombre_proveedor) y sus tokens. normalizar_y_buscar_proveedor
+--              resuelve los aciertos exactos con una búsqueda por el índice único antes de cualquier
+--              fuzzy matching, y el fuzzy compara contra las formas ya normalizadas.
+--              nombres_alternativos (JSONB) se mantiene como columna heredada.
+--              La normalización se hace en Python, así que el backfill es un script:
+--                  python scripts/backfill_proveedor_alias.py
+
+-- ============================================================================
+-- CREAR TABLA
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS proveedor_alias (
+    id SERIAL PRIMARY KEY,
+    proveedor_maestro_id INTEGER NOT NULL REFERENCES proveedores_maestros(id) ON DELETE CASCADE,
+    alias TEXT NOT NULL,
+    alias_normalizado TEXT NOT NULL,
+    tokens TEXT[] NOT NULL DEFAULT '{}',
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+-- Una forma normalizada pertenece a un único proveedor maestro
+CREATE UNIQUE INDEX IF NOT EXISTS idx_proveedor_alias_normalizado
+ON proveedor_alias(alias_normalizado);
+
+CREATE INDEX IF NOT EXISTS idx_proveedor_alias_maestro
+ON proveedor_alias(proveedor_maestro_id);
+
+-- Autocompletado (/api/proveedores/autocomplete) sobre los alias: sustituye al índice
+-- trigram sobre nombres_alternativos::text de 20261019_add_proveedores_trgm_indexes.sql
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_proveedor_alias_alias_trgm
+ON proveedor_alias USING gin (alias gin_trgm_ops);
+
+DROP INDEX IF EXISTS idx_proveedores_maestros_alias_trgm;
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON TABLE proveedor_alias IS 'Variantes de nombre de cada proveedor maestro con su forma normalizada';
+COMMENT ON COLUMN proveedor_alias.alias IS 'Nombre tal como aparece en la factura';
+COMMENT ON COLUMN proveedor_alias.alias_normalizado IS 'normalizar_nombre_proveedor(alias), clave única de búsqueda';
+COMMENT ON COLUMN proveedor_alias.tokens IS 'Palabras de alias_normalizado';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar:
+-- DROP TABLE IF EXISTS proveedor_alias;
+-- CREATE INDEX IF NOT EXISTS idx_proveedores_maestros_alias_trgm
+-- ON proveedores_maestros USING gin ((nombres_alternativos::text) gin_trgm_ops);
@@ -0,0 +1,129 @@
+-- Migración: Mantener total_facturas/total_importe de proveedores_maestros con triggers
+-- Fecha: 2026-10-19
+-- Descripción: Los contadores se creaban a 0 (normalizar_y_buscar_proveedor) y solo se
+--              corregían con scripts puntuales. Ahora cada INSERT/UPDATE/DELETE sobre facturas
+--              aplica el delta por proveedor (triggers por sentencia con tablas de transición,
+--              así una carga masiva hace un UPDATE por proveedor y no uno por fila).
+--              Cuentan las facturas con estado 'procesado'; el importe es la suma de importe_total.
+--              Verificar/reparar: python scripts/verify_proveedor_stats.py [--repair]
+
+-- ============================================================================
+-- FUNCIÓN DE DELTA
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION aplicar_delta_stats_proveedor() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE proveedores_maestros pm
+        SET total_facturas = COALESCE(pm.total_facturas, 0) + d.n,
+            total_importe = COALESCE(pm.total_importe, 0) + d.importe
+        FROM (
+            SELECT proveedor_maestro_id, COUNT(*) AS n, COALESCE(SUM(importe_total), 0) AS importe
+            FROM facturas_nuevas
+            WHERE estado = 'procesado' AND proveedor_maestro_id IS NOT NULL
+            GROUP BY proveedor_maestro_id
+        ) d
+        WHERE pm.id = d.proveedor_maestro_id;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE proveedores_maestros pm
+        SET total_facturas = COALESCE(pm.total_facturas, 0) - d.n,
+            total_importe = COALESCE(pm.total_importe, 0) - d.importe
+        FROM (
+            SELECT proveedor_maestro_id, COUNT(*) AS n, COALESCE(SUM(importe_total), 0) AS importe
+            FROM facturas_viejas
+            WHERE estado = 'procesado' AND proveedor_maestro_id IS NOT NULL
+            GROUP BY proveedor_maestro_id
+        ) d
+        WHERE pm.id = d.proveedor_maestro_id;
+
+    ELSE
+        -- UPDATE: restar la contribución anterior y sumar la nueva (cambio de estado,
+        -- importe o proveedor); las filas que no cambian se anulan entre sí
+        UPDATE proveedores_maestros pm
+        SET total_facturas = COALESCE(pm.total_facturas, 0) + d.n,
+            total_importe = COALESCE(pm.total_importe, 0) + d.importe
+        FROM (
+            SELECT proveedor_maestro_id, SUM(n) AS n, SUM(importe) AS importe
+            FROM (
+                SELECT proveedor_maestro_id, 1 AS n, COALESCE(importe_total, 0) AS importe
+                FROM facturas_nuevas
+                WHERE estado = 'procesado' AND proveedor_maestro_id IS NOT NULL
+                UNION ALL
+                SELECT proveedor_maestro_id, -1 AS n, -COALESCE(importe_total, 0) AS importe
+                FROM facturas_viejas
+                WHERE estado = 'procesado' AND proveedor_maestro_id IS NOT NULL
+            ) cambios
+            GROUP BY proveedor_maestro_id
+            HAVING SUM(n) <> 0 OR SUM(importe) <> 0
+        ) d
+        WHERE pm.id = d.proveedor_maestro_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- TRIGGERS (uno por operación: las tablas de transición no admiten INSERT OR UPDATE)
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_ins ON facturas;
+CREATE TRIGGER trg_facturas_stats_proveedor_ins
+    AFTER INSERT ON facturas
+    REFERENCING NEW TABLE AS facturas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION aplicar_delta_stats_proveedor();
+
+DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_upd ON facturas;
+CREATE TRIGGER trg_facturas_stats_proveedor_upd
+    AFTER UPDATE ON facturas
+    REFERENCING OLD TABLE AS facturas_viejas NEW TABLE AS facturas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION aplicar_delta_stats_proveedor();
+
+DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_del ON facturas;
+CREATE TRIGGER trg_facturas_stats_proveedor_del
+    AFTER DELETE ON facturas
+    REFERENCING OLD TABLE AS facturas_viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION aplicar_delta_stats_proveedor();
+
+-- ============================================================================
+-- RECÁLCULO INICIAL (una consulta agrupada)
+-- ============================================================================
+
+LOCK TABLE facturas IN SHARE MODE;
+
+UPDATE proveedores_maestros pm
+SET total_facturas = COALESCE(r.n, 0),
+    total_importe = COALESCE(r.importe, 0)
+FROM proveedores_maestros p
+LEFT JOIN (
+    SELECT proveedor_maestro_id, COUNT(*) AS n, COALESCE(SUM(importe_total), 0) AS importe
+    FROM facturas
+    WHERE estado = 'procesado' AND proveedor_maestro_id IS NOT NULL
+    GROUP BY proveedor_maestro_id
+) r ON r.proveedor_maestro_id = p.id
+WHERE pm.id = p.id;
+
+-- Índice para el recálculo agrupado y el verificador
+CREATE INDEX IF NOT EXISTS idx_facturas_proveedor_maestro_procesadas
+    ON facturas(proveedor_maestro_id) INCLUDE (importe_total)
+    WHERE estado = 'procesado';
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON FUNCTION aplicar_delta_stats_proveedor() IS 'Aplica a proveedores_maestros el delta de facturas procesadas de cada sentencia sobre facturas';
+COMMENT ON COLUMN proveedores_maestros.total_facturas IS 'Facturas con estado procesado (mantenido por trg_facturas_stats_proveedor_*)';
+COMMENT ON COLUMN proveedores_maestros.total_importe IS 'Suma de importe_total de las facturas procesadas (mantenido por trg_facturas_stats_proveedor_*)';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar:
+-- DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_ins ON facturas;
+-- DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_upd ON facturas;
+-- DROP TRIGGER IF EXISTS trg_facturas_stats_proveedor_del ON facturas;
+-- DROP FUNCTION IF EXISTS aplicar_delta_stats_proveedor();
+-- DROP INDEX IF EXISTS idx_facturas_proveedor_maestro_procesadas;
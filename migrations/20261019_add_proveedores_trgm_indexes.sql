@@ -0,0 +1,31 @@
+-- Migración: Índices trigram para el autocompletado de proveedores (/api/proveedores/autocomplete)
+-- Fecha: 2026-10-19
+-- Descripción: Índices GIN pg_trgm sobre nombre_canonico y sobre los alias aplanados como texto
+--              (nombres_alternativos::text). Sirven al ILIKE '%q%' del endpoint, que ordena por
+--              similarity/word_similarity y aplica el LIMIT en la BD.
+--              La expresión de alias debe coincidir con alias_texto en src/api/routes/proveedores.py.
+
+-- ============================================================================
+-- EXTENSIÓN
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_proveedores_maestros_nombre_trgm
+ON proveedores_maestros USING gin (nombre_canonico gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_proveedores_maestros_alias_trgm
+ON proveedores_maestros USING gin ((nombres_alternativos::text) gin_trgm_ops);
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar:
+-- DROP INDEX IF EXISTS idx_proveedores_maestros_alias_trgm;
+-- DROP INDEX IF EXISTS idx_proveedores_maestros_nombre_trgm;
+-- (la extensión pg_trgm puede quedarse instalada)
@@ -0,0 +1,57 @@
+-- Migración: Añadir tabla quarantine_entries (catálogo de cuarentena)
+-- Fecha: 2026-10-19
+-- Descripción: Índice en BD de los .meta.json de QUARANTINE_PATH para que los endpoints
+--              de facturas fallidas/pendientes y estadísticas no recorran el disco en cada request.
+--              Tras aplicar, ejecutar: python scripts/rebuild_quarantine_catalog.py
+
+-- ============================================================================
+-- CREAR TABLA quarantine_entries
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS quarantine_entries (
+    id BIGSERIAL PRIMARY KEY,
+    meta_file TEXT NOT NULL,
+    drive_file_id TEXT,
+    drive_file_name TEXT NOT NULL,
+    drive_folder_name TEXT,
+    decision TEXT,
+    reason TEXT,
+    proveedor_text TEXT,
+    importe_total DECIMAL(18, 2),
+    impuestos_total DECIMAL(18, 2),
+    fecha_emision DATE,
+    fecha_referencia DATE NOT NULL,
+    drive_modified_time TIMESTAMP,
+    quarantined_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    creado_en TIMESTAMP DEFAULT NOW(),
+
+    CONSTRAINT quarantine_entries_meta_file_key UNIQUE (meta_file)
+);
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_quarantine_entries_nombre ON quarantine_entries(drive_file_name, quarantined_at);
+CREATE INDEX IF NOT EXISTS idx_quarantine_entries_fecha ON quarantine_entries(fecha_referencia);
+CREATE INDEX IF NOT EXISTS idx_quarantine_entries_decision ON quarantine_entries(decision);
+
+-- Anti-join de cuarentena contra facturas por nombre de archivo
+CREATE INDEX IF NOT EXISTS idx_facturas_drive_file_name ON facturas(drive_file_name);
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON TABLE quarantine_entries IS 'Catálogo de archivos en cuarentena (uno por .meta.json)';
+COMMENT ON COLUMN quarantine_entries.meta_file IS 'Ruta del .meta.json relativa a QUARANTINE_PATH';
+COMMENT ON COLUMN quarantine_entries.decision IS 'Decisión de DuplicateManager (duplicate/review/...) o NULL si es un fallo de procesamiento';
+COMMENT ON COLUMN quarantine_entries.fecha_referencia IS 'Fecha efectiva para filtros: fecha_emision > nombre de archivo > modifiedTime > quarantined_at';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar:
+-- DROP INDEX IF EXISTS idx_facturas_drive_file_name;
+-- DROP TABLE IF EXISTS quarantine_entries;
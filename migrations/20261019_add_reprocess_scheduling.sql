@@ -0,0 +1,50 @@
+-- Migración: Programación del reprocesamiento (backoff exponencial + prioridad indexada)
+-- Fecha: 2026-10-19
+-- Descripción: get_facturas_para_reprocesar traía limite*2 filas y las ordenaba en Python por
+--              subcadenas de error_msg, y todas se reintentaban al inicio de cada ejecución.
+--              Ahora cada factura guarda cuándo puede reintentarse (reprocess_next_attempt_at,
+--              backoff exponencial tras cada fallo) y su prioridad es una columna generada a
+--              partir de error_msg, así la selección es una consulta indexada con LIMIT.
+--              Aplicar ANTES de desplegar el código (el modelo Factura incluye las columnas).
+--              La expresión de prioridad debe coincidir con _reprocess_prioridad_sql() en src/db/models.py.
+
+-- ============================================================================
+-- AGREGAR COLUMNAS
+-- ============================================================================
+
+ALTER TABLE facturas
+ADD COLUMN IF NOT EXISTS reprocess_next_attempt_at TIMESTAMP;
+
+-- 0 = bug conocido ya corregido, 1 = fallo transitorio, 2 = resto
+ALTER TABLE facturas
+ADD COLUMN IF NOT EXISTS reprocess_prioridad SMALLINT GENERATED ALWAYS AS (
+    CASE
+        WHEN error_msg ILIKE ANY (ARRAY['%tipo inválido%', '%formato inválido%', '%parsing failed%', '%validación de negocio falló%']) THEN 0
+        WHEN error_msg ILIKE ANY (ARRAY['%timeout%', '%timed out%', '%rate limit%', '%429%', '%connection%', '%conexión%']) THEN 1
+        ELSE 2
+    END
+) STORED;
+
+-- ============================================================================
+-- CREAR ÍNDICES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_facturas_reprocess_cola
+ON facturas (reprocess_prioridad, reprocess_next_attempt_at NULLS FIRST)
+WHERE estado = 'revisar';
+
+-- ============================================================================
+-- COMENTARIOS (Documentación)
+-- ============================================================================
+
+COMMENT ON COLUMN facturas.reprocess_next_attempt_at IS 'Próximo reintento de reprocesamiento permitido (NULL = elegible ya)';
+COMMENT ON COLUMN facturas.reprocess_prioridad IS 'Prioridad de reprocesamiento derivada de error_msg (0 = alta, 2 = baja)';
+
+-- ============================================================================
+-- ROLLBACK (Instrucciones para revertir)
+-- ============================================================================
+
+-- Para revertir esta migración, ejecutar:
+-- DROP INDEX IF EXISTS idx_facturas_reprocess_cola;
+-- ALTER TABLE facturas DROP COLUMN IF EXISTS reprocess_prioridad;
+-- ALTER TABLE facturas DROP COLUMN IF EXISTS reprocess_next_attempt_at;
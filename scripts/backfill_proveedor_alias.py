@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Script para rellenar proveedor_alias desde los proveedores maestros existentes
+
+Registra el nombre canónico y cada entrada de nombres_alternativos con su forma
+normalizada. Solo recorre proveedores activos: alias_normalizado es único y un
+proveedor desactivado que reclamara una forma la dejaría fuera del matching (la
+búsqueda solo considera activos). Antes libera los alias que ya tengan proveedores
+inactivos. Es idempotente (las formas ya registradas se ignoran), así que puede
+ejecutarse de nuevo sin riesgo. Ejecutar una vez tras aplicar la migración
+20261019_add_proveedor_alias.sql.
+
+Uso:
+    python scripts/backfill_proveedor_alias.py
+    python scripts/backfill_proveedor_alias.py --batch-size 500
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, func, delete
+
+from src.security.secrets import load_env
+from src.db.database import Database
+from src.db.models import ProveedorMaestro, ProveedorAlias
+from src.utils.proveedor_finder import registrar_aliases_de_maestro
+from src.logging_conf import get_logger
+
+load_env()
+
+logger = get_logger(__name__)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Rellenar proveedor_alias')
+    parser.add_argument('--batch-size', type=int, default=200, help='Proveedores por commit (por defecto 200)')
+    args = parser.parse_args()
+    
+    db = Database()
+    try:
+        with db.get_session() as session:
+            liberados = session.execute(
+                delete(ProveedorAlias).where(
+                    ProveedorAlias.proveedor_maestro_id.in_(
+                        select(ProveedorMaestro.id).where(ProveedorMaestro.activo.isnot(True))
+                    )
+                )
+            ).rowcount
+        if liberados:
+            logger.info(f"{liberados} alias de proveedores inactivos liberados")
+        
+        proveedores = 0
+        nuevos = 0
+        ultimo_id = 0
+        
+        while True:
+            with db.get_session() as session:
+                lote = session.execute(
+                    select(ProveedorMaestro)
+                    .where(ProveedorMaestro.id > ultimo_id, ProveedorMaestro.activo == True)
+                    .order_by(ProveedorMaestro.id)
+                    .limit(args.batch_size)
+                ).scalars().all()
+                
+                if not lote:
+                    break
+                
+                for proveedor in lote:
+                    nuevos += registrar_aliases_de_maestro(session, proveedor)
+                ultimo_id = lote[-1].id
+                proveedores += len(lote)
+            
+            logger.info(f"Procesados {proveedores} proveedores ({nuevos} alias nuevos)")
+        
+        with db.get_session() as session:
+            total = session.execute(select(func.count(ProveedorAlias.id))).scalar()
+        
+        print(
+            f"✅ {proveedores} proveedores activos revisados, {nuevos} alias nuevos "
+            f"({liberados} liberados de inactivos, {total} en total)"
+        )
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,7 +11,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from src.db.database import Database
 from src.db.models import ProveedorMaestro, Factura
 from rapidfuzz import fuzz
-from decimal import Decimal
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -113,9 +112,7 @@ def buscar_y_fusionar_duplicados(umbral: float = 92.0, dry_run: bool = True):
                             'proveedor_text': objetivo.nombre_canonico
                         }, synchronize_session=False)
                         
-                        # Sumar contadores
-                        objetivo.total_facturas += variante.total_facturas
-                        objetivo.total_importe = Decimal(str(objetivo.total_importe)) + Decimal(str(variante.total_importe))
+                        # total_facturas/total_importe los mueven los triggers de facturas al reasignar
                         
                         # Agregar a nombres alternativos
                         if variante.nombre_canonico not in objetivo.nombres_alternativos:
@@ -11,7 +11,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.db.database import Database
 from src.db.models import ProveedorMaestro, Factura
-from decimal import Decimal
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -112,9 +111,7 @@ def corregir_duplicados_graves(dry_run: bool = True):
                             'proveedor_text': maestro_objetivo.nombre_canonico
                         }, synchronize_session=False)
                         
-                        # Sumar contadores
-                        maestro_objetivo.total_facturas += pm_variante.total_facturas
-                        maestro_objetivo.total_importe = Decimal(str(maestro_objetivo.total_importe)) + Decimal(str(pm_variante.total_importe))
+                        # total_facturas/total_importe los mueven los triggers de facturas al reasignar
                         
                         # Agregar nombre a alternativos
                         if pm_variante.nombre_canonico not in maestro_objetivo.nombres_alternativos:
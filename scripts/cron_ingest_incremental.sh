@@ -1,6 +1,8 @@
 #!/bin/bash
 # Script específico para ejecutar ingesta incremental desde cron
 # Este script está diseñado para ejecutarse dentro del contenedor Docker
+# Alternativa sin re-arrancar Python en cada ejecución: scripts/run_ingest_daemon.py
+# (comparten JobLock; usar uno u otro)
 
 set -e
 
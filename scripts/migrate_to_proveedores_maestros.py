@@ -19,11 +19,13 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.db.database import Database
 from src.db.models import ProveedorMaestro, Factura, Base
+from src.db.repositories import ProveedorMaestroRepository
 from src.utils.proveedor_normalizer_v2 import (
     normalizar_nombre_proveedor,
     seleccionar_nombre_canonico,
     calcular_similitud
 )
+from src.utils.proveedor_finder import registrar_aliases_de_maestro
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import logging
@@ -206,12 +208,10 @@ def migrar_proveedores(db: Database, grupos: List[List[Dict]], dry_run: bool = T
                         ProveedorMaestro.nombre_canonico == nombre_canonico
                     ).first()
                     
+                    # total_facturas/total_importe no se tocan aquí: los triggers de facturas los
+                    # mueven al asignar proveedor_maestro_id (actualizar_facturas) y repair_stats
+                    # los recalcula al final
                     if proveedor_existente:
-                        # Actualizar
-                        proveedor_existente.total_facturas += total_facturas
-                        # Convertir a Decimal para evitar error de tipos
-                        from decimal import Decimal
-                        proveedor_existente.total_importe = Decimal(str(proveedor_existente.total_importe)) + Decimal(str(total_importe))
                         # Agregar nombres alternativos nuevos
                         for alt in nombres_alternativos:
                             if alt not in proveedor_existente.nombres_alternativos:
@@ -223,19 +223,19 @@ def migrar_proveedores(db: Database, grupos: List[List[Dict]], dry_run: bool = T
                         proveedor_maestro = proveedor_existente
                     else:
                         # Crear nuevo
-                        from decimal import Decimal
                         proveedor_maestro = ProveedorMaestro(
                             nombre_canonico=nombre_canonico,
                             nif_cif=nif_cif,
                             nombres_alternativos=nombres_alternativos,
-                            total_facturas=total_facturas,
-                            total_importe=Decimal(str(total_importe)),
+                            total_facturas=0,
+                            total_importe=0,
                             categoria=categoria,
                             activo=True
                         )
                         session.add(proveedor_maestro)
                     
                     session.flush()
+                    registrar_aliases_de_maestro(session, proveedor_maestro)
                     stats['proveedores_creados'].append({
                         'id': proveedor_maestro.id,
                         'nombre': nombre_canonico,
@@ -348,9 +348,11 @@ def main():
         logger.info("📋 Migrando proveedores a tabla maestra...")
         stats = migrar_proveedores(db, grupos, dry_run=dry_run)
         
-        # 5. Actualizar facturas
+        # 5. Actualizar facturas y resincronizar totales (por si los triggers no estaban instalados)
         if not dry_run:
             actualizar_facturas(db, grupos, dry_run=False)
+            corregidos = ProveedorMaestroRepository(db).repair_stats()
+            logger.info(f"✅ Totales de {corregidos} proveedores maestros recalculados")
         
         # 6. Resumen
         logger.info("\n" + "="*80)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para (re)construir el catálogo de cuarentena desde disco
+
+Recorre QUARANTINE_PATH, registra cada .meta.json en la tabla quarantine_entries
+y elimina las entradas cuyos archivos ya no existen. Ejecutar una vez tras aplicar
+la migración 20261019_add_quarantine_entries.sql, y cuando se limpie la cuarentena a mano.
+
+Uso:
+    python scripts/rebuild_quarantine_catalog.py
+    python scripts/rebuild_quarantine_catalog.py --path /app/data/quarantine
+"""
+import sys
+import os
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.security.secrets import load_env
+from src.db.database import Database
+from src.pipeline.quarantine_catalog import rebuild_catalog, get_quarantine_base_path
+from src.logging_conf import get_logger
+
+load_env()
+
+logger = get_logger(__name__)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Reconstruir catálogo de cuarentena')
+    parser.add_argument(
+        '--path',
+        type=str,
+        help='Ruta de cuarentena (por defecto desde QUARANTINE_PATH)'
+    )
+    args = parser.parse_args()
+    
+    quarantine_base = Path(args.path) if args.path else get_quarantine_base_path()
+    
+    db = Database()
+    try:
+        # Crea quarantine_entries si aún no existe
+        db.init_db()
+        stats = rebuild_catalog(db, quarantine_base)
+        print(f"✅ Catálogo reconstruido desde {quarantine_base}")
+        print(f"   Registrados: {stats['registrados']}")
+        print(f"   Eliminados (huérfanos): {stats['eliminados']}")
+        print(f"   Errores: {stats['errores']}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
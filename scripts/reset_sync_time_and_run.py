@@ -44,6 +44,8 @@ def reset_sync_time_to_january_2024():
     
     # Establecer nuevo valor
     state_store.set_last_sync_time(january_2024)
+    # Un listado pendiente de la ejecución anterior seguiría con su query antigua
+    state_store.set_list_continuation(None)
     print(f"✅ Nuevo valor: {january_2024.isoformat()}")
     print()
     
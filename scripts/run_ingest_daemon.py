@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Daemon de ingesta incremental: alternativa a cron_ingest_incremental.sh
+
+Mantiene un único proceso con el cliente de Drive, el pool de BD, el cliente de
+OpenAI y las cachés ya inicializados, y ejecuta la ingesta incremental cada
+INGEST_DAEMON_INTERVAL_SEC o antes si llegan notificaciones push de Drive
+(DRIVE_WEBHOOK_URL/DRIVE_WEBHOOK_TOKEN). Usa el mismo JobLock que el cron: si se
+pasa a daemon, quitar la entrada de cron.
+
+Endpoints (INGEST_DAEMON_HTTP_PORT, 8081 por defecto):
+    GET  /health                 Estado en JSON (503 si no está sano)
+    POST /drive/notifications    Notificaciones push de Drive
+
+Uso:
+    python scripts/run_ingest_daemon.py
+
+    # Ejecutar cada 5 minutos, sin servidor HTTP:
+    python scripts/run_ingest_daemon.py --interval 300 --http-port 0
+
+SIGTERM/SIGINT terminan el lote en curso y salen (una segunda señal sale ya).
+"""
+import sys
+import os
+import argparse
+from pathlib import Path
+
+# Agregar raíz del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.security.secrets import load_env
+from src.pipeline.ingest_daemon import IngestDaemon
+from src.logging_conf import get_logger
+
+# Cargar variables de entorno
+load_env()
+
+logger = get_logger(__name__)
+
+
+def parse_args():
+    """Parsear argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Daemon de ingesta incremental desde Google Drive')
+    parser.add_argument(
+        '--interval',
+        type=int,
+        help='Segundos entre ejecuciones (por defecto desde INGEST_DAEMON_INTERVAL_SEC)'
+    )
+    parser.add_argument(
+        '--min-gap',
+        type=int,
+        help='Separación mínima entre ejecuciones adelantadas (por defecto desde INGEST_DAEMON_MIN_GAP_SEC)'
+    )
+    parser.add_argument(
+        '--http-port',
+        type=int,
+        help='Puerto de /health y /drive/notifications, 0 = sin servidor (por defecto desde INGEST_DAEMON_HTTP_PORT)'
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Función principal"""
+    args = parse_args()
+
+    if not os.getenv('GOOGLE_DRIVE_FOLDER_ID'):
+        print("❌ GOOGLE_DRIVE_FOLDER_ID no configurado")
+        return 1
+
+    try:
+        daemon = IngestDaemon(
+            interval_sec=args.interval,
+            min_gap_sec=args.min_gap,
+            http_port=args.http_port
+        )
+    except Exception as e:
+        print(f"❌ Error inicializando daemon: {e}")
+        logger.error(f"Error inicializando daemon: {e}", exc_info=True)
+        return 1
+
+    print(f"🚀 Daemon de ingesta iniciado: cada {daemon.interval_sec}s")
+    if daemon.http_port:
+        print(f"🩺 Health: http://0.0.0.0:{daemon.http_port}/health")
+    if daemon.webhook_url:
+        print(f"🔔 Notificaciones de Drive en {daemon.webhook_url}")
+
+    try:
+        exit_code = daemon.run_forever()
+    except KeyboardInterrupt:
+        print("⚠️  Daemon interrumpido sin esperar al lote en curso")
+        return 130
+
+    print(f"🛑 Daemon detenido tras {daemon.runs_total} ejecuciones ({daemon.runs_failed} fallidas)")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
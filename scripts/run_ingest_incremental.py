@@ -11,6 +11,9 @@ Uso:
     
     # Solo validar (dry-run):
     python scripts/run_ingest_incremental.py --dry-run
+    
+    # Perfilar la ejecución (artefactos en data/profiles/, también con PROFILE_RUN=true):
+    python scripts/run_ingest_incremental.py --profile
 """
 import sys
 import os
@@ -25,12 +28,11 @@ sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(project_root / 'src'))
 
 from src.security.secrets import load_env
-from src.pipeline.ingest_incremental import IncrementalIngestPipeline
 from src.pipeline.job_lock import JobLock
-from src.drive.drive_incremental import DriveIncrementalClient
 from src.sync.state_store import get_state_store
 from src.db.database import Database
 from src.logging_conf import get_logger
+from src.profiling import profile_run, new_run_id, profiling_requested_by_env
 from filelock import Timeout
 
 # Cargar variables de entorno
@@ -94,6 +96,12 @@ def parse_args():
         help='PELIGRO: Resetear último timestamp de sincronización (forzar rescan completo)'
     )
     
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Perfilar la ejecución y guardar artefactos en data/profiles/ (equivale a PROFILE_RUN=true)'
+    )
+    
     return parser.parse_args()
 
 
@@ -150,7 +158,7 @@ def validate_configuration() -> bool:
     return True
 
 
-def dry_run_info(pipeline: IncrementalIngestPipeline):
+def dry_run_info(pipeline: 'IncrementalIngestPipeline'):
     """
     Mostrar información de dry-run sin procesar
     
@@ -167,6 +175,7 @@ def dry_run_info(pipeline: IncrementalIngestPipeline):
     print(f"📦 Tamaño de lote: {pipeline.batch_size}")
     print(f"📄 Máximo de páginas: {pipeline.max_pages_per_run}")
     print(f"⏱️  Pausa entre lotes: {pipeline.sleep_between_batch}s")
+    print(f"🎚️  Lote/pausa adaptativos: {'sí' if pipeline.batch_controller.enabled else 'no'}")
     print(f"🔄 Estrategia de avance: {pipeline.advance_strategy}")
     print()
     
@@ -275,7 +284,9 @@ def main():
     if args.advance_strategy:
         pipeline_kwargs['advance_strategy'] = args.advance_strategy
     
-    # Inicializar pipeline
+    # Inicializar pipeline (se importa aquí: --help y --reset-state no cargan openai ni Drive)
+    from src.pipeline.ingest_incremental import IncrementalIngestPipeline
+    
     try:
         pipeline = IncrementalIngestPipeline(**pipeline_kwargs)
     except Exception as e:
@@ -307,7 +318,12 @@ def main():
     print_banner("⚙️  EJECUTANDO PIPELINE")
     
     try:
-        stats = pipeline.run()
+        profile_enabled = args.profile or profiling_requested_by_env()
+        with profile_run(new_run_id('ingest_incremental'), enabled=profile_enabled) as profile:
+            stats = pipeline.run()
+        
+        if profile.artifacts:
+            print(f"🔬 Perfil guardado en: {', '.join(profile.artifacts)}")
         
         # Mostrar resumen
         print_banner("📊 RESUMEN DE EJECUCIÓN")
@@ -315,7 +331,24 @@ def main():
         print(f"⏱️  Duración: {stats['duration_seconds']}s")
         print(f"📄 Páginas consultadas: {stats['drive_pages_fetched_total']}")
         print(f"📥 Archivos listados: {stats['drive_items_listed_total']}")
+        if stats['drive_list_continuation_pending']:
+            print(f"⏩ Listado incompleto (MAX_PAGES_PER_RUN): la próxima ejecución continúa donde se quedó esta")
         print(f"💾 Archivos descargados: {stats['files_downloaded']}")
+        print(f"⏭️  Sin cambios (omitidos): {stats['files_skipped_unchanged']}")
+        if stats['queue_enqueued_total'] or stats['queue_claimed_total']:
+            print(
+                f"🗂️  Cola: {stats['queue_enqueued_total']} encolados, "
+                f"{stats['queue_claimed_total']} reclamados, "
+                f"{stats['queue_failed_total']} devueltos"
+            )
+        adaptive = stats['adaptive_batching']
+        if adaptive and adaptive['decisions_total']:
+            print(
+                f"🎚️  Control adaptativo: lote final {adaptive['batch_size']}, "
+                f"pausa final {adaptive['sleep_seconds']}s, "
+                f"entre facturas {adaptive['invoice_delay_seconds']}s "
+                f"({adaptive['increases']} subidas, {adaptive['decreases']} bajadas)"
+            )
         print()
         print(f"✅ Procesados OK: {stats['invoices_processed_ok_total']}")
         print(f"🔄 Revisiones: {stats['invoices_revision_total']}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Worker de ingesta: drena la cola persistente ingest_queue
+
+Requiere INGEST_QUEUE_ENABLED=true y la migración 20261019_add_ingest_queue.sql.
+run_ingest_incremental.py lista Drive y encola (con JobLock); este script solo
+reclama lotes con SELECT ... FOR UPDATE SKIP LOCKED, así que se pueden lanzar
+varios a la vez, en esta u otras máquinas contra la misma BD. Si un worker muere,
+sus archivos vuelven a la cola al expirar el lease (INGEST_QUEUE_LEASE_SEC).
+
+Uso:
+    python scripts/run_ingest_worker.py
+    
+    # Seguir esperando trabajo cuando la cola se vacía (consultar cada 60s):
+    python scripts/run_ingest_worker.py --wait-seconds 60
+    
+    # Procesar como máximo 5 lotes de 20 archivos:
+    python scripts/run_ingest_worker.py --max-batches 5 --batch-size 20
+"""
+import sys
+import os
+import time
+import argparse
+from pathlib import Path
+
+# Agregar raíz del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.security.secrets import load_env
+from src.pipeline.ingest_incremental import IncrementalIngestPipeline
+from src.logging_conf import get_logger
+
+# Cargar variables de entorno
+load_env()
+
+logger = get_logger(__name__)
+
+
+def parse_args():
+    """Parsear argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Worker de la cola de ingesta')
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='Archivos reclamados por lote (por defecto desde BATCH_SIZE)'
+    )
+    parser.add_argument(
+        '--max-batches',
+        type=int,
+        help='Lotes máximos a procesar (por defecto hasta vaciar la cola)'
+    )
+    parser.add_argument(
+        '--wait-seconds',
+        type=int,
+        default=0,
+        help='Con la cola vacía, esperar N segundos y volver a consultar (0 = terminar)'
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Función principal"""
+    args = parse_args()
+    
+    if os.getenv('INGEST_QUEUE_ENABLED', 'false').lower() != 'true':
+        print("❌ INGEST_QUEUE_ENABLED no está activo: la ingesta no usa la cola")
+        return 1
+    
+    pipeline = IncrementalIngestPipeline(batch_size=args.batch_size)
+    print(f"⚙️  Worker {pipeline.worker_id} (lotes de {pipeline.batch_size})")
+    
+    try:
+        while True:
+            stats = pipeline.run_worker(max_batches=args.max_batches)
+            if args.wait_seconds <= 0 or args.max_batches:
+                break
+            time.sleep(args.wait_seconds)
+    except KeyboardInterrupt:
+        print("⚠️  Worker interrumpido; los archivos reclamados vuelven a la cola al expirar el lease")
+        return 130
+    
+    print(f"📥 Reclamados: {stats['queue_claimed_total']}")
+    print(f"✅ Procesados OK: {stats['invoices_processed_ok_total']}")
+    print(f"📋 Duplicados: {stats['invoices_duplicate_total']}")
+    print(f"❌ Errores: {stats['invoices_error_total']}")
+    print(f"🔁 Devueltos a la cola: {stats['queue_failed_total']}")
+    
+    return 2 if stats['invoices_error_total'] > 0 or stats['queue_failed_total'] > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
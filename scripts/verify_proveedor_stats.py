@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Script para verificar (y reparar) total_facturas/total_importe de proveedores_maestros
+
+Los triggers de la migración 20261019_add_proveedores_maestros_stats_triggers.sql
+mantienen los contadores al día; este script compara con los valores reales en
+una sola consulta agrupada y, con --repair, los recalcula. Útil tras restaurar un
+backup o cargar datos con los triggers desactivados. Código de salida 1 si hay
+desvíos y no se ha pedido --repair (para usarlo en cron/monitorización).
+
+Uso:
+    python scripts/verify_proveedor_stats.py
+    python scripts/verify_proveedor_stats.py --repair
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.security.secrets import load_env
+from src.db.database import Database
+from src.db.repositories import ProveedorMaestroRepository
+from src.logging_conf import get_logger
+
+load_env()
+
+logger = get_logger(__name__)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Verificar estadísticas de proveedores maestros')
+    parser.add_argument('--repair', action='store_true', help='Recalcular los contadores con desvío')
+    parser.add_argument('--show', type=int, default=20, help='Desvíos a mostrar (por defecto 20)')
+    args = parser.parse_args()
+
+    db = Database()
+    try:
+        repo = ProveedorMaestroRepository(db)
+        desvios = repo.verify_stats()
+
+        if not desvios:
+            print("✅ total_facturas/total_importe coinciden con las facturas procesadas")
+            return 0
+
+        print(f"⚠️  {len(desvios)} proveedores con desvío")
+        for d in desvios[:args.show]:
+            print(
+                f"   #{d['id']} {d['nombre_canonico']}: "
+                f"facturas {d['total_facturas']} → {d['facturas_reales']}, "
+                f"importe {d['total_importe']} → {d['importe_real']:.2f}"
+            )
+        if len(desvios) > args.show:
+            print(f"   ... y {len(desvios) - args.show} más")
+
+        if not args.repair:
+            print("   Ejecutar con --repair para corregirlos")
+            return 1
+
+        corregidos = repo.repair_stats()
+        print(f"✅ {corregidos} proveedores corregidos")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
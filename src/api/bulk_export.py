@@ -0,0 +1,149 @@
+"""
+Exportación masiva de facturas en CSV y Parquet
+
+Pensado para consumidores de datos (contabilidad, notebooks de BI): las filas
+llegan por bloques desde un cursor de servidor y se escriben por bloques
+(CSV en streaming directo, Parquet por record batches con pyarrow), de modo que
+la memoria se mantiene plana con independencia del rango de fechas.
+"""
+import csv
+import importlib.util
+import io
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List
+
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+# pyarrow es opcional: solo necesario para /export/parquet (se importa al exportar,
+# no al arrancar la API)
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Columnas exportadas (mismo orden que FacturaRepository.iter_facturas_bulk_export) y tipo lógico
+BULK_EXPORT_COLUMNS = [
+    ('id', 'int'),
+    ('drive_file_id', 'str'),
+    ('drive_file_name', 'str'),
+    ('numero_factura', 'str'),
+    ('fecha_emision', 'date'),
+    ('fecha_recepcion', 'datetime'),
+    ('proveedor_text', 'str'),
+    ('proveedor_maestro_id', 'int'),
+    ('proveedor_canonico', 'str'),
+    ('nif_cif', 'str'),
+    ('categoria', 'str'),
+    ('categoria_id', 'int'),
+    ('drive_folder_name', 'str'),
+    ('base_imponible', 'decimal'),
+    ('impuestos_total', 'decimal'),
+    ('iva_porcentaje', 'decimal_pct'),
+    ('importe_total', 'decimal'),
+    ('moneda', 'str'),
+    ('confianza', 'str'),
+    ('extractor', 'str'),
+    ('estado', 'str'),
+    ('revision', 'int'),
+    ('creado_en', 'datetime'),
+    ('actualizado_en', 'datetime'),
+]
+
+
+def _csv_value(value):
+    """Serializar valor para CSV (ISO 8601 para fechas, punto decimal para importes)"""
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return value
+
+
+def iter_csv(chunks: Iterable[List]) -> Iterator[bytes]:
+    """
+    Generar CSV por bloques a partir de bloques de filas
+
+    Args:
+        chunks: Iterable de listas de filas (en el orden de BULK_EXPORT_COLUMNS)
+
+    Yields:
+        Bytes UTF-8 (con BOM en el primer bloque para que Excel detecte la codificación)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([name for name, _ in BULK_EXPORT_COLUMNS])
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    total = 0
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows([_csv_value(v) for v in row] for row in chunk)
+        total += len(chunk)
+        yield buffer.getvalue().encode('utf-8')
+
+    logger.info(f"Exportación CSV completada: {total} facturas")
+
+
+def _parquet_schema():
+    """Esquema Arrow de la exportación"""
+    import pyarrow as pa
+
+    tipos = {
+        'int': pa.int64(),
+        'str': pa.string(),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('us'),
+        'decimal': pa.decimal128(18, 2),
+        'decimal_pct': pa.decimal128(5, 2),
+    }
+    return pa.schema([(name, tipos[tipo]) for name, tipo in BULK_EXPORT_COLUMNS])
+
+
+def write_parquet(chunks: Iterable[List], row_group_size: int = 50000) -> str:
+    """
+    Escribir Parquet por bloques (un record batch por bloque de filas) en un archivo temporal
+
+    Args:
+        chunks: Iterable de listas de filas (en el orden de BULK_EXPORT_COLUMNS)
+        row_group_size: Filas máximas por row group
+
+    Returns:
+        Ruta del .parquet temporal (el llamador es responsable de eliminarlo)
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow no está instalado: pip install pyarrow")
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    tmp = tempfile.NamedTemporaryFile(prefix='export_', suffix='.parquet', delete=False)
+    tmp.close()
+
+    total = 0
+    try:
+        with pq.ParquetWriter(tmp.name, schema, compression='snappy') as writer:
+            for chunk in chunks:
+                # Transponer filas → columnas solo para el bloque actual
+                columnas = list(zip(*chunk)) if chunk else [[] for _ in BULK_EXPORT_COLUMNS]
+                batch = pa.record_batch(
+                    [pa.array(list(col), type=field.type) for col, field in zip(columnas, schema)],
+                    schema=schema
+                )
+                writer.write_batch(batch, row_group_size=row_group_size)
+                total += len(chunk)
+    except Exception:
+        os.unlink(tmp.name)
+        raise
+
+    logger.info(f"Exportación Parquet completada: {total} facturas")
+    return tmp.name
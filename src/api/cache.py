@@ -0,0 +1,229 @@
+"""
+Caché en memoria de respuestas del dashboard (TTL + LRU) con ETag
+
+El dashboard consulta periódicamente los mismos endpoints de lectura y los
+datos solo cambian cuando hay ingesta o ediciones manuales. Las respuestas se
+guardan por (ruta + parámetros + versión de datos); cualquier escritura que
+llame a bump_data_version avanza la secuencia data_version_seq al confirmarse
+y deja obsoletas las entradas (las viejas salen por TTL o LRU). El ETag
+permite además responder 304 sin cuerpo cuando el navegador ya tiene la misma
+respuesta.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from src.db.database import get_database
+from src.db.repositories import SyncStateRepository, get_local_data_version
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+# Cada cuánto se relee la versión de datos de BD (cambios de otros procesos, ej. ingesta)
+DATA_VERSION_POLL_SECONDS = float(os.getenv('DATA_VERSION_POLL_SECONDS', '5'))
+
+
+@dataclass
+class CachedResponse:
+    """Respuesta serializada y su ETag"""
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def serialize_response(content: Any, ttl_seconds: float = 0) -> CachedResponse:
+    """
+    Serializar contenido a JSON (mismo formato que JSONResponse) y calcular su ETag
+
+    Args:
+        content: Modelo pydantic o estructura serializable a JSON
+        ttl_seconds: Vigencia de la entrada
+
+    Returns:
+        CachedResponse
+    """
+    body = json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode('utf-8')
+    return CachedResponse(
+        body=body,
+        etag=f'"{hashlib.sha1(body).hexdigest()}"',
+        expires_at=time.monotonic() + ttl_seconds
+    )
+
+
+class ResponseCache:
+    """Caché LRU con expiración por TTL (thread-safe)"""
+
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Obtener entrada vigente (y marcarla como usada recientemente)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, content: Any) -> CachedResponse:
+        """
+        Serializar y guardar una respuesta
+
+        Args:
+            key: Clave de caché
+            content: Modelo pydantic o estructura serializable a JSON
+
+        Returns:
+            Entrada guardada
+        """
+        entry = serialize_response(content, self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Estadísticas de uso"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+response_cache = ResponseCache()
+
+_version_lock = threading.Lock()
+_db_version: Optional[int] = None
+_db_version_read_at = 0.0
+
+
+def _data_version_is_fresh() -> bool:
+    return _db_version is not None and time.monotonic() - _db_version_read_at < DATA_VERSION_POLL_SECONDS
+
+
+def current_data_version() -> Optional[Tuple[int, int]]:
+    """
+    Versión de datos actual: (versión en BD, escrituras confirmadas en este proceso)
+
+    La versión de BD se relee como mucho cada DATA_VERSION_POLL_SECONDS.
+
+    Returns:
+        Tupla de versión, o None si nunca se pudo leer de BD (no cachear)
+    """
+    global _db_version, _db_version_read_at
+    if not _data_version_is_fresh():
+        with _version_lock:
+            if not _data_version_is_fresh():
+                try:
+                    _db_version = SyncStateRepository(get_database()).get_data_version()
+                except Exception as e:
+                    logger.warning(f"No se pudo leer la versión de datos: {e}")
+                _db_version_read_at = time.monotonic()
+    if _db_version is None:
+        return None
+    return _db_version, get_local_data_version()
+
+
+def _cache_key(request: Request, version: Tuple[int, int]) -> str:
+    """Ruta + parámetros ordenados + versión de datos"""
+    params = '&'.join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}#{version[0]}.{version[1]}"
+
+
+def _build_response(request: Request, entry: CachedResponse, cache_status: str) -> Response:
+    """Respuesta 200 con cuerpo o 304 si el cliente ya tiene ese ETag"""
+    headers = {
+        'ETag': entry.etag,
+        'Cache-Control': 'private, no-cache',  # El navegador revalida siempre con If-None-Match
+        'X-Cache': cache_status,
+    }
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and entry.etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type='application/json', headers=headers)
+
+
+def cached_response_sync(request: Request, compute: Callable[[], Any]) -> Response:
+    """
+    Servir desde caché o calcular y guardar (para endpoints síncronos)
+
+    Args:
+        request: Request actual (ruta, parámetros e If-None-Match)
+        compute: Función que genera el contenido de la respuesta
+
+    Returns:
+        Response JSON con ETag (o 304)
+    """
+    version = current_data_version() if CACHE_ENABLED else None
+    if version is None:
+        return _build_response(request, serialize_response(compute()), 'BYPASS')
+
+    key = _cache_key(request, version)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return _build_response(request, entry, 'HIT')
+    return _build_response(request, response_cache.put(key, compute()), 'MISS')
+
+
+async def cached_response(request: Request, compute: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Servir desde caché o calcular y guardar (para endpoints async)
+
+    Args:
+        request: Request actual (ruta, parámetros e If-None-Match)
+        compute: Corrutina sin argumentos que genera el contenido de la respuesta
+
+    Returns:
+        Response JSON con ETag (o 304)
+    """
+    version = None
+    if CACHE_ENABLED:
+        # La lectura de versión en BD es síncrona: solo se va al threadpool cuando toca sondear
+        version = current_data_version() if _data_version_is_fresh() else await run_in_threadpool(current_data_version)
+    if version is None:
+        return _build_response(request, serialize_response(await compute()), 'BYPASS')
+
+    key = _cache_key(request, version)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return _build_response(request, entry, 'HIT')
+    return _build_response(request, response_cache.put(key, await compute()), 'MISS')
@@ -2,23 +2,30 @@
 Dependencias para la API FastAPI
 """
 from functools import lru_cache
-from typing import Generator
+from typing import Generator, Union
 
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException
 
 from src.db.database import Database, get_database
-from src.db.repositories import FacturaRepository, SyncStateRepository
+from src.db.async_database import get_async_database
+from src.db.async_repositories import AsyncFacturaRepository, ThreadpoolFacturaRepository
+from src.db.repositories import FacturaRepository, SyncStateRepository, CostoPersonalRepository
 
 
-def get_db_session() -> Generator[Session, None, None]:
+def get_db_session(
+    db: Database = Depends(get_database)
+) -> Generator[Session, None, None]:
     """
-    Dependency para obtener sesión de base de datos
+    Dependency para obtener sesión de base de datos.
+    Usa el engine compartido (uno por proceso): no crea ni libera pools por request.
+    
+    Args:
+        db: Instancia de Database
     
     Yields:
-        Session de SQLAlchemy
+        Session de SQLAlchemy (commit al terminar, rollback si hay error)
     """
-    db = get_database()
     with db.get_session() as session:
         yield session
 
@@ -38,6 +45,28 @@ def get_factura_repository(
     return FacturaRepository(db)
 
 
+def get_async_factura_repository(
+    db: Database = Depends(get_database)
+) -> Union[AsyncFacturaRepository, ThreadpoolFacturaRepository]:
+    """
+    Dependency para lecturas de facturas desde endpoints async
+    
+    Usa AsyncSession (asyncpg) si está disponible; si no, ejecuta el
+    repositorio síncrono en el threadpool. En ambos casos los métodos se
+    esperan con await y no bloquean el event loop.
+    
+    Args:
+        db: Instancia de Database (para el modo threadpool)
+    
+    Returns:
+        Repositorio con métodos de lectura async
+    """
+    async_db = get_async_database()
+    if async_db is not None:
+        return AsyncFacturaRepository(async_db)
+    return ThreadpoolFacturaRepository(FacturaRepository(db))
+
+
 def get_sync_state_repository(
     db: Database = Depends(get_database)
 ) -> SyncStateRepository:
@@ -52,3 +81,17 @@ def get_sync_state_repository(
     """
     return SyncStateRepository(db)
 
+
+def get_costo_personal_repository(
+    db: Database = Depends(get_database)
+) -> CostoPersonalRepository:
+    """
+    Dependency para obtener CostoPersonalRepository
+    
+    Args:
+        db: Instancia de Database
+    
+    Returns:
+        CostoPersonalRepository
+    """
+    return CostoPersonalRepository(db)
@@ -0,0 +1,192 @@
+"""
+Motor de exportación a Excel en streaming
+
+Usa openpyxl en modo write_only con estilos con nombre: las filas se escriben
+a medida que llegan del cursor de BD y openpyxl las vuelca a disco, así que la
+memoria no crece con el número de filas. El .xlsx resultante se envía por
+trozos con StreamingResponse y se elimina al terminar.
+
+openpyxl se importa al crear el primer StreamingExcelWriter: el router de
+facturas importa este módulo y así no retrasa el arranque de la API.
+"""
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Estilos de celda disponibles para las columnas
+ESTILO_TEXTO = 'texto'
+ESTILO_MONEDA = 'moneda'
+ESTILO_FECHA = 'fecha'
+
+
+class StreamingExcelWriter:
+    """Escritor de una hoja Excel en modo write_only"""
+
+    def __init__(
+        self,
+        sheet_title: str,
+        columns: List[Tuple[str, int, str]],
+        header_color: str = "366092",
+        total_color: str = "E7E6E6"
+    ):
+        """
+        Inicializar workbook, estilos y encabezados
+
+        Args:
+            sheet_title: Nombre de la hoja
+            columns: Lista de (título, ancho, estilo) por columna
+            header_color: Color de fondo de encabezados (hex)
+            total_color: Color de fondo de la fila de totales (hex)
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self._cell_class = WriteOnlyCell
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(sheet_title)
+        self.columns = columns
+        self.row_count = 0
+
+        self._register_styles(header_color, total_color)
+
+        # Anchos de columna (en write_only deben fijarse antes de escribir filas)
+        for idx, (_, width, _) in enumerate(columns):
+            self.sheet.column_dimensions[chr(65 + idx)].width = width
+
+        self.sheet.append([self._cell(title, 'encabezado') for title, _, _ in columns])
+
+    def _register_styles(self, header_color: str, total_color: str):
+        """Registrar estilos con nombre (se guardan una vez en el workbook, no por celda)"""
+        from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment, Border, Side
+
+        border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+        right_alignment = Alignment(horizontal='right', vertical='center')
+
+        styles = [
+            NamedStyle(
+                name='encabezado',
+                font=Font(bold=True, color="FFFFFF", size=11),
+                fill=PatternFill(start_color=header_color, end_color=header_color, fill_type="solid"),
+                alignment=Alignment(horizontal='center', vertical='center'),
+                border=border
+            ),
+            NamedStyle(name=ESTILO_TEXTO, alignment=Alignment(vertical='center'), border=border),
+            NamedStyle(
+                name=ESTILO_MONEDA,
+                number_format='#,##0.00 €',
+                alignment=right_alignment,
+                border=border
+            ),
+            NamedStyle(
+                name=ESTILO_FECHA,
+                number_format='dd/mm/yyyy',
+                alignment=Alignment(horizontal='center', vertical='center'),
+                border=border
+            ),
+            NamedStyle(
+                name='total',
+                font=Font(bold=True),
+                fill=PatternFill(start_color=total_color, end_color=total_color, fill_type="solid"),
+                alignment=right_alignment,
+                border=border
+            ),
+            NamedStyle(
+                name='total_moneda',
+                font=Font(bold=True),
+                fill=PatternFill(start_color=total_color, end_color=total_color, fill_type="solid"),
+                number_format='#,##0.00 €',
+                alignment=right_alignment,
+                border=border
+            ),
+        ]
+        for style in styles:
+            self.workbook.add_named_style(style)
+
+    def _cell(self, value, style: str):
+        """Crear celda write_only (WriteOnlyCell) con estilo con nombre"""
+        cell = self._cell_class(self.sheet, value=value)
+        cell.style = style
+        return cell
+
+    def append(self, values: Iterable):
+        """Escribir una fila de datos aplicando el estilo de cada columna"""
+        self.sheet.append([
+            self._cell(value, style)
+            for value, (_, _, style) in zip(values, self.columns)
+        ])
+        self.row_count += 1
+
+    def append_totals(self, values: Iterable):
+        """Escribir fila de totales (numéricos con formato moneda, redondeados a céntimos)"""
+        self.sheet.append([
+            self._cell(round(value, 2), 'total_moneda') if isinstance(value, (int, float)) else self._cell(value, 'total')
+            for value in values
+        ])
+
+    def save_to_tempfile(self) -> str:
+        """
+        Guardar el workbook en un archivo temporal
+
+        Returns:
+            Ruta del archivo .xlsx (el llamador es responsable de eliminarlo)
+        """
+        tmp = tempfile.NamedTemporaryFile(prefix='export_', suffix='.xlsx', delete=False)
+        tmp.close()
+        try:
+            self.workbook.save(tmp.name)
+        except Exception:
+            os.unlink(tmp.name)
+            raise
+        return tmp.name
+
+
+def iter_file_chunks(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Leer un archivo por trozos y eliminarlo al terminar (o si el cliente corta)"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def excel_streaming_response(path: str, filename: str, extra_headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Construir StreamingResponse para un .xlsx generado en disco
+
+    Args:
+        path: Ruta del archivo temporal
+        filename: Nombre de descarga
+        extra_headers: Cabeceras adicionales
+
+    Returns:
+        StreamingResponse que elimina el archivo al terminar
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Length": str(os.path.getsize(path))
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    return StreamingResponse(
+        iter_file_chunks(path),
+        media_type=EXCEL_MEDIA_TYPE,
+        headers=headers
+    )
@@ -3,12 +3,15 @@ API REST principal para el dashboard de facturas
 """
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
 from dotenv import load_dotenv
+import hmac
 import os
 import sys
+import time
 import uuid
 
 # Cargar variables de entorno PRIMERO (antes de importar rutas que las necesitan)
@@ -16,7 +19,16 @@ load_dotenv()
 
 # Importar rutas después de cargar .env
 from src.api.routes import facturas, system, proveedores, categorias, ingresos, auth, costos_personal
+from src.db.database import close_database, get_database_if_initialized
+from src.db.async_database import close_async_database
 from src.logging_conf import get_logger
+from src.metrics import (
+    HTTP_REQUESTS_TOTAL,
+    HTTP_REQUEST_SECONDS,
+    record_pool_usage,
+    render_with_textfiles,
+)
+from src.profiling import profile_run, new_run_id
 
 # Logger
 logger = get_logger(__name__)
@@ -50,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Profile-Id"],
 )
 
 # Middleware para agregar request_id a logs
@@ -68,13 +81,71 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
             }
         )
         
-        response = await call_next(request)
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            # Plantilla de ruta (ej. /api/facturas/{id}) para no disparar la cardinalidad
+            route = request.scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route_path)
+            HTTP_REQUESTS_TOTAL.inc(method=request.method, route=route_path, status=str(status_code))
         response.headers["X-Request-ID"] = request_id
         
         return response
 
 app.add_middleware(RequestIDMiddleware)
 
+# Emails con permisos de administración (perfilado de requests, /metrics). Vacío = desactivado
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+# Token para que Prometheus lea /metrics (Authorization: Bearer ...). Vacío = solo administradores
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+def is_admin_scope(scope) -> bool:
+    """Si la sesión de la request es de un email de ADMIN_EMAILS"""
+    user = (scope.get('session') or {}).get('user') or {}
+    return (user.get('email') or '').lower() in ADMIN_EMAILS
+
+# Middleware ASGI puro (no BaseHTTPMiddleware) para que el endpoint corra en la misma tarea que el profiler
+class ProfilingMiddleware:
+    """
+    Perfilar la request si lo pide la cabecera X-Profile: 1 o ?profile=1 y la
+    sesión es de un administrador. El run id vuelve en la cabecera X-Profile-Id.
+    Los endpoints síncronos se ejecutan en el threadpool: en el perfil aparecen
+    como espera de run_in_threadpool.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    @staticmethod
+    def _requested(scope) -> bool:
+        header = Headers(scope=scope).get('x-profile', '')
+        query = QueryParams(scope.get('query_string', b'')).get('profile', '')
+        return header.lower() in ('1', 'true') or query.lower() in ('1', 'true')
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._requested(scope) or not is_admin_scope(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        run_id = new_run_id('api')
+        
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).append('X-Profile-Id', run_id)
+            await send(message)
+        
+        logger.info(f"🔬 Perfilando {scope['method']} {scope['path']} ({run_id})")
+        with profile_run(run_id, async_mode=True):
+            await self.app(scope, receive, send_with_profile_id)
+
+# Se ejecuta después de SessionMiddleware y AuthMiddleware (ver orden más abajo)
+app.add_middleware(ProfilingMiddleware)
+
 # Configurar sesiones (debe ir después de CORS pero antes de otros middlewares)
 # Usar clave secreta desde variable de entorno (obligatoria en producción)
 SESSION_SECRET_KEY = os.getenv('SESSION_SECRET_KEY')
@@ -205,6 +276,9 @@ async def shutdown_event():
             "service": "fastapi"
         }
     )
+    # Liberar los engines compartidos por todos los routers
+    close_database()
+    await close_async_database()
 
 
 @app.get("/")
@@ -223,6 +297,36 @@ async def health_check():
     return {"status": "ok"}
 
 
+def _metrics_authorized(request: Request) -> bool:
+    """Administrador con sesión o Authorization: Bearer METRICS_TOKEN"""
+    if is_admin_scope(request.scope):
+        return True
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    return bool(METRICS_TOKEN) and scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """
+    Métricas en formato de exposición de Prometheus
+
+    Incluye las métricas de la API, el uso del pool de conexiones y las
+    métricas que los procesos de ingesta vuelcan junto a METRICS_TEXTFILE_PATH.
+    Requiere sesión de administrador o el token METRICS_TOKEN.
+    """
+    if not _metrics_authorized(request):
+        return JSONResponse(status_code=401, content={"detail": "No autorizado"})
+    # Solo si la API ya abrió el pool: /metrics no debe crear conexiones
+    db = get_database_if_initialized()
+    if db is not None:
+        try:
+            record_pool_usage(db, 'api')
+        except Exception as e:
+            logger.warning(f"No se pudo leer el uso del pool: {e}")
+    content = render_with_textfiles()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Manejador global de excepciones"""
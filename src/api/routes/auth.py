@@ -5,8 +5,6 @@ Verifica tokens de Google y gestiona sesiones seguras
 from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from google.auth.transport import requests
-from google.oauth2 import id_token
 import os
 from typing import Optional
 from pathlib import Path
@@ -91,6 +89,10 @@ async def google_login(
     Verifica el ID token de Google, valida el email contra la whitelist,
     y crea una sesión segura si el usuario está autorizado.
     """
+    # google.auth.transport.requests arrastra requests/urllib3: solo se importa al hacer login
+    from google.auth.transport import requests
+    from google.oauth2 import id_token
+    
     try:
         # Verificar el token de Google
         idinfo = id_token.verify_oauth2_token(
@@ -4,7 +4,7 @@ API endpoints para gestión de categorías
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from pydantic import BaseModel
-from src.db.database import Database
+from src.api.dependencies import get_db_session
 from src.db.models import Categoria
 from sqlalchemy import func
 
@@ -35,22 +35,13 @@ class CategoriaResponse(CategoriaBase):
     class Config:
         from_attributes = True
 
-# Dependency
-def get_db():
-    db = Database()
-    try:
-        with db.get_session() as session:
-            yield session
-    finally:
-        db.close()
-
 @router.get("/categorias", response_model=List[CategoriaResponse])
-async def listar_categorias(
+def listar_categorias(
     activo: Optional[bool] = Query(None, description="Filtrar por estado activo"),
     search: Optional[str] = Query(None, description="Buscar por nombre"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Listar todas las categorías
@@ -87,9 +78,9 @@ async def listar_categorias(
     ]
 
 @router.get("/categorias/{categoria_id}", response_model=CategoriaResponse)
-async def obtener_categoria(
+def obtener_categoria(
     categoria_id: int,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Obtener una categoría específica
@@ -110,9 +101,9 @@ async def obtener_categoria(
     )
 
 @router.post("/categorias", response_model=CategoriaResponse, status_code=201)
-async def crear_categoria(
+def crear_categoria(
     categoria_create: CategoriaCreate,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Crear una nueva categoría
@@ -147,10 +138,10 @@ async def crear_categoria(
     )
 
 @router.put("/categorias/{categoria_id}", response_model=CategoriaResponse)
-async def actualizar_categoria(
+def actualizar_categoria(
     categoria_id: int,
     categoria_update: CategoriaUpdate,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Actualizar una categoría
@@ -194,9 +185,9 @@ async def actualizar_categoria(
     )
 
 @router.delete("/categorias/{categoria_id}", status_code=204)
-async def eliminar_categoria(
+def eliminar_categoria(
     categoria_id: int,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Eliminar (desactivar) una categoría
@@ -4,7 +4,7 @@ API endpoints para gestión de costos de personal mensuales
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from src.db.database import Database
+from src.api.dependencies import get_costo_personal_repository
 from src.db.repositories import CostoPersonalRepository
 
 router = APIRouter(tags=["costos-personal"])
@@ -37,17 +37,8 @@ class CostoPersonalTotalesResponse(BaseModel):
     total_coste_empresa: float
     total_personal: float
 
-# Dependency
-def get_costo_personal_repository():
-    """Dependency para obtener repository de costos de personal"""
-    db = Database()
-    try:
-        return CostoPersonalRepository(db)
-    finally:
-        db.close()
-
 @router.get("/{year}", response_model=List[CostoPersonalResponse])
-async def get_costos_by_year(
+def get_costos_by_year(
     year: int = Path(..., ge=2000, le=2100, description="Año a consultar"),
     repo: CostoPersonalRepository = Depends(get_costo_personal_repository)
 ):
@@ -64,7 +55,7 @@ async def get_costos_by_year(
         raise HTTPException(status_code=500, detail=f"Error al obtener costos: {str(e)}")
 
 @router.get("/{year}/{month}", response_model=CostoPersonalResponse)
-async def get_costo_by_mes(
+def get_costo_by_mes(
     year: int = Path(..., ge=2000, le=2100, description="Año"),
     month: int = Path(..., ge=1, le=12, description="Mes (1-12)"),
     repo: CostoPersonalRepository = Depends(get_costo_personal_repository)
@@ -94,7 +85,7 @@ async def get_costo_by_mes(
         raise HTTPException(status_code=500, detail=f"Error al obtener costo: {str(e)}")
 
 @router.post("", response_model=CostoPersonalResponse, status_code=201)
-async def upsert_costo_personal(
+def upsert_costo_personal(
     costo_data: CostoPersonalCreate,
     repo: CostoPersonalRepository = Depends(get_costo_personal_repository)
 ):
@@ -121,7 +112,7 @@ async def upsert_costo_personal(
         raise HTTPException(status_code=500, detail=f"Error al guardar costo: {str(e)}")
 
 @router.delete("/{id}", status_code=204)
-async def delete_costo_personal(
+def delete_costo_personal(
     id: int,
     repo: CostoPersonalRepository = Depends(get_costo_personal_repository)
 ):
@@ -147,7 +138,7 @@ async def delete_costo_personal(
         raise HTTPException(status_code=500, detail=f"Error al eliminar costo: {str(e)}")
 
 @router.get("/{year}/totales", response_model=CostoPersonalTotalesResponse)
-async def get_totales_by_year(
+def get_totales_by_year(
     year: int = Path(..., ge=2000, le=2100, description="Año a consultar"),
     repo: CostoPersonalRepository = Depends(get_costo_personal_repository)
 ):
@@ -1,12 +1,14 @@
 """
 API endpoints para gestión de ingresos mensuales y análisis de rentabilidad
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List, Optional
 from pydantic import BaseModel
 from decimal import Decimal
 from datetime import date
-from src.db.database import Database
+from src.api.cache import cached_response_sync
+from src.api.dependencies import get_db_session
+from src.db.repositories import bump_data_version
 from src.db.models import IngresoMensual, Factura, CostoPersonal
 from sqlalchemy import func, extract
 
@@ -41,24 +43,16 @@ class IngresoUpsertRequest(BaseModel):
         # Permitir usar 'año' en el modelo aunque el campo en BD sea 'año'
         populate_by_name = True
 
-# Dependency
-def get_db():
-    db = Database()
-    try:
-        with db.get_session() as session:
-            yield session
-    finally:
-        db.close()
-
 @router.get("/rentabilidad/{year}", response_model=RentabilidadResponse)
-async def get_rentabilidad(
+def get_rentabilidad(
+    request: Request,
     year: int,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Obtener análisis de rentabilidad para un año completo
     """
-    try:
+    def compute():
         meses_data = []
         totales_ingresos = 0
         totales_gastos = 0
@@ -154,13 +148,16 @@ async def get_rentabilidad(
                 "margen": round(totales_margen, 1)
             }
         )
+    
+    try:
+        return cached_response_sync(request, compute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener rentabilidad: {str(e)}")
 
 @router.put("/upsert", response_model=dict)
-async def upsert_ingreso(
+def upsert_ingreso(
     request: IngresoUpsertRequest,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Crear o actualizar un ingreso mensual
@@ -192,6 +189,7 @@ async def upsert_ingreso(
             )
             session.add(ingreso)
         
+        bump_data_version(session)
         session.commit()
         session.refresh(ingreso)
         
@@ -4,8 +4,8 @@ API endpoints para gestión de proveedores
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from pydantic import BaseModel
-from src.db.database import Database
-from src.db.models import Proveedor, ProveedorMaestro, Factura
+from src.api.dependencies import get_db_session
+from src.db.models import Proveedor, ProveedorMaestro, ProveedorAlias, Factura
 from sqlalchemy import func, or_
 
 router = APIRouter(prefix="/proveedores", tags=["proveedores"])
@@ -30,23 +30,14 @@ class ProveedorUpdate(BaseModel):
     nif_cif: Optional[str] = None
     email_contacto: Optional[str] = None
 
-# Dependency
-def get_db():
-    db = Database()
-    try:
-        with db.get_session() as session:
-            yield session
-    finally:
-        db.close()
-
 @router.get("", response_model=List[ProveedorResponse])
-async def listar_proveedores(
+def listar_proveedores(
     letra: Optional[str] = Query(None, description="Filtrar por letra inicial"),
     search: Optional[str] = Query(None, description="Buscar por nombre"),
     categoria: Optional[str] = Query(None, description="Filtrar por categoría"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Listar todos los proveedores maestros con sus estadísticas
@@ -98,58 +89,78 @@ async def listar_proveedores(
     return proveedores
 
 @router.get("/autocomplete", response_model=List[dict])
-async def autocomplete_proveedores(
+def autocomplete_proveedores(
     q: str = Query(..., min_length=1, description="Texto de búsqueda"),
     limit: int = Query(10, ge=1, le=50, description="Límite de resultados"),
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Autocompletado de proveedores maestros
-    Busca en nombre_canonico y nombres_alternativos (JSONB)
+    Busca en nombre_canonico y en proveedor_alias con índices GIN pg_trgm
+    (migraciones 20261019_add_proveedores_trgm_indexes.sql y 20261019_add_proveedor_alias.sql);
+    ranking y LIMIT en SQL
     IMPORTANTE: Esta ruta debe estar ANTES de /{proveedor_id} para evitar conflictos
     """
+    from sqlalchemy import select, case, exists
+    
     if not q or len(q.strip()) < 1:
         return []
     
-    search_term = q.strip().upper()
+    search_term = q.strip()
+    patron = '%' + _escape_like(search_term) + '%'
     
-    # Obtener todos los proveedores activos
-    all_proveedores = session.query(ProveedorMaestro).filter(
-        ProveedorMaestro.activo == True
-    ).all()
-    
-    results = []
-    for prov in all_proveedores:
-        # Buscar en nombre_canonico (case insensitive, contiene)
-        nombre_match = False
-        if prov.nombre_canonico:
-            nombre_match = search_term in prov.nombre_canonico.upper()
-        
-        # Buscar en nombres_alternativos (JSONB array)
-        match_in_alternativos = False
-        if prov.nombres_alternativos:
-            for alt in prov.nombres_alternativos:
-                if isinstance(alt, str) and search_term in alt.upper():
-                    match_in_alternativos = True
-                    break
-        
-        # Si hay match en nombre o alternativos, agregar a resultados
-        if nombre_match or match_in_alternativos:
-            results.append({
-                "id": prov.id,
-                "nombre": prov.nombre_canonico,
-                "categoria": prov.categoria,
-                "nif_cif": prov.nif_cif,
-                "match_en_alternativos": match_in_alternativos
-            })
-    
-    # Ordenar por nombre y limitar
-    results.sort(key=lambda x: x['nombre'])
-    return results[:limit]
+    alias_del_proveedor = ProveedorAlias.proveedor_maestro_id == ProveedorMaestro.id
+    match_nombre = ProveedorMaestro.nombre_canonico.ilike(patron, escape='\\')
+    match_alias = exists().where(
+        alias_del_proveedor,
+        ProveedorAlias.alias.ilike(patron, escape='\\')
+    )
+    
+    # Prefijo del nombre primero, luego similitud trigram (nombre o mejor alias)
+    es_prefijo = case((ProveedorMaestro.nombre_canonico.ilike(_escape_like(search_term) + '%', escape='\\'), 1), else_=0)
+    mejor_alias = select(
+        func.max(func.word_similarity(search_term, ProveedorAlias.alias))
+    ).where(alias_del_proveedor).scalar_subquery()
+    similitud = func.greatest(
+        func.similarity(ProveedorMaestro.nombre_canonico, search_term),
+        func.coalesce(mejor_alias, 0)
+    )
+    
+    query = select(
+        ProveedorMaestro.id,
+        ProveedorMaestro.nombre_canonico,
+        ProveedorMaestro.categoria,
+        ProveedorMaestro.nif_cif,
+        match_alias.label('match_en_alternativos')
+    ).where(
+        ProveedorMaestro.activo == True,
+        or_(match_nombre, match_alias)
+    ).order_by(
+        es_prefijo.desc(),
+        similitud.desc(),
+        ProveedorMaestro.nombre_canonico
+    ).limit(limit)
+    
+    return [
+        {
+            "id": row.id,
+            "nombre": row.nombre_canonico,
+            "categoria": row.categoria,
+            "nif_cif": row.nif_cif,
+            "match_en_alternativos": bool(row.match_en_alternativos)
+        }
+        for row in session.execute(query)
+    ]
+
+
+def _escape_like(texto: str) -> str:
+    """Escapar comodines de LIKE (\\, % y _) en texto introducido por el usuario"""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 
 @router.get("/stats/categorias")
-async def estadisticas_categorias(
-    session = Depends(get_db)
+def estadisticas_categorias(
+    session = Depends(get_db_session)
 ):
     """
     Obtener estadísticas por categoría (usando proveedores maestros)
@@ -180,9 +191,9 @@ async def estadisticas_categorias(
     return stats
 
 @router.get("/{proveedor_id}", response_model=ProveedorResponse)
-async def obtener_proveedor(
+def obtener_proveedor(
     proveedor_id: int,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Obtener un proveedor maestro específico con sus estadísticas
@@ -207,10 +218,10 @@ async def obtener_proveedor(
     )
 
 @router.put("/{proveedor_id}")
-async def actualizar_proveedor(
+def actualizar_proveedor(
     proveedor_id: int,
     proveedor_update: ProveedorUpdate,
-    session = Depends(get_db)
+    session = Depends(get_db_session)
 ):
     """
     Actualizar información de un proveedor maestro (principalmente categoría)
@@ -1,12 +1,14 @@
 """
 Endpoints para sistema
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from src.api.cache import cached_response_sync
 from src.api.dependencies import get_sync_state_repository, get_factura_repository
 from src.api.schemas.facturas import SyncStatusResponse
+from src.db.database import Database, get_database
 from src.db.repositories import SyncStateRepository, FacturaRepository
 
 router = APIRouter(prefix="/system", tags=["system"])
@@ -24,8 +26,33 @@ class DataLoadStatsResponse(BaseModel):
     last_sync: Optional[str] = Field(None, description="Última sincronización")
 
 
+class DbPoolStatsResponse(BaseModel):
+    """Response con métricas del pool de conexiones a BD"""
+    pool_class: str = Field(..., description="Clase de pool de SQLAlchemy")
+    pool_size: Optional[int] = Field(None, description="Conexiones persistentes configuradas")
+    max_overflow: Optional[int] = Field(None, description="Conexiones extra permitidas en picos")
+    checked_out: Optional[int] = Field(None, description="Conexiones en uso")
+    checked_in: Optional[int] = Field(None, description="Conexiones libres en el pool")
+    overflow: Optional[int] = Field(None, description="Overflow actual (negativo = capacidad sin abrir)")
+    checkouts_total: int = Field(0, description="Conexiones obtenidas desde el arranque")
+    timeouts_total: int = Field(0, description="Esperas que terminaron en error/timeout")
+    wait_time_total_ms: float = Field(0.0, description="Tiempo total esperando conexión (ms)")
+    wait_time_avg_ms: float = Field(0.0, description="Tiempo medio de espera por conexión (ms)")
+    wait_time_max_ms: float = Field(0.0, description="Máxima espera observada (ms)")
+
+
+@router.get("/db-pool", response_model=DbPoolStatsResponse)
+async def get_db_pool_stats(
+    db: Database = Depends(get_database)
+):
+    """
+    Métricas del pool de conexiones compartido (uso, overflow y tiempo de espera)
+    """
+    return DbPoolStatsResponse(**db.get_pool_stats())
+
+
 @router.get("/sync-status", response_model=SyncStatusResponse)
-async def get_sync_status(
+def get_sync_status(
     repo: SyncStateRepository = Depends(get_sync_state_repository)
 ):
     """
@@ -36,7 +63,6 @@ async def get_sync_status(
         last_sync_value = repo.get_value(STATE_KEY)
         
         # Obtener updated_at desde la BD
-        from src.db.database import get_database
         from src.db.models import SyncState
         from datetime import datetime
         
@@ -59,90 +85,22 @@ async def get_sync_status(
 
 
 @router.get("/data-load-stats", response_model=DataLoadStatsResponse)
-async def get_data_load_stats(
+def get_data_load_stats(
+    request: Request,
     factura_repo: FacturaRepository = Depends(get_factura_repository),
     sync_repo: SyncStateRepository = Depends(get_sync_state_repository)
 ):
     """
     Obtener estadísticas de carga de datos
     """
-    try:
-        import os
-        import json
-        from pathlib import Path
-        
-        # 1. Contar archivos en Drive (desde cuarentena + BD)
-        archivos_drive = 0
-        facturas_cuarentena = 0
-        
-        # Obtener archivos en cuarentena (usar la misma lógica que get_failed_invoices)
-        quarantine_path_env = os.getenv('QUARANTINE_PATH', 'data/quarantine')
+    def compute():
+        from src.db.repositories import QuarantineRepository
         
-        # Resolver desde /app (directorio de trabajo del contenedor)
-        if os.path.isabs(quarantine_path_env):
-            # Si viene como ruta absoluta, extraer solo el nombre relativo
-            parts = Path(quarantine_path_env).parts
-            if 'data' in parts and 'quarantine' in parts:
-                data_idx = parts.index('data')
-                quarantine_path_env = str(Path(*parts[data_idx:]))
-        
-        quarantine_path = Path('/app') / quarantine_path_env
-        
-        # Obtener lista de facturas ya procesadas en BD para filtrar cuarentena
-        # (solo contar archivos que NO están procesados en BD)
-        processed_in_bd = set()
-        with factura_repo.db.get_session() as session:
-            from src.db.models import Factura
-            # Obtener todas las facturas procesadas (estado diferente de 'error' y 'revisar')
-            facturas_procesadas_bd = session.query(Factura.drive_file_name).filter(
-                Factura.drive_file_name.isnot(None),
-                ~Factura.estado.in_(['error', 'revisar'])
-            ).all()
-            processed_in_bd = {f[0] for f in facturas_procesadas_bd if f[0]}
-        
-        # Contar archivos en cuarentena usando la misma lógica que get_failed_invoices
-        # Buscar archivos .meta.json (que es lo que realmente identifica facturas en cuarentena)
-        if quarantine_path.exists():
-            meta_files = list(quarantine_path.rglob("*.meta.json"))
-            archivos_quarantine_count = 0
-            processed_names_quarantine = set()  # Para evitar duplicados
-            
-            for meta_file in meta_files:
-                try:
-                    with open(meta_file, 'r', encoding='utf-8') as f:
-                        meta_data = json.load(f)
-                    
-                    # Extraer nombre del archivo (misma lógica que get_failed_invoices)
-                    file_info = meta_data.get('file_info', {})
-                    nombre = (
-                        meta_data.get('drive_file_name') or 
-                        file_info.get('name') or 
-                        meta_file.stem.replace('.meta', '').split('_', 2)[-1] if '_' in meta_file.stem else meta_file.stem.replace('.meta', '')
-                    )
-                    
-                    # Omitir si es 'unknown' o ya procesado
-                    if nombre == 'unknown':
-                        continue
-                    
-                    if nombre in processed_in_bd:
-                        continue
-                    
-                    # Evitar duplicados entre archivos de cuarentena
-                    if nombre in processed_names_quarantine:
-                        continue
-                    
-                    processed_names_quarantine.add(nombre)
-                    archivos_quarantine_count += 1
-                    
-                except (json.JSONDecodeError, KeyError, IOError):
-                    # Si no se puede leer el meta, usar el nombre del archivo
-                    nombre_archivo = meta_file.stem.replace('.meta', '')
-                    if nombre_archivo and nombre_archivo != 'unknown' and nombre_archivo not in processed_in_bd and nombre_archivo not in processed_names_quarantine:
-                        processed_names_quarantine.add(nombre_archivo)
-                        archivos_quarantine_count += 1
-            
-            facturas_cuarentena = archivos_quarantine_count
-            archivos_drive += facturas_cuarentena
+        # 1. Contar archivos en cuarentena desde el catálogo (misma lógica que get_failed_invoices)
+        # Solo cuenta archivos únicos que NO están procesados en BD (estado distinto de 'error' y 'revisar')
+        facturas_cuarentena = QuarantineRepository(factura_repo.db).count_pending(
+            estados_excluyentes=['procesado', 'pendiente', 'duplicado', 'error_permanente']
+        )
         
         # Contar archivos únicos en BD (por drive_file_name)
         with factura_repo.db.get_session() as session:
@@ -190,6 +148,9 @@ async def get_data_load_stats(
             nivel_calidad=round(nivel_calidad, 2),
             last_sync=last_sync_value
         )
+    
+    try:
+        return cached_response_sync(request, compute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
 
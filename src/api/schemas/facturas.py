@@ -133,11 +133,16 @@ class FailedInvoiceItem(BaseModel):
     """Item del array failed"""
     nombre: str = Field(..., description="Nombre del archivo fallido")
     razon: Optional[str] = Field(None, description="Razón por la que fue enviada a cuarentena o marcada como fallida")
+    fecha: Optional[date] = Field(None, description="Fecha de referencia (emisión o derivada)")
+    source: Optional[str] = Field(None, description="Origen: 'bd' o 'quarantine'")
+    estado: Optional[str] = Field(None, description="Estado: 'error', 'revisar' o 'quarantine'")
 
 
 class FailedInvoicesResponse(BaseModel):
     """Response del endpoint failed"""
     data: List[FailedInvoiceItem]
+    total: Optional[int] = Field(None, description="Total de facturas fallidas que cumplen los filtros")
+    next_cursor: Optional[str] = Field(None, description="Cursor para la siguiente página (None si no hay más)")
 
 
 class FacturaListItem(BaseModel):
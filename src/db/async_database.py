@@ -0,0 +1,177 @@
+"""
+Conexión asíncrona a base de datos (SQLAlchemy AsyncSession + asyncpg)
+
+La usan los endpoints de lectura de la API para no bloquear el event loop
+mientras esperan a PostgreSQL. El pipeline y los scripts siguen usando la
+conexión síncrona de database.py.
+"""
+from contextlib import asynccontextmanager
+import os
+from typing import AsyncGenerator, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__, component="backend")
+
+# asyncpg es opcional: sin él la API ejecuta las consultas síncronas en el threadpool
+try:
+    import asyncpg  # noqa: F401
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    ASYNC_DB_AVAILABLE = True
+except ImportError:
+    ASYNC_DB_AVAILABLE = False
+
+
+# Parámetros de libpq que asyncpg no acepta como argumentos de connect()
+_LIBPQ_TRANSLATED = {'sslmode': 'ssl'}
+_LIBPQ_IGNORED = {
+    'connect_timeout', 'application_name', 'options', 'target_session_attrs', 'client_encoding',
+    'keepalives', 'keepalives_idle', 'keepalives_interval', 'keepalives_count',
+    'gssencmode', 'channel_binding',
+}
+# Certificados de libpq: sin ellos cambiaría la verificación TLS, así que no se descartan
+_LIBPQ_UNSUPPORTED = {'sslcert', 'sslkey', 'sslrootcert', 'sslcrl', 'sslpassword'}
+
+
+def _translate_query(query: str) -> str:
+    """
+    Adaptar los parámetros de la URL de libpq/psycopg2 a los de asyncpg
+
+    sslmode → ssl (asyncpg acepta los mismos valores: disable, require, verify-full...);
+    los parámetros que solo entiende libpq (connect_timeout, application_name...) se descartan.
+
+    Raises:
+        ValueError: Si la URL usa parámetros que no se pueden traducir sin cambiar
+            el comportamiento (certificados TLS de libpq)
+    """
+    params = []
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        if key in _LIBPQ_UNSUPPORTED:
+            raise ValueError(f"parámetro '{key}' de DATABASE_URL no soportado por asyncpg")
+        if key in _LIBPQ_IGNORED:
+            logger.debug(f"Parámetro '{key}' de DATABASE_URL ignorado en la conexión asíncrona")
+            continue
+        params.append((_LIBPQ_TRANSLATED.get(key, key), value))
+    return urlencode(params)
+
+
+def to_async_url(database_url: str) -> Optional[str]:
+    """
+    Convertir DATABASE_URL síncrona a su equivalente con driver asyncpg
+
+    Args:
+        database_url: URL de conexión (postgresql://, postgres:// o postgresql+psycopg2://)
+
+    Returns:
+        URL postgresql+asyncpg:// o None si no es PostgreSQL
+
+    Raises:
+        ValueError: Si los parámetros de la URL no se pueden trasladar a asyncpg
+    """
+    base, _, query = database_url.partition('?')
+    if base.startswith('postgresql+asyncpg://'):
+        async_base = base
+    else:
+        async_base = None
+        for prefix in ('postgresql+psycopg2://', 'postgresql://', 'postgres://'):
+            if base.startswith(prefix):
+                async_base = 'postgresql+asyncpg://' + base[len(prefix):]
+                break
+        if async_base is None:
+            return None
+
+    query = _translate_query(query)
+    return f"{async_base}?{query}" if query else async_base
+
+
+class AsyncDatabase:
+    """Gestión de conexión asíncrona a PostgreSQL"""
+
+    def __init__(self, database_url: str = None):
+        database_url = database_url or os.getenv('DATABASE_URL')
+
+        if not database_url:
+            raise ValueError("DATABASE_URL no configurada")
+
+        self.database_url = to_async_url(database_url)
+        if not self.database_url:
+            raise ValueError("La conexión asíncrona solo está disponible para PostgreSQL")
+
+        # Mismo dimensionado que el pool síncrono (DB_POOL_*)
+        self.engine = create_async_engine(
+            self.database_url,
+            pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '15')),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            pool_pre_ping=True,
+            echo=False
+        )
+
+        self.SessionLocal = async_sessionmaker(
+            self.engine,
+            expire_on_commit=False,
+            autoflush=False
+        )
+
+        logger.info("Conexión asíncrona a base de datos configurada")
+
+    @asynccontextmanager
+    async def get_session(self) -> AsyncGenerator["AsyncSession", None]:
+        """
+        Context manager asíncrono para sesiones de base de datos
+
+        Usage:
+            async with db.get_session() as session:
+                await session.execute(select(Factura))
+        """
+        session = self.SessionLocal()
+        try:
+            yield session
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error en sesión asíncrona de base de datos: {e}")
+            raise
+        finally:
+            await session.close()
+
+    async def close(self):
+        """Cerrar conexión"""
+        await self.engine.dispose()
+        logger.info("Conexión asíncrona a base de datos cerrada")
+
+# Instancia global
+_async_db_instance = None
+_async_db_disabled = False
+
+def get_async_database() -> Optional[AsyncDatabase]:
+    """
+    Obtener instancia singleton de AsyncDatabase
+
+    Returns:
+        AsyncDatabase o None si asyncpg no está instalado, ASYNC_DB_ENABLED=false
+        o DATABASE_URL no es PostgreSQL
+    """
+    global _async_db_instance, _async_db_disabled
+    if _async_db_instance is None and not _async_db_disabled:
+        if not ASYNC_DB_AVAILABLE or os.getenv('ASYNC_DB_ENABLED', 'true').lower() != 'true':
+            _async_db_disabled = True
+            logger.info("Capa asíncrona de BD desactivada: las lecturas de la API usan el threadpool")
+            return None
+        try:
+            _async_db_instance = AsyncDatabase()
+        except ValueError as e:
+            _async_db_disabled = True
+            logger.warning(f"Capa asíncrona de BD no disponible: {e}")
+            return None
+    return _async_db_instance
+
+
+async def close_async_database():
+    """Liberar el engine asíncrono (al apagar la aplicación)"""
+    global _async_db_instance
+    if _async_db_instance is not None:
+        await _async_db_instance.close()
+        _async_db_instance = None
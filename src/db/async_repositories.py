@@ -0,0 +1,114 @@
+"""
+Repositorios asíncronos para los endpoints de lectura de la API
+
+AsyncFacturaRepository ejecuta con AsyncSession las mismas sentencias que
+FacturaRepository (ver builders en repositories.py). Cuando la capa asíncrona
+no está disponible, ThreadpoolFacturaRepository ofrece la misma interfaz
+ejecutando el repositorio síncrono en el threadpool.
+"""
+import asyncio
+from datetime import date
+from typing import List, Optional
+
+from .async_database import AsyncDatabase
+from .repositories import (
+    FacturaRepository,
+    _summary_by_month_stmt,
+    _summary_row_to_dict,
+    _facturas_by_day_stmt,
+    _facturas_by_day_to_list,
+    _facturas_procesadas_month_stmt,
+    _factura_list_item,
+    _factura_recent_item,
+    _categories_breakdown_stmt,
+    _categories_breakdown_to_list,
+    _failed_invoices_stmts,
+    _failed_invoices_page_result,
+)
+
+
+class AsyncFacturaRepository:
+    """Lecturas de facturas con AsyncSession (no bloquean el event loop)"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def get_summary_by_month(self, month: int, year: int) -> dict:
+        """Ver FacturaRepository.get_summary_by_month"""
+        async with self.db.get_session() as session:
+            row = (await session.execute(_summary_by_month_stmt(month, year))).one()
+            return _summary_row_to_dict(row)
+
+    async def get_facturas_by_day(self, month: int, year: int) -> List[dict]:
+        """Ver FacturaRepository.get_facturas_by_day"""
+        async with self.db.get_session() as session:
+            rows = (await session.execute(_facturas_by_day_stmt(month, year))).all()
+            return _facturas_by_day_to_list(rows, month, year)
+
+    async def get_all_facturas_by_month(self, month: int, year: int) -> List[dict]:
+        """Ver FacturaRepository.get_all_facturas_by_month"""
+        async with self.db.get_session() as session:
+            facturas = (await session.scalars(_facturas_procesadas_month_stmt(month, year))).all()
+            return [_factura_list_item(f) for f in facturas]
+
+    async def get_recent_facturas(self, month: int, year: int, limit: int = 5) -> List[dict]:
+        """Ver FacturaRepository.get_recent_facturas"""
+        async with self.db.get_session() as session:
+            facturas = (await session.scalars(_facturas_procesadas_month_stmt(month, year, limit))).all()
+            return [_factura_recent_item(f) for f in facturas]
+
+    async def get_categories_breakdown(self, month: int, year: int) -> List[dict]:
+        """Ver FacturaRepository.get_categories_breakdown"""
+        async with self.db.get_session() as session:
+            rows = (await session.execute(_categories_breakdown_stmt(month, year))).all()
+            return _categories_breakdown_to_list(rows)
+
+    async def get_failed_invoices_page(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        source: Optional[str] = None,
+        estado: Optional[str] = None,
+        reason: Optional[str] = None,
+        decision: Optional[str] = None,
+        after: Optional[tuple] = None,
+        limit: int = 100
+    ) -> dict:
+        """Ver FacturaRepository.get_failed_invoices_page"""
+        stmts = _failed_invoices_stmts(start_date, end_date, source, estado, reason, decision, after, limit)
+        if stmts is None:
+            return {'items': [], 'next': None, 'total': 0}
+        total_stmt, page_stmt = stmts
+
+        async with self.db.get_session() as session:
+            total = (await session.execute(total_stmt)).scalar() or 0
+            rows = (await session.execute(page_stmt)).all()
+            return _failed_invoices_page_result(rows, total, limit)
+
+
+class ThreadpoolFacturaRepository:
+    """
+    Misma interfaz que AsyncFacturaRepository sobre FacturaRepository síncrono:
+    cada lectura se ejecuta en un hilo para no bloquear el event loop
+    """
+
+    def __init__(self, repo: FacturaRepository):
+        self.repo = repo
+
+    async def get_summary_by_month(self, month: int, year: int) -> dict:
+        return await asyncio.to_thread(self.repo.get_summary_by_month, month, year)
+
+    async def get_facturas_by_day(self, month: int, year: int) -> List[dict]:
+        return await asyncio.to_thread(self.repo.get_facturas_by_day, month, year)
+
+    async def get_all_facturas_by_month(self, month: int, year: int) -> List[dict]:
+        return await asyncio.to_thread(self.repo.get_all_facturas_by_month, month, year)
+
+    async def get_recent_facturas(self, month: int, year: int, limit: int = 5) -> List[dict]:
+        return await asyncio.to_thread(self.repo.get_recent_facturas, month, year, limit)
+
+    async def get_categories_breakdown(self, month: int, year: int) -> List[dict]:
+        return await asyncio.to_thread(self.repo.get_categories_breakdown, month, year)
+
+    async def get_failed_invoices_page(self, *args, **kwargs) -> dict:
+        return await asyncio.to_thread(self.repo.get_failed_invoices_page, *args, **kwargs)
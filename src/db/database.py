@@ -6,13 +6,54 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 import os
-from typing import Generator
+import threading
+import time
+from typing import Generator, Optional
 
 from .models import Base
 from src.logging_conf import get_logger
 
 logger = get_logger(__name__, component="backend")
 
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide el tiempo de espera al obtener conexiones"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+    
+    def wait_stats(self) -> dict:
+        """Estadísticas acumuladas de espera (desde el arranque del pool)"""
+        with self._stats_lock:
+            return {
+                'checkouts_total': self._checkouts,
+                'timeouts_total': self._timeouts,
+                'wait_time_total_ms': round(self._wait_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_time_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
 class Database:
     """Gestión de conexión a PostgreSQL"""
     
@@ -22,15 +63,15 @@ class Database:
         if not self.database_url:
             raise ValueError("DATABASE_URL no configurada")
         
-        # Crear engine con pool
-        # Optimizado: pool_size aumentado para mejor concurrencia
+        # Crear engine con pool (configurable por entorno)
         # Cálculo: workers × threads × 1.5 = ~5-8 (usando 5 como base conservadora)
         self.engine = create_engine(
             self.database_url,
-            poolclass=QueuePool,
-            pool_size=5,  # Aumentado de 2 a 5 para mejor throughput concurrente
-            max_overflow=15,  # Aumentado de 10 a 15 para picos más altos
-            pool_timeout=30,
+            poolclass=InstrumentedQueuePool,
+            pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '15')),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),  # Renovar conexiones cada 30 min
             pool_pre_ping=True,  # Verificar conexión antes de usar
             echo=False
         )
@@ -98,6 +139,26 @@ class Database:
         
         logger.info("Tablas de base de datos verificadas")
     
+    def get_pool_stats(self) -> dict:
+        """
+        Métricas del pool de conexiones
+        
+        Returns:
+            Diccionario con tamaño, conexiones en uso/libres, overflow y tiempos de espera
+        """
+        pool = self.engine.pool
+        stats = {
+            'pool_class': type(pool).__name__,
+            'pool_size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+            'max_overflow': getattr(pool, '_max_overflow', None),
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            stats.update(pool.wait_stats())
+        return stats
+    
     def close(self):
         """Cerrar conexión"""
         self.engine.dispose()
@@ -105,10 +166,27 @@ class Database:
 
 # Instancia global
 _db_instance = None
+_db_lock = threading.Lock()
 
 def get_database() -> Database:
-    """Obtener instancia singleton de Database"""
+    """Obtener instancia singleton de Database (un engine y un pool por proceso)"""
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database()
+        with _db_lock:
+            if _db_instance is None:
+                _db_instance = Database()
     return _db_instance
+
+
+def get_database_if_initialized() -> Optional[Database]:
+    """Instancia singleton solo si ya existe (sin crear engine ni conexiones)"""
+    return _db_instance
+
+
+def close_database():
+    """Liberar el engine de la instancia singleton (al apagar la aplicación)"""
+    global _db_instance
+    with _db_lock:
+        if _db_instance is not None:
+            _db_instance.close()
+            _db_instance = None
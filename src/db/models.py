@@ -1,14 +1,45 @@
 """
 Modelos SQLAlchemy para las tablas de la base de datos
 """
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, ForeignKey, CheckConstraint, DECIMAL, Index, Boolean, UniqueConstraint
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, Date, DateTime, Text, ForeignKey, CheckConstraint, DECIMAL, Index, Boolean, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy import func, cast, literal, Computed, Sequence
+from datetime import datetime, date
 
 Base = declarative_base()
 
+# Prioridad de reprocesamiento según error_msg (0 = alta ... 2 = baja). Se guarda como
+# columna generada de facturas: la migración 20261019_add_reprocess_scheduling.sql
+# debe usar la misma expresión
+REPROCESS_PATRONES_BUG_CORREGIDO = [
+    'tipo inválido',
+    'formato inválido',
+    'parsing failed',
+    'validación de negocio falló'
+]
+REPROCESS_PATRONES_TRANSITORIO = [
+    'timeout',
+    'timed out',
+    'rate limit',
+    '429',
+    'connection',
+    'conexión'
+]
+
+
+def _reprocess_prioridad_sql() -> str:
+    """Expresión SQL de la prioridad de reprocesamiento (inmutable, válida en columna generada)"""
+    def ilike_any(patrones):
+        return "error_msg ILIKE ANY (ARRAY[" + ", ".join(f"'%{p}%'" for p in patrones) + "])"
+    return (
+        f"CASE WHEN {ilike_any(REPROCESS_PATRONES_BUG_CORREGIDO)} THEN 0 "
+        f"WHEN {ilike_any(REPROCESS_PATRONES_TRANSITORIO)} THEN 1 "
+        f"ELSE 2 END"
+    )
+
+
 class Proveedor(Base):
     """Tabla de proveedores/clientes (LEGACY - mantener para compatibilidad)"""
     __tablename__ = 'proveedores'
@@ -32,6 +63,7 @@ class ProveedorMaestro(Base):
     nombre_canonico = Column(Text, nullable=False, unique=True)
     nif_cif = Column(Text, unique=True, nullable=True)
     nombres_alternativos = Column(JSONB, nullable=False, default=list)
+    # Mantenidos por los triggers trg_facturas_stats_proveedor_* (facturas 'procesado')
     total_facturas = Column(Integer, default=0)
     total_importe = Column(DECIMAL(18, 2), default=0.00)
     categoria = Column(Text, nullable=True)
@@ -47,6 +79,23 @@ class ProveedorMaestro(Base):
         Index('idx_proveedores_maestros_nombre', 'nombre_canonico'),
     )
 
+
+class ProveedorAlias(Base):
+    """Alias de proveedores maestros con su forma normalizada precalculada (sustituye a recorrer nombres_alternativos)"""
+    __tablename__ = 'proveedor_alias'
+
+    id = Column(Integer, primary_key=True)
+    proveedor_maestro_id = Column(Integer, ForeignKey('proveedores_maestros.id', ondelete='CASCADE'), nullable=False)
+    alias = Column(Text, nullable=False)  # Nombre tal como viene en la factura
+    alias_normalizado = Column(Text, nullable=False)  # normalizar_nombre_proveedor(alias)
+    tokens = Column(ARRAY(Text), nullable=False, default=list)  # Palabras de alias_normalizado
+    creado_en = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_proveedor_alias_normalizado', 'alias_normalizado', unique=True),
+        Index('idx_proveedor_alias_maestro', 'proveedor_maestro_id'),
+    )
+
 class Factura(Base):
     """Tabla principal de facturas"""
     __tablename__ = 'facturas'
@@ -78,6 +127,7 @@ class Factura(Base):
     hash_contenido = Column(Text)
     revision = Column(Integer, default=1)
     drive_modified_time = Column(DateTime)
+    drive_md5_checksum = Column(Text)  # md5Checksum de Drive: permite descartar archivos sin cambios antes de descargar
     
     estado = Column(Text, default='procesado')
     error_msg = Column(Text)
@@ -86,6 +136,8 @@ class Factura(Base):
     reprocess_attempts = Column(Integer, default=0)
     reprocessed_at = Column(DateTime)
     reprocess_reason = Column(Text)
+    reprocess_next_attempt_at = Column(DateTime)  # Backoff exponencial; NULL = elegible ya
+    reprocess_prioridad = Column(SmallInteger, Computed(_reprocess_prioridad_sql(), persisted=True))
     
     # Campo para archivos eliminados de Drive
     deleted_from_drive = Column(Boolean, default=False)
@@ -115,8 +167,30 @@ class Factura(Base):
         Index('idx_facturas_estado', 'estado'),
         Index('idx_facturas_drive_modified', 'drive_modified_time'),
         Index('idx_facturas_deleted', 'deleted_from_drive', postgresql_where=(deleted_from_drive == True)),
+        Index('idx_facturas_drive_file_name', 'drive_file_name'),
+        Index(
+            'idx_facturas_reprocess_cola',
+            reprocess_prioridad,
+            reprocess_next_attempt_at.asc().nulls_first(),
+            postgresql_where=(estado == 'revisar')
+        ),
     )
 
+# Fecha de orden (nunca NULL) de facturas fallidas para paginación keyset en /facturas/failed
+FACTURA_FECHA_ORDEN = func.coalesce(
+    Factura.fecha_emision,
+    cast(Factura.fecha_recepcion, Date),
+    cast(Factura.creado_en, Date),
+    literal(date(1900, 1, 1), Date)
+)
+
+Index(
+    'idx_facturas_fallidas_keyset',
+    FACTURA_FECHA_ORDEN.desc(),
+    Factura.id.desc(),
+    postgresql_where=Factura.estado.in_(['error', 'revisar'])
+)
+
 class IngestEvent(Base):
     """Tabla de eventos de auditoría"""
     __tablename__ = 'ingest_events'
@@ -128,8 +202,66 @@ class IngestEvent(Base):
     detalle = Column(Text)
     hash_contenido = Column(Text)
     decision = Column(Text)
+    timings_ms = Column(JSONB)  # Tiempos por etapa (solo eventos 'ingest_timings')
     ts = Column(DateTime, default=datetime.utcnow)
 
+class QuarantineEntry(Base):
+    """Catálogo de archivos en cuarentena (índice de los .meta.json en disco)"""
+    __tablename__ = 'quarantine_entries'
+    
+    id = Column(BigInteger, primary_key=True)
+    meta_file = Column(Text, nullable=False, unique=True)  # Ruta relativa a QUARANTINE_PATH
+    drive_file_id = Column(Text)
+    drive_file_name = Column(Text, nullable=False)
+    drive_folder_name = Column(Text)
+    decision = Column(Text)  # duplicate/review/... o NULL si viene de handle_failure
+    reason = Column(Text)
+    
+    proveedor_text = Column(Text)
+    importe_total = Column(DECIMAL(18, 2))
+    impuestos_total = Column(DECIMAL(18, 2))
+    fecha_emision = Column(Date)
+    # Fecha efectiva para filtros: fecha_emision > nombre de archivo > modifiedTime > quarantined_at
+    fecha_referencia = Column(Date, nullable=False)
+    drive_modified_time = Column(DateTime)
+    quarantined_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    creado_en = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_quarantine_entries_nombre', 'drive_file_name', 'quarantined_at'),
+        Index('idx_quarantine_entries_fecha', 'fecha_referencia'),
+        Index('idx_quarantine_entries_decision', 'decision'),
+    )
+
+class IngestQueueItem(Base):
+    """Cola persistente de archivos Drive pendientes de ingesta (reclamados con SKIP LOCKED)"""
+    __tablename__ = 'ingest_queue'
+    
+    drive_file_id = Column(Text, primary_key=True)
+    drive_file_name = Column(Text, nullable=False)
+    drive_modified_time = Column(DateTime)  # UTC
+    file_metadata = Column(JSONB, nullable=False)  # Metadatos tal como los devuelve Drive
+    estado = Column(Text, nullable=False, default='pendiente')  # pendiente/en_proceso/completado/error
+    intentos = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(Text)  # Worker que lo tiene reclamado (host:pid)
+    lease_expira_en = Column(DateTime)
+    ultimo_error = Column(Text)
+    encolado_en = Column(DateTime, default=datetime.utcnow)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        CheckConstraint(
+            "estado IN ('pendiente', 'en_proceso', 'completado', 'error')",
+            name='check_ingest_queue_estado'
+        ),
+        Index(
+            'idx_ingest_queue_reclamables',
+            'drive_modified_time',
+            postgresql_where=estado.in_(['pendiente', 'en_proceso'])
+        ),
+    )
+
 class SyncState(Base):
     """Tabla de estado de sincronización incremental"""
     __tablename__ = 'sync_state'
@@ -138,6 +270,10 @@ class SyncState(Base):
     value = Column(Text, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Versión de datos del dashboard (ver repositories.bump_data_version). Es una secuencia
+# y no una fila de sync_state: nextval no bloquea filas y no serializa a los escritores
+data_version_seq = Sequence('data_version_seq', metadata=Base.metadata)
+
 class Categoria(Base):
     """Tabla de categorías para proveedores y otros usos"""
     __tablename__ = 'categorias'
@@ -1,18 +1,354 @@
 """
 Repositorios para operaciones de base de datos
 """
-from typing import List, Dict, Optional
-from datetime import datetime, date, timedelta
+import threading
+from typing import List, Dict, Optional, Iterator, Sequence, Tuple
+from datetime import datetime, date, timedelta, timezone
 from calendar import monthrange
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import func, extract
+from sqlalchemy import func, extract, case, exists, literal, select, union_all, tuple_, event, or_, and_, update, DateTime
+from sqlalchemy.orm import aliased
 
-from .models import Factura, Proveedor, IngestEvent, SyncState, CostoPersonal
+from .models import Factura, Proveedor, ProveedorMaestro, Categoria, IngestEvent, SyncState, CostoPersonal, QuarantineEntry, IngestQueueItem, FACTURA_FECHA_ORDEN, data_version_seq
 from .database import Database
 from src.logging_conf import get_logger
 
 logger = get_logger(__name__)
 
+def _pending_quarantine_entries(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    estados_excluyentes: Optional[List[str]] = None,
+    decision: Optional[str] = None
+):
+    """
+    Construir alias de entradas de cuarentena pendientes: una por nombre de archivo
+    (la más reciente), omitiendo las que ya tienen factura en BD
+    
+    Args:
+        start_date: Fecha inicial (sobre fecha_referencia)
+        end_date: Fecha final (sobre fecha_referencia)
+        estados_excluyentes: Estados de factura que excluyen la entrada (None = cualquier estado)
+        decision: Filtrar por decisión de cuarentena
+    """
+    factura_existe = exists().where(Factura.drive_file_name == QuarantineEntry.drive_file_name)
+    if estados_excluyentes is not None:
+        factura_existe = factura_existe.where(Factura.estado.in_(estados_excluyentes))
+    
+    query = select(QuarantineEntry).where(
+        QuarantineEntry.drive_file_name != 'unknown',
+        ~factura_existe
+    )
+    
+    if start_date is not None and end_date is not None:
+        query = query.where(
+            QuarantineEntry.fecha_referencia >= start_date,
+            QuarantineEntry.fecha_referencia <= end_date
+        )
+    
+    if decision:
+        query = query.where(QuarantineEntry.decision == decision)
+    
+    # DISTINCT ON (drive_file_name): evitar duplicados entre archivos de cuarentena
+    subquery = query.distinct(QuarantineEntry.drive_file_name).order_by(
+        QuarantineEntry.drive_file_name,
+        QuarantineEntry.quarantined_at.desc()
+    ).subquery()
+    
+    return aliased(QuarantineEntry, subquery)
+
+
+def _month_bounds(month: int, year: int) -> Tuple[date, date]:
+    """Primer y último día del mes"""
+    _, last_day = monthrange(year, month)
+    return date(year, month, 1), date(year, month, last_day)
+
+
+# Consultas de lectura del dashboard.
+# Se construyen como sentencias select() independientes de la sesión para que
+# FacturaRepository (Session) y AsyncFacturaRepository (AsyncSession) ejecuten
+# exactamente el mismo SQL y conviertan los resultados igual.
+
+def _summary_by_month_stmt(month: int, year: int):
+    """Resumen mensual en una sola consulta con agregados condicionales (FILTER (WHERE ...))"""
+    start_date, end_date = _month_bounds(month, year)
+    
+    # Usar func.coalesce para usar fecha_emision o fecha_recepcion como fallback
+    fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
+    
+    # Exitosas: facturas procesadas con importe (excluye pendientes)
+    es_exitosa = (
+        Factura.importe_total.isnot(None)
+        & (Factura.importe_total > 0)
+        & (Factura.estado == 'procesado')
+    )
+    # Fallidas: estado error/revisar/pendiente o sin importe_total
+    es_fallida = (
+        Factura.estado.in_(['error', 'revisar', 'pendiente'])
+        | Factura.importe_total.is_(None)
+    )
+    # Solo procesadas en totales y promedio
+    cuenta_en_totales = Factura.importe_total.isnot(None) & (Factura.estado == 'procesado')
+    
+    # Confianza ponderada (alta=100%, media=50%, baja=25%)
+    confianza_score = case(
+        (Factura.confianza == 'alta', 100.0),
+        (Factura.confianza == 'media', 50.0),
+        (Factura.confianza == 'baja', 25.0),
+        else_=0.0
+    )
+    
+    return select(
+        func.count(Factura.id).label('total_facturas'),
+        func.count(Factura.id).filter(es_exitosa).label('facturas_exitosas'),
+        func.count(Factura.id).filter(es_fallida).label('facturas_fallidas'),
+        func.sum(Factura.importe_total).filter(cuenta_en_totales).label('importe_total'),
+        func.avg(Factura.importe_total).filter(cuenta_en_totales).label('promedio_factura'),
+        func.count(func.distinct(Factura.proveedor_text)).label('proveedores_activos'),
+        func.avg(confianza_score).filter(Factura.confianza.isnot(None)).label('confianza_extraccion')
+    ).where(
+        fecha_filtro >= start_date,
+        fecha_filtro <= end_date
+    )
+
+
+def _summary_row_to_dict(row) -> dict:
+    """Convertir fila del resumen mensual"""
+    return {
+        'total_facturas': row.total_facturas or 0,
+        'facturas_exitosas': row.facturas_exitosas or 0,
+        'facturas_fallidas': row.facturas_fallidas or 0,
+        'importe_total': float(row.importe_total or 0.0),
+        'promedio_factura': float(row.promedio_factura or 0.0),
+        'proveedores_activos': row.proveedores_activos or 0,
+        'confianza_extraccion': float(row.confianza_extraccion or 0.0)
+    }
+
+
+def _facturas_by_day_stmt(month: int, year: int):
+    """Facturas procesadas agrupadas por día del mes"""
+    start_date, end_date = _month_bounds(month, year)
+    
+    # Usar fecha_emision si existe, sino usar fecha_recepcion
+    fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
+    dia = extract('day', fecha_filtro)
+    
+    return select(
+        dia.label('dia'),
+        func.count(Factura.id).label('cantidad'),
+        func.sum(Factura.importe_total).label('importe_total'),
+        func.sum(Factura.impuestos_total).label('importe_iva')
+    ).where(
+        fecha_filtro >= start_date,
+        fecha_filtro <= end_date,
+        (Factura.fecha_emision.isnot(None) | Factura.fecha_recepcion.isnot(None)),
+        Factura.estado == 'procesado'  # Solo facturas procesadas
+    ).group_by(dia).order_by(dia)
+
+
+def _facturas_by_day_to_list(rows, month: int, year: int) -> List[dict]:
+    """Completar todos los días del mes con los datos agregados"""
+    _, last_day = monthrange(year, month)
+    
+    # Crear diccionario con todos los días del mes
+    days_dict = {i: {'dia': i, 'cantidad': 0, 'importe_total': 0.0, 'importe_iva': 0.0}
+                for i in range(1, last_day + 1)}
+    
+    # Llenar con datos reales
+    for r in rows:
+        dia = int(r.dia)
+        days_dict[dia] = {
+            'dia': dia,
+            'cantidad': int(r.cantidad),
+            'importe_total': float(r.importe_total or 0.0),
+            'importe_iva': float(r.importe_iva or 0.0)
+        }
+    
+    return list(days_dict.values())
+
+
+def _facturas_procesadas_month_stmt(month: int, year: int, limit: Optional[int] = None):
+    """Facturas procesadas del mes, más recientes primero"""
+    start_date, end_date = _month_bounds(month, year)
+    
+    # Usar fecha_emision si existe, sino usar fecha_recepcion
+    fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
+    
+    query = select(Factura).where(
+        fecha_filtro >= start_date,
+        fecha_filtro <= end_date,
+        Factura.estado == 'procesado'  # Solo facturas procesadas
+    ).order_by(
+        fecha_filtro.desc(),
+        Factura.creado_en.desc()
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _factura_list_item(f: Factura) -> dict:
+    """Convertir factura para el listado mensual"""
+    return {
+        'id': f.id,
+        'proveedor_nombre': f.proveedor_text,
+        'categoria': f.drive_folder_name,  # Nombre de la carpeta = categoría
+        'fecha_emision': f.fecha_emision.isoformat() if f.fecha_emision else None,
+        'impuestos_total': float(f.impuestos_total) if f.impuestos_total else 0.0,
+        'importe_total': float(f.importe_total) if f.importe_total else 0.0
+    }
+
+
+def _factura_recent_item(f: Factura) -> dict:
+    """Convertir factura para el listado de recientes"""
+    return {
+        'id': f.id,
+        'numero_factura': f.numero_factura,
+        'proveedor_nombre': f.proveedor_text,
+        'fecha_emision': f.fecha_emision,
+        'importe_base': float(f.base_imponible) if f.base_imponible else None,
+        'importe_iva': float(f.impuestos_total) if f.impuestos_total else None,
+        'importe_total': float(f.importe_total) if f.importe_total else None
+    }
+
+
+def _categories_breakdown_stmt(month: int, year: int):
+    """Desglose por proveedor (proveedor_id con JOIN, fallback a proveedor_text)"""
+    start_date, end_date = _month_bounds(month, year)
+    
+    # Usar fecha_emision si existe, sino usar fecha_recepcion
+    fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
+    
+    return select(
+        func.coalesce(Proveedor.nombre, Factura.proveedor_text, 'Sin proveedor').label('categoria'),
+        func.count(Factura.id).label('cantidad'),
+        func.sum(Factura.importe_total).label('importe_total')
+    ).select_from(Factura).outerjoin(
+        Proveedor, Factura.proveedor_id == Proveedor.id
+    ).where(
+        fecha_filtro >= start_date,
+        fecha_filtro <= end_date,
+        Factura.estado == 'procesado',  # Solo facturas procesadas
+        (Factura.proveedor_id.isnot(None) | Factura.proveedor_text.isnot(None))
+    ).group_by(
+        Proveedor.nombre, Factura.proveedor_text
+    ).order_by(
+        func.sum(Factura.importe_total).desc()
+    )
+
+
+def _categories_breakdown_to_list(rows) -> List[dict]:
+    """Convertir filas del desglose por categorías"""
+    return [
+        {
+            'categoria': r.categoria or 'Sin proveedor',
+            'cantidad': int(r.cantidad),
+            'importe_total': float(r.importe_total or 0.0)
+        }
+        for r in rows
+    ]
+
+
+def _failed_invoices_stmts(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    source: Optional[str] = None,
+    estado: Optional[str] = None,
+    reason: Optional[str] = None,
+    decision: Optional[str] = None,
+    after: Optional[tuple] = None,
+    limit: int = 100
+):
+    """
+    Construir consultas de total y de página de facturas fallidas
+    (ver FacturaRepository.get_failed_invoices_page)
+    
+    Returns:
+        Tupla (consulta de total, consulta de página con limit+1) o None si ningún origen aplica
+    """
+    ramas = []
+    
+    # Rama BD: usa idx_facturas_fallidas_keyset
+    estados_bd = ['error', 'revisar']
+    if estado:
+        estados_bd = [e for e in estados_bd if e == estado]
+    if source in (None, 'bd') and estados_bd and not decision:
+        rama_bd = select(
+            FACTURA_FECHA_ORDEN.label('fecha'),
+            literal('bd').label('source'),
+            Factura.id.label('id'),
+            Factura.drive_file_name.label('nombre'),
+            Factura.estado.label('estado'),
+            func.coalesce(Factura.error_msg, literal('Estado: ') + Factura.estado).label('razon')
+        ).where(
+            Factura.estado.in_(estados_bd),
+            Factura.drive_file_name.isnot(None)
+        )
+        if start_date is not None and end_date is not None:
+            rama_bd = rama_bd.where(
+                FACTURA_FECHA_ORDEN >= start_date,
+                FACTURA_FECHA_ORDEN <= end_date
+            )
+        ramas.append(rama_bd)
+    
+    # Rama cuarentena: catálogo deduplicado por nombre, sin facturas ya en BD
+    if source in (None, 'quarantine') and estado in (None, 'quarantine'):
+        entry = _pending_quarantine_entries(start_date, end_date, decision=decision)
+        ramas.append(select(
+            entry.fecha_referencia.label('fecha'),
+            literal('quarantine').label('source'),
+            entry.id.label('id'),
+            entry.drive_file_name.label('nombre'),
+            literal('quarantine').label('estado'),
+            entry.reason.label('razon')
+        ))
+    
+    if not ramas:
+        return None
+    
+    fallidas = (union_all(*ramas) if len(ramas) > 1 else ramas[0]).subquery('fallidas')
+    
+    filtros = []
+    if reason:
+        filtros.append(fallidas.c.razon.ilike(f"%{reason}%"))
+    
+    total_stmt = select(func.count()).select_from(fallidas).where(*filtros)
+    
+    page_stmt = select(fallidas).where(*filtros)
+    if after is not None:
+        page_stmt = page_stmt.where(
+            tuple_(fallidas.c.fecha, fallidas.c.source, fallidas.c.id) < tuple_(*after)
+        )
+    page_stmt = page_stmt.order_by(
+        fallidas.c.fecha.desc(),
+        fallidas.c.source.desc(),
+        fallidas.c.id.desc()
+    ).limit(limit + 1)
+    
+    return total_stmt, page_stmt
+
+
+def _failed_invoices_page_result(rows, total: int, limit: int) -> dict:
+    """Recortar la página (limit+1 filas) y calcular la clave de la siguiente"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    items = [
+        {
+            'nombre': row.nombre,
+            'fecha': row.fecha,
+            'source': row.source,
+            'estado': row.estado,
+            'razon': row.razon
+        }
+        for row in rows
+    ]
+    
+    next_key = (rows[-1].fecha, rows[-1].source, rows[-1].id) if has_more else None
+    
+    return {'items': items, 'next': next_key, 'total': total}
+
+
 class FacturaRepository:
     """Repositorio para operaciones con facturas"""
     
@@ -65,6 +401,48 @@ class FacturaRepository:
                 'estado': factura.estado
             }
     
+    def find_unchanged_file_ids(self, files: List[Dict]) -> set:
+        """
+        IDs de archivos listados en Drive que ya están en facturas sin cambios
+        
+        Sin cambios = mismo md5Checksum; si falta el md5 (en Drive o en facturas
+        anteriores a la columna drive_md5_checksum), mismo modifiedTime.
+        process_batch los descartaría igualmente (DuplicateDecision.IGNORE), pero
+        después de descargarlos y extraerlos.
+        
+        Args:
+            files: Metadatos de archivos tal como los devuelve Drive
+        
+        Returns:
+            Conjunto de drive_file_id sin cambios
+        """
+        listados = {f['id']: f for f in files if f.get('id')}
+        if not listados:
+            return set()
+        
+        with self.db.get_session() as session:
+            rows = session.query(
+                Factura.drive_file_id,
+                Factura.drive_md5_checksum,
+                Factura.drive_modified_time
+            ).filter(
+                Factura.drive_file_id.in_(list(listados)),
+                Factura.estado != 'pendiente'
+            ).all()
+        
+        sin_cambios = set()
+        for drive_file_id, md5_bd, modified_bd in rows:
+            file_info = listados[drive_file_id]
+            md5_drive = file_info.get('md5Checksum')
+            
+            if md5_bd and md5_drive:
+                if md5_bd == md5_drive:
+                    sin_cambios.add(drive_file_id)
+            elif modified_bd is not None and modified_bd == _drive_time_to_utc(file_info.get('modifiedTime')):
+                sin_cambios.add(drive_file_id)
+        
+        return sin_cambios
+    
     def find_by_hash(self, hash_contenido: str) -> Optional[dict]:
         """
         Buscar factura por hash_contenido
@@ -247,6 +625,7 @@ class FacturaRepository:
             
             result = session.execute(stmt)
             factura_id = result.scalar()
+            bump_data_version(session)
             
             logger.info(
                 f"Factura upsert exitoso: {factura_data.get('drive_file_name')}",
@@ -387,78 +766,8 @@ class FacturaRepository:
             Diccionario con estadísticas del mes
         """
         with self.db.get_session() as session:
-            # Filtrar facturas del mes
-            # Usar fecha_emision si existe, sino usar fecha_recepcion como fallback
-            start_date = date(year, month, 1)
-            _, last_day = monthrange(year, month)
-            end_date = date(year, month, last_day)
-            
-            # Usar func.coalesce para usar fecha_emision o fecha_recepcion como fallback
-            fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
-            
-            facturas_query = session.query(Factura).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date
-            )
-            
-            total_facturas = facturas_query.count()
-            # Contar exitosas: facturas procesadas (excluye pendientes)
-            facturas_exitosas = facturas_query.filter(
-                Factura.importe_total.isnot(None),
-                Factura.importe_total > 0,
-                Factura.estado == 'procesado'  # Solo procesadas
-            ).count()
-            # Contar fallidas: facturas con estado error/revisar/pendiente o sin importe_total
-            facturas_fallidas = facturas_query.filter(
-                (Factura.estado.in_(['error', 'revisar', 'pendiente'])) | (Factura.importe_total.is_(None))
-            ).count()
-            
-            importe_total = session.query(func.sum(Factura.importe_total)).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.importe_total.isnot(None),
-                Factura.estado == 'procesado'  # Solo procesadas en totales
-            ).scalar() or 0.0
-            
-            promedio_factura = session.query(func.avg(Factura.importe_total)).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.importe_total.isnot(None),
-                Factura.estado == 'procesado'  # Solo procesadas
-            ).scalar() or 0.0
-            
-            proveedores_activos = session.query(
-                func.count(func.distinct(Factura.proveedor_text))
-            ).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.proveedor_text.isnot(None)
-            ).scalar() or 0
-            
-            # Calcular confianza promedio (alta=100%, media=50%, baja=25%)
-            confianza_values = session.query(Factura.confianza).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.confianza.isnot(None)
-            ).all()
-            
-            if confianza_values:
-                confianza_map = {'alta': 100.0, 'media': 50.0, 'baja': 25.0}
-                confianza_promedio = sum(
-                    confianza_map.get(c[0], 0) for c in confianza_values
-                ) / len(confianza_values)
-            else:
-                confianza_promedio = 0.0
-            
-            return {
-                'total_facturas': total_facturas,
-                'facturas_exitosas': facturas_exitosas,
-                'facturas_fallidas': facturas_fallidas,
-                'importe_total': float(importe_total),
-                'promedio_factura': float(promedio_factura),
-                'proveedores_activos': proveedores_activos,
-                'confianza_extraccion': confianza_promedio
-            }
+            row = session.execute(_summary_by_month_stmt(month, year)).one()
+            return _summary_row_to_dict(row)
     
     def get_facturas_by_day(self, month: int, year: int) -> List[dict]:
         """
@@ -472,43 +781,8 @@ class FacturaRepository:
             Lista de diccionarios con datos por día
         """
         with self.db.get_session() as session:
-            start_date = date(year, month, 1)
-            _, last_day = monthrange(year, month)
-            end_date = date(year, month, last_day)
-            
-            # Usar fecha_emision si existe, sino usar fecha_recepcion
-            fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
-            
-            # Agrupar por día usando extract para PostgreSQL
-            results = session.query(
-                extract('day', fecha_filtro).label('dia'),
-                func.count(Factura.id).label('cantidad'),
-                func.sum(Factura.importe_total).label('importe_total'),
-                func.sum(Factura.impuestos_total).label('importe_iva')
-            ).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                (Factura.fecha_emision.isnot(None) | Factura.fecha_recepcion.isnot(None)),
-                Factura.estado == 'procesado'  # Solo facturas procesadas
-            ).group_by(
-                extract('day', fecha_filtro)
-            ).order_by('dia').all()
-            
-            # Crear diccionario con todos los días del mes
-            days_dict = {i: {'dia': i, 'cantidad': 0, 'importe_total': 0.0, 'importe_iva': 0.0} 
-                        for i in range(1, last_day + 1)}
-            
-            # Llenar con datos reales
-            for r in results:
-                dia = int(r.dia)
-                days_dict[dia] = {
-                    'dia': dia,
-                    'cantidad': int(r.cantidad),
-                    'importe_total': float(r.importe_total or 0.0),
-                    'importe_iva': float(r.importe_iva or 0.0)
-                }
-            
-            return list(days_dict.values())
+            rows = session.execute(_facturas_by_day_stmt(month, year)).all()
+            return _facturas_by_day_to_list(rows, month, year)
     
     def get_all_facturas_by_month(self, month: int, year: int) -> List[dict]:
         """
@@ -522,33 +796,132 @@ class FacturaRepository:
             Lista de diccionarios con todas las facturas del mes
         """
         with self.db.get_session() as session:
-            start_date = date(year, month, 1)
-            _, last_day = monthrange(year, month)
-            end_date = date(year, month, last_day)
-            
+            facturas = session.scalars(_facturas_procesadas_month_stmt(month, year)).all()
+            return [_factura_list_item(f) for f in facturas]
+    
+    def iter_facturas_export(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        estados: Sequence[str] = ('procesado',),
+        chunk_size: int = 1000
+    ) -> Iterator:
+        """
+        Iterar facturas de un rango de fechas con cursor de servidor (para exportaciones)
+        
+        Las filas se leen de PostgreSQL por bloques de chunk_size (yield_per), por lo que
+        la memoria no depende del número de facturas. El generador mantiene la sesión
+        abierta hasta consumirse por completo.
+        
+        Args:
+            start_date: Fecha inicial (incluida, None = sin filtro de fecha)
+            end_date: Fecha final (incluida, None = sin filtro de fecha)
+            estados: Estados de factura a incluir
+            chunk_size: Filas por bloque del cursor
+        
+        Yields:
+            Filas con id, drive_file_name, proveedor_text, drive_folder_name, numero_factura,
+            fecha_emision, base_imponible, impuestos_total, importe_total, moneda, estado, error_msg
+        """
+        with self.db.get_session() as session:
             # Usar fecha_emision si existe, sino usar fecha_recepcion
             fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
             
-            facturas = session.query(Factura).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.estado == 'procesado'  # Solo facturas procesadas
+            query = select(
+                Factura.id,
+                Factura.drive_file_name,
+                Factura.proveedor_text,
+                Factura.drive_folder_name,
+                Factura.numero_factura,
+                Factura.fecha_emision,
+                Factura.base_imponible,
+                Factura.impuestos_total,
+                Factura.importe_total,
+                Factura.moneda,
+                Factura.estado,
+                Factura.error_msg
+            ).where(
+                Factura.estado.in_(list(estados))
             ).order_by(
                 fecha_filtro.desc(),
                 Factura.creado_en.desc()
-            ).all()
+            ).execution_options(yield_per=chunk_size)
             
-            return [
-                {
-                    'id': f.id,
-                    'proveedor_nombre': f.proveedor_text,
-                    'categoria': f.drive_folder_name,  # Nombre de la carpeta = categoría
-                    'fecha_emision': f.fecha_emision.isoformat() if f.fecha_emision else None,
-                    'impuestos_total': float(f.impuestos_total) if f.impuestos_total else 0.0,
-                    'importe_total': float(f.importe_total) if f.importe_total else 0.0
-                }
-                for f in facturas
-            ]
+            if start_date is not None and end_date is not None:
+                query = query.where(
+                    fecha_filtro >= start_date,
+                    fecha_filtro <= end_date
+                )
+            
+            for row in session.execute(query):
+                yield row
+    
+    def iter_facturas_bulk_export(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        estados: Optional[Sequence[str]] = ('procesado',),
+        chunk_size: int = 5000
+    ) -> Iterator[List]:
+        """
+        Iterar facturas unidas con proveedores_maestros y categorias, por bloques,
+        con cursor de servidor (para exportaciones CSV/Parquet masivas)
+        
+        Args:
+            start_date: Fecha inicial (incluida, None = sin límite)
+            end_date: Fecha final (incluida, None = sin límite)
+            estados: Estados de factura a incluir (None = todos)
+            chunk_size: Filas por bloque
+        
+        Yields:
+            Listas de filas (Row) con factura, proveedor canónico y categoría
+        """
+        with self.db.get_session() as session:
+            # Usar fecha_emision si existe, sino usar fecha_recepcion
+            fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
+            
+            query = select(
+                Factura.id,
+                Factura.drive_file_id,
+                Factura.drive_file_name,
+                Factura.numero_factura,
+                Factura.fecha_emision,
+                Factura.fecha_recepcion,
+                Factura.proveedor_text,
+                Factura.proveedor_maestro_id,
+                ProveedorMaestro.nombre_canonico.label('proveedor_canonico'),
+                ProveedorMaestro.nif_cif,
+                ProveedorMaestro.categoria,
+                Categoria.id.label('categoria_id'),
+                Factura.drive_folder_name,
+                Factura.base_imponible,
+                Factura.impuestos_total,
+                Factura.iva_porcentaje,
+                Factura.importe_total,
+                Factura.moneda,
+                Factura.confianza,
+                Factura.extractor,
+                Factura.estado,
+                Factura.revision,
+                Factura.creado_en,
+                Factura.actualizado_en
+            ).select_from(Factura).outerjoin(
+                ProveedorMaestro, Factura.proveedor_maestro_id == ProveedorMaestro.id
+            ).outerjoin(
+                Categoria, ProveedorMaestro.categoria == Categoria.nombre
+            ).order_by(
+                Factura.id
+            ).execution_options(yield_per=chunk_size)
+            
+            if start_date is not None:
+                query = query.where(fecha_filtro >= start_date)
+            if end_date is not None:
+                query = query.where(fecha_filtro < end_date + timedelta(days=1))
+            if estados:
+                query = query.where(Factura.estado.in_(list(estados)))
+            
+            for chunk in session.execute(query).partitions():
+                yield chunk
     
     def get_facturas_pendientes_by_month(self, month: int, year: int) -> List[dict]:
         """
@@ -606,34 +979,8 @@ class FacturaRepository:
             Lista de diccionarios con facturas recientes
         """
         with self.db.get_session() as session:
-            start_date = date(year, month, 1)
-            _, last_day = monthrange(year, month)
-            end_date = date(year, month, last_day)
-            
-            # Usar fecha_emision si existe, sino usar fecha_recepcion
-            fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
-            
-            facturas = session.query(Factura).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.estado == 'procesado'  # Solo facturas procesadas
-            ).order_by(
-                fecha_filtro.desc(),
-                Factura.creado_en.desc()
-            ).limit(limit).all()
-            
-            return [
-                {
-                    'id': f.id,
-                    'numero_factura': f.numero_factura,
-                    'proveedor_nombre': f.proveedor_text,
-                    'fecha_emision': f.fecha_emision,
-                    'importe_base': float(f.base_imponible) if f.base_imponible else None,
-                    'importe_iva': float(f.impuestos_total) if f.impuestos_total else None,
-                    'importe_total': float(f.importe_total) if f.importe_total else None
-                }
-                for f in facturas
-            ]
+            facturas = session.scalars(_facturas_procesadas_month_stmt(month, year, limit)).all()
+            return [_factura_recent_item(f) for f in facturas]
     
     def get_categories_breakdown(self, month: int, year: int) -> List[dict]:
         """
@@ -647,40 +994,8 @@ class FacturaRepository:
             Lista de diccionarios con datos por categoría
         """
         with self.db.get_session() as session:
-            start_date = date(year, month, 1)
-            _, last_day = monthrange(year, month)
-            end_date = date(year, month, last_day)
-            
-            # Usar fecha_emision si existe, sino usar fecha_recepcion
-            fecha_filtro = func.coalesce(Factura.fecha_emision, Factura.fecha_recepcion)
-            
-            # OPTIMIZACIÓN: Usar proveedor_id con JOIN para mejor rendimiento
-            # Fallback a proveedor_text si proveedor_id es NULL (compatibilidad)
-            results = session.query(
-                func.coalesce(Proveedor.nombre, Factura.proveedor_text, 'Sin proveedor').label('categoria'),
-                func.count(Factura.id).label('cantidad'),
-                func.sum(Factura.importe_total).label('importe_total')
-            ).outerjoin(
-                Proveedor, Factura.proveedor_id == Proveedor.id
-            ).filter(
-                fecha_filtro >= start_date,
-                fecha_filtro <= end_date,
-                Factura.estado == 'procesado',  # Solo facturas procesadas
-                (Factura.proveedor_id.isnot(None) | Factura.proveedor_text.isnot(None))
-            ).group_by(
-                Proveedor.nombre, Factura.proveedor_text
-            ).order_by(
-                func.sum(Factura.importe_total).desc()
-            ).all()
-            
-            return [
-                {
-                    'categoria': r.categoria or 'Sin proveedor',
-                    'cantidad': int(r.cantidad),
-                    'importe_total': float(r.importe_total or 0.0)
-                }
-                for r in results
-            ]
+            rows = session.execute(_categories_breakdown_stmt(month, year)).all()
+            return _categories_breakdown_to_list(rows)
     
     def get_facturas_para_reprocesar(
         self,
@@ -690,7 +1005,11 @@ class FacturaRepository:
         max_attempts: int = 3
     ) -> List[dict]:
         """
-        Obtener facturas que requieren reprocesamiento
+        Obtener facturas cuyo reintento de reprocesamiento ya toca
+        
+        Orden: prioridad (columna generada desde error_msg), luego las que nunca se
+        han reintentado o llevan más tiempo esperando, luego las más recientes.
+        Las que están en backoff (reprocess_next_attempt_at futuro) no se devuelven.
         
         Args:
             estado: Estado de facturas a buscar (default: 'revisar')
@@ -705,39 +1024,19 @@ class FacturaRepository:
             # Calcular fecha límite
             fecha_limite = datetime.utcnow() - timedelta(days=max_dias)
             
-            # Patrones de error de alta prioridad (bugs conocidos)
-            high_priority_patterns = [
-                'tipo inválido',
-                'formato inválido',
-                'parsing failed',
-                'Validación de negocio falló'
-            ]
-            
-            # Query base: facturas en estado, últimos N días, intentos < máximo
-            base_query = session.query(Factura).filter(
+            facturas = session.query(Factura).filter(
                 Factura.estado == estado,
                 Factura.actualizado_en >= fecha_limite,
-                Factura.reprocess_attempts < max_attempts
-            )
-            
-            # Obtener todas las facturas que cumplen criterios
-            facturas = base_query.order_by(
+                Factura.reprocess_attempts < max_attempts,
+                or_(
+                    Factura.reprocess_next_attempt_at.is_(None),
+                    Factura.reprocess_next_attempt_at <= datetime.utcnow()
+                )
+            ).order_by(
+                Factura.reprocess_prioridad,
+                Factura.reprocess_next_attempt_at.asc().nulls_first(),
                 Factura.actualizado_en.desc()
-            ).limit(limite * 2).all()  # Obtener más para priorizar
-            
-            # Priorizar por error_msg
-            def get_priority(factura):
-                error_msg = (factura.error_msg or '').lower()
-                for pattern in high_priority_patterns:
-                    if pattern.lower() in error_msg:
-                        return 0  # Alta prioridad
-                return 1  # Baja prioridad
-            
-            # Ordenar por prioridad y luego por fecha
-            facturas_priorizadas = sorted(facturas, key=lambda f: (get_priority(f), f.actualizado_en), reverse=True)
-            
-            # Limitar resultado
-            facturas_priorizadas = facturas_priorizadas[:limite]
+            ).limit(limite).all()
             
             return [
                 {
@@ -748,24 +1047,32 @@ class FacturaRepository:
                     'estado': f.estado,
                     'error_msg': f.error_msg,
                     'reprocess_attempts': f.reprocess_attempts or 0,
+                    'reprocess_prioridad': f.reprocess_prioridad,
                     'actualizado_en': f.actualizado_en
                 }
-                for f in facturas_priorizadas
+                for f in facturas
             ]
     
     def increment_reprocess_attempts(
         self,
         factura_id: int,
         reason: str,
-        max_attempts: int = 3
+        max_attempts: int = 3,
+        backoff_base_minutes: int = 60,
+        backoff_max_minutes: int = 2880
     ) -> bool:
         """
-        Incrementar contador de intentos de reprocesamiento
+        Incrementar contador de intentos de reprocesamiento y programar el siguiente
+        
+        El siguiente intento se retrasa backoff_base_minutes * 2^(intentos-1),
+        con un máximo de backoff_max_minutes.
         
         Args:
             factura_id: ID de la factura
             reason: Razón del reprocesamiento
             max_attempts: Máximo de intentos permitidos
+            backoff_base_minutes: Espera tras el primer fallo
+            backoff_max_minutes: Espera máxima entre intentos
         
         Returns:
             True si se alcanzó el máximo (cambió a error_permanente), False en caso contrario
@@ -784,10 +1091,16 @@ class FacturaRepository:
             factura.reprocessed_at = datetime.utcnow()
             factura.reprocess_reason = reason
             
+            # Backoff exponencial hasta el próximo intento
+            espera_min = min(backoff_base_minutes * 2 ** (factura.reprocess_attempts - 1), backoff_max_minutes)
+            factura.reprocess_next_attempt_at = factura.reprocessed_at + timedelta(minutes=espera_min)
+            
             # Si alcanza máximo, cambiar a error_permanente
             if factura.reprocess_attempts >= max_attempts:
                 factura.estado = 'error_permanente'
                 factura.error_msg = (factura.error_msg or '') + f' | Máximo de intentos de reprocesamiento alcanzado ({max_attempts})'
+                # El cambio de estado altera los contadores de fallidas del dashboard
+                bump_data_version(session)
                 logger.warning(
                     f"Factura {factura_id} alcanzó máximo de intentos, marcada como error_permanente",
                     extra={'drive_file_id': factura.drive_file_id}
@@ -822,6 +1135,7 @@ class FacturaRepository:
                 factura.actualizado_en = datetime.utcnow()
             
             if count > 0:
+                bump_data_version(session)
                 session.commit()
                 logger.info(f"Limpieza de facturas pendientes: {count} facturas marcadas como error")
             
@@ -870,6 +1184,45 @@ class FacturaRepository:
                 for f in facturas
             ]
 
+    def get_failed_invoices_page(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        source: Optional[str] = None,
+        estado: Optional[str] = None,
+        reason: Optional[str] = None,
+        decision: Optional[str] = None,
+        after: Optional[tuple] = None,
+        limit: int = 100
+    ) -> dict:
+        """
+        Obtener una página de facturas fallidas (BD con estado 'error'/'revisar' + catálogo
+        de cuarentena) con paginación keyset sobre (fecha, source, id), más recientes primero
+        
+        Args:
+            start_date: Fecha inicial (opcional)
+            end_date: Fecha final (opcional)
+            source: 'bd' o 'quarantine' (None = ambos)
+            estado: 'error', 'revisar' o 'quarantine' (None = todos)
+            reason: Texto a buscar en la razón (ILIKE)
+            decision: Decisión de cuarentena (solo aplica a cuarentena)
+            after: Clave (fecha, source, id) de la última fila de la página anterior
+            limit: Tamaño de página
+        
+        Returns:
+            Diccionario con 'items', 'next' (clave para la siguiente página o None) y 'total'
+        """
+        stmts = _failed_invoices_stmts(start_date, end_date, source, estado, reason, decision, after, limit)
+        if stmts is None:
+            return {'items': [], 'next': None, 'total': 0}
+        total_stmt, page_stmt = stmts
+        
+        with self.db.get_session() as session:
+            total = session.execute(total_stmt).scalar() or 0
+            rows = session.execute(page_stmt).all()
+            return _failed_invoices_page_result(rows, total, limit)
+
+
 class EventRepository:
     """Repositorio para eventos de auditoría"""
     
@@ -883,7 +1236,8 @@ class EventRepository:
         nivel: str,
         detalle: str = None,
         hash_contenido: str = None,
-        decision: str = None
+        decision: str = None,
+        timings_ms: dict = None
     ):
         """
         Insertar evento de auditoría
@@ -895,6 +1249,7 @@ class EventRepository:
             detalle: Detalles adicionales del evento
             hash_contenido: Hash de contenido de la factura (para detección de duplicados)
             decision: Decisión tomada (insert, duplicate, review, etc.)
+            timings_ms: Tiempos por etapa en ms (eventos 'ingest_timings')
         """
         with self.db.get_session() as session:
             event = IngestEvent(
@@ -904,6 +1259,7 @@ class EventRepository:
                 detalle=detalle,
                 hash_contenido=hash_contenido,
                 decision=decision,
+                timings_ms=timings_ms,
                 ts=datetime.utcnow()
             )
             session.add(event)
@@ -976,6 +1332,148 @@ class ProveedorRepository:
             
             return nuevo_proveedor.id
 
+
+def _proveedor_stats_reales_stmt():
+    """
+    Totales reales por proveedor maestro en una consulta agrupada
+    (misma definición que los triggers trg_facturas_stats_proveedor_*: facturas 'procesado')
+    """
+    reales = select(
+        Factura.proveedor_maestro_id,
+        func.count(Factura.id).label('n'),
+        func.coalesce(func.sum(Factura.importe_total), 0).label('importe')
+    ).where(
+        Factura.estado == 'procesado',
+        Factura.proveedor_maestro_id.isnot(None)
+    ).group_by(Factura.proveedor_maestro_id).subquery()
+
+    return select(
+        ProveedorMaestro.id,
+        ProveedorMaestro.nombre_canonico,
+        ProveedorMaestro.total_facturas,
+        ProveedorMaestro.total_importe,
+        func.coalesce(reales.c.n, 0).label('facturas_reales'),
+        func.coalesce(reales.c.importe, 0).label('importe_real')
+    ).outerjoin(reales, reales.c.proveedor_maestro_id == ProveedorMaestro.id)
+
+
+class ProveedorMaestroRepository:
+    """Repositorio para las estadísticas de proveedores maestros"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def verify_stats(self) -> List[dict]:
+        """
+        Comparar total_facturas/total_importe con los valores reales
+
+        Returns:
+            Lista de proveedores con desvío (guardado vs real)
+        """
+        stmt = _proveedor_stats_reales_stmt().subquery()
+        query = select(stmt).where(
+            stmt.c.total_facturas.is_distinct_from(stmt.c.facturas_reales) |
+            stmt.c.total_importe.is_distinct_from(stmt.c.importe_real)
+        ).order_by(stmt.c.id)
+
+        with self.db.get_session() as session:
+            return [
+                {
+                    'id': row.id,
+                    'nombre_canonico': row.nombre_canonico,
+                    'total_facturas': row.total_facturas,
+                    'facturas_reales': row.facturas_reales,
+                    'total_importe': float(row.total_importe) if row.total_importe is not None else None,
+                    'importe_real': float(row.importe_real)
+                }
+                for row in session.execute(query)
+            ]
+
+    def repair_stats(self) -> int:
+        """
+        Recalcular los totales de todos los proveedores con una sola consulta agrupada.
+        Bloquea escrituras en facturas (SHARE) durante el recálculo para no perder
+        deltas de los triggers que se confirmen a la vez.
+
+        Returns:
+            Número de proveedores corregidos
+        """
+        from sqlalchemy import text, update
+
+        stmt = _proveedor_stats_reales_stmt().subquery()
+        query = update(ProveedorMaestro).where(
+            ProveedorMaestro.id == stmt.c.id,
+            ProveedorMaestro.total_facturas.is_distinct_from(stmt.c.facturas_reales) |
+            ProveedorMaestro.total_importe.is_distinct_from(stmt.c.importe_real)
+        ).values(
+            total_facturas=stmt.c.facturas_reales,
+            total_importe=stmt.c.importe_real
+        ).execution_options(synchronize_session=False)
+
+        with self.db.get_session() as session:
+            session.execute(text("LOCK TABLE facturas IN SHARE MODE"))
+            corregidos = session.execute(query).rowcount
+            if corregidos:
+                bump_data_version(session)
+
+        if corregidos:
+            logger.info(f"Estadísticas de proveedores maestros corregidas: {corregidos}")
+        return corregidos
+
+
+# Versión de datos: secuencia data_version_seq que avanza tras cada escritura que
+# afecta al dashboard (facturas, ingresos, costos). La caché de respuestas de la
+# API la usa como clave de invalidación, también entre procesos.
+# Claves de sync_state que muestra el dashboard (system/data-load-stats); el resto
+# (drive_list_continuation...) es estado interno y no invalida la caché
+DASHBOARD_SYNC_STATE_KEYS = frozenset({'drive_last_sync_time'})
+
+_local_data_version = 0
+_local_data_version_lock = threading.Lock()
+
+
+def _on_data_version_commit(session):
+    """
+    Tras confirmar la escritura: avanzar la secuencia y avisar a la caché local
+
+    nextval no es transaccional, así que se pide después del commit: si se pidiera
+    antes, un lector podría ver la versión nueva con los datos viejos y cachearlos.
+    """
+    global _local_data_version
+    session.info.pop('data_version_bumped', None)
+    with _local_data_version_lock:
+        _local_data_version += 1
+
+    try:
+        with session.get_bind().connect() as connection:
+            connection.execute(select(data_version_seq.next_value()))
+    except Exception as e:
+        # Los datos ya están confirmados: otros procesos verán el cambio al caducar el TTL
+        logger.warning(f"No se pudo avanzar data_version_seq: {e}")
+
+
+def bump_data_version(session) -> None:
+    """
+    Marcar que la transacción cambia datos del dashboard
+
+    La secuencia avanza al confirmar la sesión (una vez por transacción); no se
+    toca ninguna fila, así que escritores concurrentes no se bloquean entre sí.
+
+    Args:
+        session: Sesión de la escritura
+    """
+    if session.info.get('data_version_bumped'):
+        return  # Una vez por transacción
+
+    session.info['data_version_bumped'] = True
+    event.listen(session, 'after_commit', _on_data_version_commit, once=True)
+
+
+def get_local_data_version() -> int:
+    """Número de escrituras confirmadas desde este proceso"""
+    return _local_data_version
+
+
 class SyncStateRepository:
     """Repositorio para el estado de sincronización incremental"""
     
@@ -1021,8 +1519,26 @@ class SyncStateRepository:
                 state = SyncState(key=key, value=value)
                 session.add(state)
             
+            if key in DASHBOARD_SYNC_STATE_KEYS:
+                bump_data_version(session)
+            
             logger.debug(f"Estado actualizado: {key} = {value}")
     
+    def get_data_version(self) -> int:
+        """
+        Obtener la versión de datos actual (ver bump_data_version)
+        
+        Returns:
+            Versión (0 si nunca se ha escrito)
+        """
+        from sqlalchemy import text
+
+        with self.db.get_session() as session:
+            last_value, is_called = session.execute(
+                text("SELECT last_value, is_called FROM data_version_seq")
+            ).one()
+            return int(last_value) if is_called else 0
+    
     def delete_value(self, key: str):
         """
         Eliminar valor de estado
@@ -1038,6 +1554,389 @@ class SyncStateRepository:
             logger.debug(f"Estado eliminado: {key}")
 
 
+def _drive_time_to_utc(modified_time: Optional[str]) -> Optional[datetime]:
+    """Parsear modifiedTime de Drive (RFC 3339) a datetime UTC naive"""
+    if not modified_time:
+        return None
+    try:
+        parsed = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class IngestQueueRepository:
+    """
+    Repositorio para la cola persistente de ingesta (tabla ingest_queue)
+    
+    El listado de Drive encola archivos y cualquier número de workers (procesos o
+    máquinas) los reclama con SELECT ... FOR UPDATE SKIP LOCKED. Cada reclamación
+    lleva un lease: si el worker muere, el archivo vuelve a estar disponible cuando
+    expira. Las horas se toman del reloj de la BD para no depender del de cada máquina.
+    """
+    
+    def __init__(self, db: Database):
+        self.db = db
+    
+    @staticmethod
+    def _ahora():
+        """now() de PostgreSQL en UTC sin zona (mismo formato que el resto de columnas)"""
+        return func.timezone('UTC', func.now(), type_=DateTime)
+    
+    def enqueue(self, files: List[Dict]) -> int:
+        """
+        Encolar archivos listados desde Drive
+        
+        Un archivo ya encolado solo vuelve a 'pendiente' si su modifiedTime es más
+        reciente (nueva versión en Drive); así el solape de SYNC_WINDOW_MINUTES no
+        reprocesa archivos ya completados.
+        
+        Args:
+            files: Metadatos de archivos tal como los devuelve Drive ('id', 'name', 'modifiedTime', ...)
+        
+        Returns:
+            Número de archivos encolados (nuevos o con nueva versión)
+        """
+        rows = {}
+        for file_info in files:
+            metadata = {k: v for k, v in file_info.items() if k not in ('local_path', 'folder_name')}
+            rows[file_info['id']] = {
+                'drive_file_id': file_info['id'],
+                'drive_file_name': file_info.get('name') or file_info['id'],
+                'drive_modified_time': _drive_time_to_utc(file_info.get('modifiedTime')),
+                'file_metadata': metadata,
+                'estado': 'pendiente',
+                'intentos': 0
+            }
+        
+        if not rows:
+            return 0
+        
+        stmt = insert(IngestQueueItem).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['drive_file_id'],
+            set_={
+                'drive_file_name': stmt.excluded.drive_file_name,
+                'drive_modified_time': stmt.excluded.drive_modified_time,
+                'file_metadata': stmt.excluded.file_metadata,
+                'estado': 'pendiente',
+                'intentos': 0,
+                'lease_owner': None,
+                'lease_expira_en': None,
+                'ultimo_error': None,
+                'encolado_en': self._ahora(),
+                'actualizado_en': self._ahora()
+            },
+            where=or_(
+                IngestQueueItem.drive_modified_time.is_(None),
+                stmt.excluded.drive_modified_time > IngestQueueItem.drive_modified_time
+            )
+        )
+        
+        with self.db.get_session() as session:
+            encolados = session.execute(stmt).rowcount
+        
+        logger.debug(f"Cola de ingesta: {encolados}/{len(rows)} archivos encolados")
+        return encolados
+    
+    def claim(self, worker_id: str, limit: int, lease_seconds: int, max_attempts: int) -> List[Dict]:
+        """
+        Reclamar hasta `limit` archivos pendientes (o con lease expirado) para un worker
+        
+        Los archivos bloqueados por otro worker se saltan (SKIP LOCKED), así varios
+        workers reclaman lotes disjuntos sin esperarse entre sí.
+        
+        Args:
+            worker_id: Identificador del worker (host:pid)
+            limit: Número máximo de archivos
+            lease_seconds: Duración del lease
+            max_attempts: Intentos máximos por archivo
+        
+        Returns:
+            Metadatos Drive de los archivos reclamados, con 'queue_attempts' (intento actual)
+        """
+        ahora = self._ahora()
+        
+        # Leases expirados sin intentos restantes: el worker murió procesándolos demasiadas veces
+        agotados = update(IngestQueueItem).where(
+            IngestQueueItem.estado == 'en_proceso',
+            IngestQueueItem.lease_expira_en < ahora,
+            IngestQueueItem.intentos >= max_attempts
+        ).values(
+            estado='error',
+            lease_owner=None,
+            lease_expira_en=None,
+            ultimo_error='Lease expirado sin completar tras el máximo de intentos',
+            actualizado_en=ahora
+        ).execution_options(synchronize_session=False)
+        
+        reclamables = select(IngestQueueItem.drive_file_id).where(
+            or_(
+                IngestQueueItem.estado == 'pendiente',
+                and_(
+                    IngestQueueItem.estado == 'en_proceso',
+                    IngestQueueItem.lease_expira_en < ahora
+                )
+            ),
+            IngestQueueItem.intentos < max_attempts
+        ).order_by(
+            IngestQueueItem.drive_modified_time
+        ).limit(limit).with_for_update(skip_locked=True)
+        
+        reclamar = update(IngestQueueItem).where(
+            IngestQueueItem.drive_file_id.in_(reclamables.scalar_subquery())
+        ).values(
+            estado='en_proceso',
+            lease_owner=worker_id,
+            lease_expira_en=ahora + timedelta(seconds=lease_seconds),
+            intentos=IngestQueueItem.intentos + 1,
+            actualizado_en=ahora
+        ).returning(
+            IngestQueueItem.file_metadata,
+            IngestQueueItem.intentos,
+            IngestQueueItem.drive_modified_time
+        ).execution_options(synchronize_session=False)
+        
+        with self.db.get_session() as session:
+            session.execute(agotados)
+            rows = session.execute(reclamar).all()
+        
+        rows.sort(key=lambda row: row.drive_modified_time or datetime.min)
+        return [
+            {**row.file_metadata, 'queue_attempts': row.intentos}
+            for row in rows
+        ]
+    
+    def complete(self, drive_file_id: str, worker_id: str) -> bool:
+        """
+        Marcar un archivo reclamado como completado
+        
+        Args:
+            drive_file_id: ID del archivo
+            worker_id: Worker que lo reclamó
+        
+        Returns:
+            False si el worker ya no tenía el lease (expiró o el archivo se reencoló)
+        """
+        with self.db.get_session() as session:
+            return session.execute(
+                self._de_worker(update(IngestQueueItem), drive_file_id, worker_id).values(
+                    estado='completado',
+                    lease_owner=None,
+                    lease_expira_en=None,
+                    ultimo_error=None,
+                    actualizado_en=self._ahora()
+                )
+            ).rowcount > 0
+    
+    def fail(self, drive_file_id: str, worker_id: str, error: str, max_attempts: int) -> Optional[str]:
+        """
+        Devolver a la cola un archivo que no se pudo procesar
+        
+        Args:
+            drive_file_id: ID del archivo
+            worker_id: Worker que lo reclamó
+            error: Motivo del fallo
+            max_attempts: Intentos máximos; al alcanzarlos queda en 'error'
+        
+        Returns:
+            Nuevo estado ('pendiente' o 'error'), o None si el worker ya no tenía el lease
+        """
+        with self.db.get_session() as session:
+            return session.execute(
+                self._de_worker(update(IngestQueueItem), drive_file_id, worker_id).values(
+                    estado=case((IngestQueueItem.intentos >= max_attempts, 'error'), else_='pendiente'),
+                    lease_owner=None,
+                    lease_expira_en=None,
+                    ultimo_error=error[:1000],
+                    actualizado_en=self._ahora()
+                ).returning(IngestQueueItem.estado)
+            ).scalar()
+    
+    @staticmethod
+    def _de_worker(stmt, drive_file_id: str, worker_id: str):
+        """Restringir un UPDATE al archivo mientras siga reclamado por el worker"""
+        return stmt.where(
+            IngestQueueItem.drive_file_id == drive_file_id,
+            IngestQueueItem.estado == 'en_proceso',
+            IngestQueueItem.lease_owner == worker_id
+        ).execution_options(synchronize_session=False)
+    
+    def count_by_estado(self) -> Dict[str, int]:
+        """
+        Contar archivos de la cola por estado
+        
+        Returns:
+            {'pendiente': n, 'en_proceso': n, 'completado': n, 'error': n}
+        """
+        with self.db.get_session() as session:
+            rows = session.execute(
+                select(IngestQueueItem.estado, func.count()).group_by(IngestQueueItem.estado)
+            ).all()
+        
+        counts = {'pendiente': 0, 'en_proceso': 0, 'completado': 0, 'error': 0}
+        counts.update({estado: total for estado, total in rows})
+        return counts
+
+
+class QuarantineRepository:
+    """Repositorio para el catálogo de archivos en cuarentena"""
+    
+    def __init__(self, db: Database):
+        self.db = db
+    
+    def upsert_entry(self, entry_data: dict) -> int:
+        """
+        Registrar (o actualizar) una entrada del catálogo de cuarentena
+        
+        Args:
+            entry_data: Datos de la entrada (debe incluir 'meta_file')
+        
+        Returns:
+            ID de la entrada
+        """
+        with self.db.get_session() as session:
+            stmt = insert(QuarantineEntry).values(**entry_data)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['meta_file'],
+                set_={k: v for k, v in entry_data.items() if k != 'meta_file'}
+            ).returning(QuarantineEntry.id)
+            
+            result = session.execute(stmt)
+            bump_data_version(session)
+            return result.scalar()
+    
+    def get_all_meta_files(self) -> List[str]:
+        """Obtener rutas de todos los .meta.json catalogados"""
+        with self.db.get_session() as session:
+            return [row[0] for row in session.query(QuarantineEntry.meta_file).all()]
+    
+    def delete_by_meta_files(self, meta_files: List[str]) -> int:
+        """
+        Eliminar entradas del catálogo cuyos archivos ya no existen
+        
+        Args:
+            meta_files: Rutas relativas de los .meta.json a eliminar
+        
+        Returns:
+            Número de entradas eliminadas
+        """
+        if not meta_files:
+            return 0
+        
+        with self.db.get_session() as session:
+            deleted = session.query(QuarantineEntry).filter(
+                QuarantineEntry.meta_file.in_(meta_files)
+            ).delete(synchronize_session=False)
+            if deleted:
+                bump_data_version(session)
+            return deleted
+    
+    def list_pending(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        estados_excluyentes: Optional[List[str]] = None,
+        decision: Optional[str] = None,
+        limit: Optional[int] = 500,
+        offset: int = 0
+    ) -> List[dict]:
+        """
+        Listar archivos en cuarentena pendientes (más recientes primero)
+        
+        Args:
+            start_date: Fecha inicial (sobre fecha_referencia)
+            end_date: Fecha final (sobre fecha_referencia)
+            estados_excluyentes: Estados de factura que excluyen la entrada (None = cualquier estado)
+            decision: Filtrar por decisión de cuarentena
+            limit: Número máximo de resultados (None = sin límite)
+            offset: Desplazamiento para paginación
+        
+        Returns:
+            Lista de diccionarios con las entradas
+        """
+        with self.db.get_session() as session:
+            entry = _pending_quarantine_entries(start_date, end_date, estados_excluyentes, decision)
+            
+            entries = session.query(entry).order_by(
+                entry.fecha_referencia.desc(),
+                entry.id.desc()
+            ).limit(limit).offset(offset).all()
+            
+            return [
+                {
+                    'id': e.id,
+                    'nombre': e.drive_file_name,
+                    'drive_file_id': e.drive_file_id,
+                    'drive_folder_name': e.drive_folder_name,
+                    'meta_file': e.meta_file,
+                    'decision': e.decision,
+                    'reason': e.reason,
+                    'proveedor_text': e.proveedor_text,
+                    'importe_total': float(e.importe_total) if e.importe_total is not None else None,
+                    'impuestos_total': float(e.impuestos_total) if e.impuestos_total is not None else None,
+                    'fecha_emision': e.fecha_emision,
+                    'fecha_referencia': e.fecha_referencia,
+                    'quarantined_at': e.quarantined_at.isoformat() if e.quarantined_at else None
+                }
+                for e in entries
+            ]
+    
+    def iter_pending(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        estados_excluyentes: Optional[List[str]] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[QuarantineEntry]:
+        """
+        Iterar archivos en cuarentena pendientes con cursor de servidor (para exportaciones)
+        
+        Args:
+            start_date: Fecha inicial (sobre fecha_referencia)
+            end_date: Fecha final (sobre fecha_referencia)
+            estados_excluyentes: Estados de factura que excluyen la entrada (None = cualquier estado)
+            chunk_size: Filas por bloque del cursor
+        
+        Yields:
+            Entradas QuarantineEntry (más recientes primero)
+        """
+        with self.db.get_session() as session:
+            entry = _pending_quarantine_entries(start_date, end_date, estados_excluyentes)
+            
+            query = session.query(entry).order_by(
+                entry.fecha_referencia.desc(),
+                entry.id.desc()
+            ).yield_per(chunk_size)
+            
+            for e in query:
+                yield e
+    
+    def count_pending(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        estados_excluyentes: Optional[List[str]] = None,
+        decision: Optional[str] = None
+    ) -> int:
+        """
+        Contar archivos únicos en cuarentena pendientes
+        
+        Args:
+            start_date: Fecha inicial (sobre fecha_referencia)
+            end_date: Fecha final (sobre fecha_referencia)
+            estados_excluyentes: Estados de factura que excluyen la entrada (None = cualquier estado)
+            decision: Filtrar por decisión de cuarentena
+        
+        Returns:
+            Número de archivos únicos
+        """
+        with self.db.get_session() as session:
+            entry = _pending_quarantine_entries(start_date, end_date, estados_excluyentes, decision)
+            return session.query(func.count(entry.id)).scalar() or 0
+
 class CostoPersonalRepository:
     """Repositorio para operaciones con costos de personal"""
     
@@ -1147,6 +2046,7 @@ class CostoPersonalRepository:
                 logger.info(f"Costo personal creado: {mes}/{año}")
             
             session.flush()
+            bump_data_version(session)
             
             return {
                 'id': costo.id,
@@ -1176,6 +2076,7 @@ class CostoPersonalRepository:
             ).delete()
             
             if deleted:
+                bump_data_version(session)
                 logger.info(f"Costo personal eliminado: ID {id}")
                 return True
             
@@ -3,20 +3,33 @@ Búsqueda incremental de archivos modificados en Google Drive
 """
 import os
 import time
+import uuid
+import hashlib
 from typing import List, Dict, Optional, Iterator
 from datetime import datetime, timedelta
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from googleapiclient.errors import HttpError
 
 from src.drive_client import DriveClient
 from src.logging_conf import get_logger
+from src.metrics import DRIVE_RATE_LIMITED_TOTAL
 
 logger = get_logger(__name__, component="backend")
 
 
+def _is_retryable_list_error(e: BaseException) -> bool:
+    """Reintentar solo 429, 5xx y errores de conexión (un 400 no se arregla reintentando)"""
+    if isinstance(e, HttpError):
+        return e.resp.status == 429 or 500 <= e.resp.status < 600
+    return isinstance(e, ConnectionError)
+
+
 class DriveIncrementalClient(DriveClient):
     """Cliente extendido para búsquedas incrementales en Google Drive"""
     
+    LIST_FIELDS = 'nextPageToken, files(id, name, mimeType, modifiedTime, size, md5Checksum, parents)'
+    LIST_ORDER_BY = 'modifiedTime asc, name asc'
+    
     def __init__(self, service_account_file: str = None):
         """
         Inicializar cliente incremental
@@ -33,6 +46,9 @@ class DriveIncrementalClient(DriveClient):
         self.sync_window_minutes = int(os.getenv('SYNC_WINDOW_MINUTES', '1440'))  # 24h por defecto
         self.process_all_files = os.getenv('PROCESS_ALL_FILES', 'false').lower() == 'true'
         
+        # Punto de continuación del último list_modified_since (ver list_modified_since)
+        self.continuation = None
+        
         logger.info(
             f"DriveIncrementalClient inicializado: "
             f"page_size={self.page_size}, retry_max={self.retry_max}, "
@@ -113,14 +129,14 @@ class DriveIncrementalClient(DriveClient):
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=2, max=30),
-        retry=retry_if_exception_type((HttpError, ConnectionError)),
+        retry=retry_if_exception(_is_retryable_list_error),
         reraise=True
     )
     def _execute_list_request(
         self,
         query: str,
         page_token: Optional[str] = None,
-        order_by: str = 'modifiedTime asc, name asc'
+        order_by: str = LIST_ORDER_BY
     ) -> Dict:
         """
         Ejecutar request de listado con reintentos
@@ -137,7 +153,7 @@ class DriveIncrementalClient(DriveClient):
             request_params = {
                 'q': query,
                 'spaces': 'drive',
-                'fields': 'nextPageToken, files(id, name, mimeType, modifiedTime, size, parents)',
+                'fields': self.LIST_FIELDS,
                 'pageSize': self.page_size,
                 'orderBy': order_by
             }
@@ -154,6 +170,7 @@ class DriveIncrementalClient(DriveClient):
         except HttpError as e:
             # 429 = Rate limit exceeded
             if e.resp.status == 429:
+                DRIVE_RATE_LIMITED_TOTAL.inc()
                 logger.warning(f"Rate limit excedido (429), reintentando...")
                 raise
             
@@ -215,30 +232,18 @@ class DriveIncrementalClient(DriveClient):
             logger.warning(f"Error obteniendo subcarpetas, usando solo carpeta raíz: {e}")
             return [parent_folder_id]
     
-    def list_modified_since(
-        self,
-        folder_id: str,
-        since_time: Optional[datetime] = None,
-        max_pages: Optional[int] = None
-    ) -> Iterator[List[Dict]]:
+    def _build_list_query(self, folder_id: str, all_folder_ids: List[str], adjusted_since: datetime) -> str:
         """
-        Listar archivos modificados desde un timestamp (con paginación)
-        Busca recursivamente en la carpeta raíz y todas sus subcarpetas
+        Construir la query de listado para la carpeta raíz y sus subcarpetas
         
         Args:
             folder_id: ID de la carpeta objetivo
-            since_time: Timestamp desde el cual buscar (None = primera ejecución)
-            max_pages: Máximo de páginas a procesar (None = sin límite)
+            all_folder_ids: IDs de la carpeta y todas sus subcarpetas
+            adjusted_since: Timestamp ya ajustado con la ventana de seguridad
         
-        Yields:
-            Listas de archivos (una página a la vez)
+        Returns:
+            Query string para Drive API
         """
-        # Calcular tiempo ajustado
-        adjusted_since = self._calculate_adjusted_since_time(since_time)
-        
-        # Obtener todas las subcarpetas (incluyendo la raíz)
-        all_folder_ids = self._get_all_subfolders(folder_id)
-        
         # TEMPORAL: Si PROCESS_ALL_FILES está activo, no filtrar por fecha
         if self.process_all_files:
             # Construir query sin restricción de fecha
@@ -276,20 +281,101 @@ class DriveIncrementalClient(DriveClient):
                     f"trashed = false"
                 )
         
-        logger.info(
-            f"Iniciando búsqueda incremental en {len(all_folder_ids)} carpetas "
-            f"desde {adjusted_since.isoformat()}"
-        )
+        return query
+    
+    def _query_fingerprint(self, query: str) -> str:
+        """
+        Huella de todo lo que fija un nextPageToken: Drive solo acepta el token
+        con la misma query, orden, campos y tamaño de página
+        """
+        key = '|'.join([query, self.LIST_ORDER_BY, self.LIST_FIELDS, str(self.page_size)])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+    
+    def list_modified_since(
+        self,
+        folder_id: str,
+        since_time: Optional[datetime] = None,
+        max_pages: Optional[int] = None,
+        continuation: Optional[Dict] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Listar archivos modificados desde un timestamp (con paginación)
+        Busca recursivamente en la carpeta raíz y todas sus subcarpetas
+        
+        Si se corta por max_pages, self.continuation queda con el nextPageToken y la
+        huella de la query; pasándolo como continuation la siguiente ejecución sigue
+        exactamente en la página donde se quedó esta (en vez de volver a pedir las
+        primeras páginas desde since_time). Tras cada página yielded, self.continuation
+        apunta a la página siguiente (None cuando el listado se ha completado).
+        
+        Args:
+            folder_id: ID de la carpeta objetivo
+            since_time: Timestamp desde el cual buscar (None = primera ejecución)
+            max_pages: Máximo de páginas a procesar (None = sin límite)
+            continuation: Continuación guardada por una ejecución anterior (opcional);
+                se descarta si la query ya no coincide (p. ej. nuevas subcarpetas)
+        
+        Yields:
+            Listas de archivos (una página a la vez)
+        """
+        self.continuation = None
+        
+        # Obtener todas las subcarpetas (incluyendo la raíz)
+        all_folder_ids = self._get_all_subfolders(folder_id)
         
-        # Iterar páginas
         page_token = None
+        adjusted_since = None
+        query = None
+        
+        if continuation:
+            # Reconstruir la query de la ejecución que se cortó (con su since, no el actual)
+            try:
+                adjusted_since = datetime.fromisoformat(continuation['since'])
+                query = self._build_list_query(folder_id, all_folder_ids, adjusted_since)
+                if self._query_fingerprint(query) == continuation.get('query_fingerprint'):
+                    page_token = continuation.get('page_token')
+                else:
+                    logger.warning("La query de Drive cambió desde la ejecución anterior, se descarta la continuación")
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Continuación de listado inválida, se descarta: {e}")
+        
+        if not page_token:
+            # Calcular tiempo ajustado
+            adjusted_since = self._calculate_adjusted_since_time(since_time)
+            query = self._build_list_query(folder_id, all_folder_ids, adjusted_since)
+            logger.info(
+                f"Iniciando búsqueda incremental en {len(all_folder_ids)} carpetas "
+                f"desde {adjusted_since.isoformat()}"
+            )
+        else:
+            logger.info(
+                f"Continuando búsqueda incremental en {len(all_folder_ids)} carpetas "
+                f"desde {adjusted_since.isoformat()} (página {continuation.get('pages_fetched', 0) + 1})"
+            )
+        
+        fingerprint = self._query_fingerprint(query)
+        
+        # Iterar páginas
         page_count = 0
         total_files = 0
+        pages_before = continuation.get('pages_fetched', 0) if page_token else 0
         
         while True:
             try:
                 # Ejecutar request con reintentos
-                result = self._execute_list_request(query, page_token)
+                try:
+                    result = self._execute_list_request(query, page_token)
+                except HttpError as e:
+                    if not (page_token and page_count == 0 and e.resp.status in (400, 404)):
+                        raise
+                    # Token caducado o rechazado: empezar de nuevo desde since_time
+                    logger.warning(f"nextPageToken guardado rechazado por Drive ({e.resp.status}), se reinicia el listado")
+                    adjusted_since = self._calculate_adjusted_since_time(since_time)
+                    query = self._build_list_query(folder_id, all_folder_ids, adjusted_since)
+                    fingerprint = self._query_fingerprint(query)
+                    page_token = None
+                    pages_before = 0
+                    result = self._execute_list_request(query, page_token)
                 
                 files = result.get('files', [])
                 page_count += 1
@@ -300,13 +386,21 @@ class DriveIncrementalClient(DriveClient):
                     f"(total acumulado: {total_files})"
                 )
                 
+                # Verificar si hay más páginas
+                page_token = result.get('nextPageToken')
+                
+                # Punto de continuación tras procesar esta página
+                self.continuation = {
+                    'page_token': page_token,
+                    'query_fingerprint': fingerprint,
+                    'since': adjusted_since.isoformat(),
+                    'pages_fetched': pages_before + page_count
+                } if page_token else None
+                
                 # Yield página
                 if files:
                     yield files
                 
-                # Verificar si hay más páginas
-                page_token = result.get('nextPageToken')
-                
                 if not page_token:
                     logger.info(f"Búsqueda completada: {total_files} archivos en {page_count} páginas")
                     break
@@ -315,7 +409,7 @@ class DriveIncrementalClient(DriveClient):
                 if max_pages and page_count >= max_pages:
                     logger.warning(
                         f"Límite de páginas alcanzado ({max_pages}), "
-                        f"puede haber más archivos sin procesar"
+                        f"la próxima ejecución continuará en la página {pages_before + page_count + 1}"
                     )
                     break
                 
@@ -351,18 +445,7 @@ class DriveIncrementalClient(DriveClient):
         all_folder_ids = self._get_all_subfolders(folder_id)
         
         # Construir query que busque en todas las carpetas
-        since_time_str = adjusted_since.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-        
-        if len(all_folder_ids) == 1:
-            query = self._build_incremental_query(folder_id, adjusted_since)
-        else:
-            folder_conditions = " or ".join([f"'{fid}' in parents" for fid in all_folder_ids])
-            query = (
-                f"({folder_conditions}) and "
-                f"mimeType = 'application/pdf' and "
-                f"modifiedTime > '{since_time_str}' and "
-                f"trashed = false"
-            )
+        query = self._build_list_query(folder_id, all_folder_ids, adjusted_since)
         
         page_token = None
         total_count = 0
@@ -413,4 +496,55 @@ class DriveIncrementalClient(DriveClient):
         except Exception as e:
             logger.error(f"Error validando acceso a carpeta {folder_id}: {e}")
             return False
-
+    
+    def watch_changes(self, address: str, token: str, ttl_sec: int) -> Dict:
+        """
+        Registrar un canal de notificaciones push de Drive (changes.watch)
+        
+        Drive hace POST a address con la cabecera X-Goog-Channel-Token = token cada
+        vez que cambia algo visible para la service account. La notificación no dice
+        qué cambió: solo sirve para adelantar la siguiente ejecución incremental.
+        
+        Args:
+            address: URL HTTPS pública que recibe las notificaciones
+            token: Token secreto que Drive devuelve en cada notificación
+            ttl_sec: Duración pedida del canal (Drive puede acortarla)
+        
+        Returns:
+            Canal registrado: {'id', 'resource_id', 'expiration'} (expiration en epoch segundos)
+        """
+        start = self.service.changes().getStartPageToken().execute()
+        body = {
+            'id': str(uuid.uuid4()),
+            'type': 'web_hook',
+            'address': address,
+            'token': token,
+            'expiration': int((time.time() + ttl_sec) * 1000)
+        }
+        channel = self.service.changes().watch(
+            pageToken=start['startPageToken'],
+            body=body
+        ).execute()
+        
+        registered = {
+            'id': channel['id'],
+            'resource_id': channel['resourceId'],
+            'expiration': int(channel.get('expiration', body['expiration'])) / 1000
+        }
+        logger.info(
+            f"Canal de notificaciones Drive registrado: {registered['id']} "
+            f"(expira en {int(registered['expiration'] - time.time())}s)"
+        )
+        return registered
+    
+    def stop_channel(self, channel: Dict):
+        """
+        Dar de baja un canal registrado con watch_changes
+        
+        Args:
+            channel: Canal devuelto por watch_changes
+        """
+        self.service.channels().stop(
+            body={'id': channel['id'], 'resourceId': channel['resource_id']}
+        ).execute()
+        logger.info(f"Canal de notificaciones Drive cerrado: {channel['id']}")
@@ -3,14 +3,17 @@ Cliente de Google Drive para listar y descargar archivos PDF
 """
 import os
 import io
+import threading
 from typing import List, Dict, Optional
 from pathlib import Path
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from src.logging_conf import get_logger
+from src.metrics import DRIVE_RATE_LIMITED_TOTAL
 
 logger = get_logger(__name__)
 
@@ -19,6 +22,9 @@ class DriveClient:
     
     SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
     
+    # Máximo de llamadas por petición batch de Drive API
+    BATCH_REQUEST_MAX = 100
+    
     def __init__(self, service_account_file: str = None):
         """
         Inicializar cliente de Google Drive
@@ -40,11 +46,20 @@ class DriveClient:
             scopes=self.SCOPES
         )
         
-        # Construir servicio
-        self.service = build('drive', 'v3', credentials=self.credentials)
+        # Construir servicio (uno por hilo: el transporte httplib2 no es thread-safe)
+        self._local = threading.local()
+        self._local.service = build('drive', 'v3', credentials=self.credentials)
         
         logger.info("Cliente de Google Drive inicializado correctamente")
     
+    @property
+    def service(self):
+        """Servicio de Drive API del hilo actual (descargas concurrentes)"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = build('drive', 'v3', credentials=self.credentials)
+        return service
+    
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10)
@@ -111,7 +126,7 @@ class DriveClient:
                 results = self.service.files().list(
                     q=query,
                     spaces='drive',
-                    fields='nextPageToken, files(id, name, mimeType, modifiedTime, size, parents)',
+                    fields='nextPageToken, files(id, name, mimeType, modifiedTime, size, md5Checksum, parents)',
                     pageSize=100,
                     pageToken=page_token
                 ).execute()
@@ -211,6 +226,8 @@ class DriveClient:
             return True
         
         except Exception as e:
+            if isinstance(e, HttpError) and e.resp.status == 429:
+                DRIVE_RATE_LIMITED_TOTAL.inc()
             logger.error(f"Error descargando archivo {file_id}: {e}")
             return False
     
@@ -232,7 +249,7 @@ class DriveClient:
         try:
             file_metadata = self.service.files().get(
                 fileId=file_id,
-                fields='id, name, mimeType, size, modifiedTime, parents'
+                fields='id, name, mimeType, size, modifiedTime, md5Checksum, parents'
             ).execute()
             
             # Obtener nombre de carpeta si es posible
@@ -248,14 +265,7 @@ class DriveClient:
                 except Exception:
                     pass  # Si no se puede obtener, dejar como None
             
-            result = {
-                'id': file_metadata.get('id'),
-                'name': file_metadata.get('name'),
-                'mimeType': file_metadata.get('mimeType'),
-                'size': file_metadata.get('size'),
-                'modifiedTime': file_metadata.get('modifiedTime'),
-                'folder_name': folder_name or 'unknown'
-            }
+            result = self._file_info_from_metadata(file_metadata, folder_name)
             
             logger.debug(f"Metadata obtenida para archivo {file_id}: {result.get('name')}")
             return result
@@ -264,6 +274,77 @@ class DriveClient:
             logger.error(f"Error obteniendo metadata de archivo {file_id}: {e}")
             return None
     
+    def get_files_by_ids(self, file_ids: List[str]) -> Dict[str, dict]:
+        """
+        Obtener metadata de varios archivos con peticiones batch de Drive API
+        
+        Equivale a get_file_by_id para cada archivo, pero agrupa hasta
+        BATCH_REQUEST_MAX llamadas por petición HTTP y resuelve cada carpeta
+        padre una sola vez.
+        
+        Args:
+            file_ids: drive_file_id de los archivos
+        
+        Returns:
+            Diccionario {file_id: metadata compatible con process_batch};
+            los archivos que no se pudieron obtener no aparecen
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        metadatos = self._batch_get(file_ids, 'id, name, mimeType, size, modifiedTime, md5Checksum, parents')
+        
+        parent_ids = list({m['parents'][0] for m in metadatos.values() if m.get('parents')})
+        carpetas = self._batch_get(parent_ids, 'name')
+        
+        logger.debug(f"Metadata obtenida en batch: {len(metadatos)}/{len(file_ids)} archivos")
+        
+        return {
+            file_id: self._file_info_from_metadata(
+                metadata,
+                carpetas.get(metadata['parents'][0], {}).get('name') if metadata.get('parents') else None
+            )
+            for file_id, metadata in metadatos.items()
+        }
+    
+    def _batch_get(self, file_ids: List[str], fields: str) -> Dict[str, dict]:
+        """
+        files.get de varios archivos en peticiones batch
+        
+        Args:
+            file_ids: IDs sin repetir
+            fields: Campos a pedir
+        
+        Returns:
+            Diccionario {file_id: respuesta} (sin los que fallaron)
+        """
+        respuestas = {}
+        
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Error obteniendo metadata de archivo {request_id}: {exception}")
+                return
+            respuestas[request_id] = response
+        
+        for start in range(0, len(file_ids), self.BATCH_REQUEST_MAX):
+            batch = self.service.new_batch_http_request(callback=_callback)
+            for file_id in file_ids[start:start + self.BATCH_REQUEST_MAX]:
+                batch.add(self.service.files().get(fileId=file_id, fields=fields), request_id=file_id)
+            batch.execute()
+        
+        return respuestas
+    
+    @staticmethod
+    def _file_info_from_metadata(file_metadata: dict, folder_name: Optional[str]) -> dict:
+        """Metadata de Drive en el formato que espera process_batch"""
+        return {
+            'id': file_metadata.get('id'),
+            'name': file_metadata.get('name'),
+            'mimeType': file_metadata.get('mimeType'),
+            'size': file_metadata.get('size'),
+            'modifiedTime': file_metadata.get('modifiedTime'),
+            'md5Checksum': file_metadata.get('md5Checksum'),
+            'folder_name': folder_name or 'unknown'
+        }
+    
     def get_files_from_months(self, months: List[str], base_folder_id: str = None) -> Dict[str, List[dict]]:
         """
         Obtener archivos PDF de múltiples carpetas de meses
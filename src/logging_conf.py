@@ -1,145 +1,235 @@
 """
 Configuración de logging estructurado con rotación
 Alineado con estándar de Command Center
+
+Los loggers no escriben en el hilo que llama: encolan el registro
+(QueueHandler) y un único QueueListener por archivo de log serializa a JSON
+y escribe en consola y archivo rotativo en segundo plano.
 """
+import atexit
 import logging
 import logging.handlers
 import json
+import queue
+import random
+import threading
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 import os
 
+# orjson es opcional: serializa bastante más rápido que json.dumps
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Nivel normalizado (WARNING -> WARN, CRITICAL -> ERROR)
+_LEVEL_NAMES = {
+    logging.DEBUG: 'DEBUG',
+    logging.INFO: 'INFO',
+    logging.WARNING: 'WARN',
+    logging.ERROR: 'ERROR',
+    logging.CRITICAL: 'ERROR',
+}
+
+# Campos opcionales que se copian del record si existen (request/trace y dominio)
+_EXTRA_FIELDS = ('request_id', 'trace_id', 'drive_file_id', 'etapa', 'elapsed_ms')
+
+
+@lru_cache(maxsize=512)
+def _service_for(logger_name: str) -> str:
+    """Service (identificar si es FastAPI, Uvicorn, etc.) - cacheado por nombre de logger"""
+    name = logger_name.lower()
+    if 'uvicorn' in name:
+        return 'uvicorn'
+    if 'fastapi' in name:
+        return 'fastapi'
+    return 'python'
+
+
+def _dumps(data: dict) -> str:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
 class JSONFormatter(logging.Formatter):
     """Formatter para logs en formato JSON - Estándar Command Center"""
-    
+
     def __init__(self, app_id: str = "invoice-extractor", component: str = "backend"):
         super().__init__()
         self.app_id = app_id
         self.component = component
-    
+
     def format(self, record):
-        # Timestamp en RFC3339 UTC
-        ts = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-        
-        # Nivel normalizado (asegurar mayúsculas y mapear WARNING -> WARN, CRITICAL -> ERROR)
-        level = record.levelname.upper()
-        if level == 'WARNING':
-            level = 'WARN'
-        elif level == 'CRITICAL':
-            level = 'ERROR'
-        if level not in ['INFO', 'WARN', 'ERROR', 'DEBUG']:
-            level = 'INFO'  # Default
-        
+        # Timestamp en RFC3339 UTC (momento del evento, no de la escritura en segundo plano)
+        ts = datetime.fromtimestamp(record.created, timezone.utc).isoformat().replace('+00:00', 'Z')
+
         # Estructura base requerida
         log_data = {
             'ts': ts,
-            'level': level,
-            'component': self.component,
+            'level': _LEVEL_NAMES.get(record.levelno, 'INFO'),
+            'component': getattr(record, 'component', self.component),
             'app': self.app_id,
             'msg': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'service': _service_for(record.name),
         }
-        
-        # Campos opcionales estándar
-        if hasattr(record, 'module'):
-            log_data['module'] = record.module
-        if hasattr(record, 'funcName'):
-            log_data['function'] = record.funcName
-        if hasattr(record, 'lineno'):
-            log_data['line'] = record.lineno
-        
-        # Service (identificar si es FastAPI, Uvicorn, etc.)
-        if hasattr(record, 'name'):
-            if 'uvicorn' in record.name.lower():
-                log_data['service'] = 'uvicorn'
-            elif 'fastapi' in record.name.lower():
-                log_data['service'] = 'fastapi'
-            else:
-                log_data['service'] = 'python'
-        
-        # Request ID y Trace ID (si existen)
-        if hasattr(record, 'request_id'):
-            log_data['request_id'] = record.request_id
-        if hasattr(record, 'trace_id'):
-            log_data['trace_id'] = record.trace_id
-        
-        # Campos específicos de dominio (mantener compatibilidad)
-        if hasattr(record, 'drive_file_id'):
-            log_data['drive_file_id'] = record.drive_file_id
-        if hasattr(record, 'etapa'):
-            log_data['etapa'] = record.etapa
-        if hasattr(record, 'elapsed_ms'):
-            log_data['elapsed_ms'] = record.elapsed_ms
-        
+
+        for field in _EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                log_data[field] = value
+
         # Excepciones
         if record.exc_info:
             log_data['exception'] = self.formatException(record.exc_info)
-        
-        return json.dumps(log_data, ensure_ascii=False)
+        elif record.exc_text:
+            log_data['exception'] = record.exc_text
+
+        return _dumps(log_data)
+
+
+class DebugSampler(logging.Filter):
+    """Deja pasar solo una fracción de los mensajes DEBUG (el resto de niveles, siempre)"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que llama: solo fija el mensaje
+    (por si los args cambian después) y el componente del logger de origen
+    """
+
+    def __init__(self, log_queue: queue.Queue, component: str):
+        super().__init__(log_queue)
+        self.component = component
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        record.component = self.component
+        return record
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def _build_handlers(log_file: str, formatter: logging.Formatter) -> list:
+    """Handlers de salida: consola (stdout para Docker logs) y archivo con rotación (opcional)"""
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers = [console_handler]
+
+    if log_file:
+        log_path = Path(log_file)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    return handlers
+
+
+def _get_log_queue(log_file: str, app_id: str) -> queue.Queue:
+    """Cola compartida por todos los loggers que escriben en el mismo archivo (un listener por archivo)"""
+    key = (log_file, app_id)
+    with _listeners_lock:
+        if key not in _listeners:
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(
+                log_queue,
+                *_build_handlers(log_file, JSONFormatter(app_id=app_id)),
+                respect_handler_level=True
+            )
+            listener.start()
+            _listeners[key] = (log_queue, listener)
+        return _listeners[key][0]
+
+
+def stop_log_listeners():
+    """Vaciar colas y detener listeners (se registra en atexit)"""
+    with _listeners_lock:
+        for _, listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
+
+
+atexit.register(stop_log_listeners)
+
 
 def setup_logger(
-    name: str, 
-    log_file: str = None, 
+    name: str,
+    log_file: str = None,
     level: str = 'INFO',
     app_id: str = "invoice-extractor",
     component: str = "backend"
 ):
     """
     Configurar logger con rotación y formato JSON estándar
-    
+
     Args:
         name: Nombre del logger
         log_file: Ruta del archivo de log (opcional)
         level: Nivel de logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         app_id: Identificador de la aplicación (default: invoice-extractor)
         component: Componente (backend, frontend, db) (default: backend)
-    
+
     Returns:
         Logger configurado
     """
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level.upper()))
-    
+
     # Evitar duplicados
     if logger.handlers:
         return logger
-    
-    # Formatter estándar
-    formatter = JSONFormatter(app_id=app_id, component=component)
-    
-    # Handler para consola (stdout) - CRÍTICO para Docker logs
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Handler para archivo con rotación (opcional)
-    if log_file:
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        file_handler = logging.handlers.RotatingFileHandler(
-            log_file,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+
+    # LOG_ASYNC=false escribe en el hilo que llama (útil para depurar el propio logging)
+    if os.getenv('LOG_ASYNC', 'true').lower() == 'true':
+        handler = _RecordQueueHandler(_get_log_queue(log_file, app_id), component)
+        handlers = [handler]
+    else:
+        handlers = _build_handlers(log_file, JSONFormatter(app_id=app_id, component=component))
+
+    sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+    for handler in handlers:
+        if sample_rate < 1:
+            handler.addFilter(DebugSampler(sample_rate))
+        logger.addHandler(handler)
+
     return logger
 
 def get_logger(name: str, component: str = "backend"):
     """
     Obtener logger ya configurado con estándar Command Center
-    
+
     Args:
         name: Nombre del logger (usualmente __name__)
         component: Componente (backend, frontend, db)
-    
+
     Returns:
         Logger configurado
     """
     log_file = os.getenv('LOG_PATH', 'logs/extractor.log')
     log_level = os.getenv('LOG_LEVEL', 'INFO')
     app_id = os.getenv('APP_ID', 'invoice-extractor')
-    
+
     return setup_logger(name, log_file, log_level, app_id, component)
@@ -15,10 +15,8 @@ from security.secrets import load_env, validate_secrets
 from logging_conf import get_logger
 from db.database import get_database
 from db.repositories import FacturaRepository, EventRepository
-from drive_client import DriveClient
-from ocr_extractor import InvoiceExtractor
-from pipeline.ingest import process_batch
 from pipeline.validate import sanitize_filename
+from profiling import profile_run, new_run_id, profiling_requested_by_env
 
 # Cargar variables de entorno
 load_env()
@@ -52,9 +50,9 @@ class InvoiceProcessor:
             self.db = get_database()
             self.db.init_db()
             
-            self.drive_client = DriveClient()
-            self.openai_api_key = os.getenv('OPENAI_API_KEY')
-            self.extractor = InvoiceExtractor(self.openai_api_key)
+            # Drive y el extractor se crean en run(): --stats solo necesita la BD
+            self.drive_client = None
+            self.extractor = None
             
             logger.info("Componentes inicializados correctamente")
         
@@ -62,6 +60,15 @@ class InvoiceProcessor:
             logger.error(f"Error inicializando componentes: {e}", exc_info=True)
             raise
     
+    def _init_processing_components(self):
+        """Crear cliente de Drive y extractor (importan googleapiclient y openai)"""
+        from drive_client import DriveClient
+        from ocr_extractor import InvoiceExtractor
+        
+        self.drive_client = DriveClient()
+        self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.extractor = InvoiceExtractor(self.openai_api_key)
+    
     def _get_months(self):
         """Obtener lista de meses a procesar"""
         if self.args.months:
@@ -93,6 +100,8 @@ class InvoiceProcessor:
                 logger.error("GOOGLE_DRIVE_FOLDER_ID no configurado")
                 return 2
             
+            self._init_processing_components()
+            
             # Listar TODOS los PDFs recursivamente (sin depender de nombres de carpetas)
             logger.info("Buscando todos los PDFs en todas las carpetas...")
             all_files = self.drive_client.list_all_pdfs_recursive(base_folder_id)
@@ -125,6 +134,7 @@ class InvoiceProcessor:
             
             # Procesar batch (el sistema de duplicados se encargará de filtrar los ya procesados)
             logger.info(f"Procesando {len(downloaded_files)} archivos descargados...")
+            from pipeline.ingest import process_batch
             stats = process_batch(downloaded_files, self.extractor, self.db)
             
             all_stats = [stats]
@@ -365,6 +375,12 @@ def main():
         help='Mostrar estadísticas de la base de datos y salir'
     )
     
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Perfilar la ejecución y guardar artefactos en data/profiles/ (equivale a PROFILE_RUN=true)'
+    )
+    
     args = parser.parse_args()
     
     try:
@@ -377,7 +393,9 @@ def main():
             return 0
         
         # Ejecutar proceso principal
-        exit_code = processor.run()
+        profile_enabled = args.profile or profiling_requested_by_env()
+        with profile_run(new_run_id('main'), enabled=profile_enabled):
+            exit_code = processor.run()
         
         # Mostrar stats al final
         if exit_code == 0:
@@ -0,0 +1,463 @@
+"""
+Registro de métricas en formato de exposición de Prometheus
+
+Sin dependencias externas: contadores, gauges e histogramas con etiquetas,
+thread-safe, que se renderizan en formato texto 0.0.4.
+
+La API expone /metrics con sus propias métricas. La ingesta se ejecuta en otros
+procesos (cron, daemon, workers de la cola), así que cada uno vuelca las suyas a
+un archivo de texto propio junto a METRICS_TEXTFILE_PATH (pipeline.<worker>.prom,
+con la etiqueta worker) y /metrics los combina en la respuesta (mismo esquema que
+el textfile collector de node_exporter).
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+# Buckets por defecto (segundos): de llamadas a BD (ms) a llamadas a OpenAI (decenas de s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_TEXTFILE_PATH = os.getenv('METRICS_TEXTFILE_PATH', 'data/metrics/pipeline.prom')
+# Archivos de workers que no se actualizan en este tiempo (procesos terminados) se ignoran y se borran
+METRICS_TEXTFILE_MAX_AGE_SEC = int(os.getenv('METRICS_TEXTFILE_MAX_AGE_SEC', '3600'))
+
+_SAMPLE_NAME = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{?)')
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape_label_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base de métricas con etiquetas"""
+
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: etiquetas esperadas {self.labelnames}, recibidas {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def has_samples(self) -> bool:
+        with self._lock:
+            return bool(self._values)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Un contador solo puede incrementarse")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja"""
+
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> Optional[float]:
+        """Último valor fijado (None si nunca se fijó)"""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key)
+
+
+class Histogram(_Metric):
+    """Histograma con buckets acumulados"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            idx = bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                state['counts'][idx] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def totals(self, **labels) -> Tuple[int, float]:
+        """(número de observaciones, suma) acumulados para unas etiquetas"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            return (state['count'], state['sum']) if state else (0, 0.0)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Medir la duración de un bloque (se observa también si lanza excepción)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, {'counts': list(v['counts']), 'sum': v['sum'], 'count': v['count']})
+                           for k, v in self._values.items())
+        lines = []
+        for key, state in items:
+            acumulado = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                acumulado += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {acumulado}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Renderizar métricas con muestras en formato texto de Prometheus.
+        Las métricas sin muestras se omiten: así la API no publica a cero las
+        métricas de ingesta que llegan por el archivo de texto.
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            if metric.has_samples():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write_textfile(self, worker: str, path: str = None):
+        """
+        Volcar métricas al archivo de este worker (escritura atómica) para que /metrics las publique
+
+        Args:
+            worker: Identificador del proceso (se añade como etiqueta worker y al nombre del archivo)
+            path: Ruta base .prom (por defecto METRICS_TEXTFILE_PATH)
+        """
+        base = Path(path or METRICS_TEXTFILE_PATH)
+        target = worker_textfile_path(worker, base)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(target.suffix + f'.{os.getpid()}.tmp')
+            tmp.write_text(_add_label(self.render(), 'worker', worker), encoding='utf-8')
+            os.replace(tmp, target)
+        except Exception as e:
+            logger.warning(f"No se pudieron escribir métricas en {target}: {e}")
+            return
+
+        # Archivos de procesos que ya terminaron (cada ejecución de cron es un worker nuevo)
+        for stale in _textfiles(base, include_stale=True):
+            if stale != target and _is_stale(stale):
+                stale.unlink(missing_ok=True)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def worker_textfile_path(worker: str, path: str = None) -> Path:
+    """Archivo de métricas de un worker: <base>.<worker>.prom junto a METRICS_TEXTFILE_PATH"""
+    base = Path(path or METRICS_TEXTFILE_PATH)
+    slug = re.sub(r'[^A-Za-z0-9_.-]', '_', worker)
+    return base.with_name(f"{base.stem}.{slug}{base.suffix}")
+
+
+def _is_stale(target: Path) -> bool:
+    try:
+        return time.time() - target.stat().st_mtime > METRICS_TEXTFILE_MAX_AGE_SEC
+    except FileNotFoundError:
+        return True
+
+
+def _textfiles(base: Path, include_stale: bool = False) -> List[Path]:
+    """Archivos de métricas de los workers (por defecto sin los de procesos terminados)"""
+    files = sorted(base.parent.glob(f"{base.stem}.*{base.suffix}"))
+    return files if include_stale else [f for f in files if not _is_stale(f)]
+
+
+def _add_label(text: str, name: str, value: str) -> str:
+    """Añadir una etiqueta fija a todas las muestras de un texto de exposición"""
+    label = f'{name}="{_escape_label_value(value)}"'
+    lines = []
+    for line in text.splitlines():
+        match = _SAMPLE_NAME.match(line) if line and not line.startswith('#') else None
+        if match:
+            end = match.end()
+            line = line[:end] + label + ',' + line[end:] if match.group(2) else line[:end] + '{' + label + '}' + line[end:]
+        lines.append(line)
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def _merge_exposition(texts: List[str]) -> str:
+    """
+    Combinar varios textos de exposición: las muestras de una métrica deben ir
+    seguidas y con un único HELP/TYPE aunque vengan de varios workers
+    """
+    headers: Dict[str, List[str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# HELP ') or line.startswith('# TYPE '):
+                family = line.split(' ', 3)[2]
+                known = headers.setdefault(family, [])
+                if not any(h.startswith(line[:7]) for h in known):
+                    known.append(line)
+                samples.setdefault(family, [])
+            elif line and not line.startswith('#') and family is not None:
+                samples[family].append(line)
+
+    lines = []
+    for family in sorted(samples):
+        lines.extend(headers.get(family, []))
+        lines.extend(samples[family])
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def render_with_textfiles(path: str = None) -> str:
+    """
+    Métricas de este proceso más las de ingesta de todos los workers activos
+
+    Args:
+        path: Ruta base .prom (por defecto METRICS_TEXTFILE_PATH)
+
+    Returns:
+        Texto de exposición combinado
+    """
+    texts = [REGISTRY.render()]
+    for target in _textfiles(Path(path or METRICS_TEXTFILE_PATH)):
+        try:
+            texts.append(target.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning(f"No se pudieron leer métricas de {target}: {e}")
+    return _merge_exposition(texts)
+
+
+# ============================================================================
+# Métricas de ingesta
+# ============================================================================
+
+DRIVE_DOWNLOAD_SECONDS = REGISTRY.histogram(
+    'invoice_drive_download_seconds', 'Tiempo de descarga de un archivo desde Google Drive'
+)
+PDF_RENDER_SECONDS = REGISTRY.histogram(
+    'invoice_pdf_render_seconds', 'Tiempo de renderizado de PDF a imagen (pdf2image)'
+)
+OPENAI_REQUEST_SECONDS = REGISTRY.histogram(
+    'invoice_openai_request_seconds', 'Latencia de cada llamada a OpenAI Vision', ['outcome']
+)
+TESSERACT_SECONDS = REGISTRY.histogram(
+    'invoice_tesseract_seconds', 'Tiempo de extracción con Tesseract (render + OCR)'
+)
+DB_UPSERT_SECONDS = REGISTRY.histogram(
+    'invoice_db_upsert_seconds', 'Tiempo de upsert de una factura en PostgreSQL'
+)
+OPENAI_TOKENS_TOTAL = REGISTRY.counter(
+    'invoice_openai_tokens_total', 'Tokens consumidos en OpenAI', ['type']
+)
+OPENAI_RATE_LIMITED_TOTAL = REGISTRY.counter(
+    'invoice_openai_rate_limited_total', 'Respuestas 429 (rate limit) de OpenAI'
+)
+OPENAI_RATELIMIT_REMAINING_RATIO = REGISTRY.gauge(
+    'invoice_openai_ratelimit_remaining_ratio',
+    'Fracción de cuota restante según las cabeceras x-ratelimit de OpenAI', ['resource']
+)
+OPENAI_RETRY_AFTER_SECONDS = REGISTRY.gauge(
+    'invoice_openai_retry_after_seconds', 'Último retry-after indicado por OpenAI en un 429'
+)
+DRIVE_RATE_LIMITED_TOTAL = REGISTRY.counter(
+    'invoice_drive_rate_limited_total', 'Respuestas 429 (rate limit) de Google Drive'
+)
+EXTRACTION_FALLBACKS_TOTAL = REGISTRY.counter(
+    'invoice_extraction_fallbacks_total', 'Extracciones que recurrieron a Tesseract', ['reason']
+)
+DUPLICATE_DECISIONS_TOTAL = REGISTRY.counter(
+    'invoice_duplicate_decisions_total', 'Decisiones del detector de duplicados', ['decision']
+)
+FILES_PROCESSED_TOTAL = REGISTRY.counter(
+    'invoice_files_processed_total', 'Archivos procesados por process_batch', ['status']
+)
+INGEST_QUEUE_DEPTH = REGISTRY.gauge(
+    'invoice_ingest_queue_depth', 'Archivos pendientes de procesar en la ejecución de ingesta actual'
+)
+INGEST_LAST_RUN_TIMESTAMP = REGISTRY.gauge(
+    'invoice_ingest_last_run_timestamp_seconds', 'Momento (epoch) de la última actualización de métricas de ingesta'
+)
+
+
+def record_openai_ratelimit_headers(headers, rate_limited: bool = False):
+    """
+    Actualizar gauges de cuota desde las cabeceras de una respuesta de OpenAI
+
+    Args:
+        headers: Cabeceras HTTP (x-ratelimit-limit-*, x-ratelimit-remaining-*, retry-after)
+        rate_limited: La respuesta fue un 429 (solo entonces se registra retry-after)
+    """
+    if not headers:
+        return
+    for resource in ('requests', 'tokens'):
+        try:
+            limit = float(headers.get(f'x-ratelimit-limit-{resource}'))
+            remaining = float(headers.get(f'x-ratelimit-remaining-{resource}'))
+        except (TypeError, ValueError):
+            continue
+        if limit > 0:
+            OPENAI_RATELIMIT_REMAINING_RATIO.set(max(remaining, 0) / limit, resource=resource)
+    if rate_limited:
+        try:
+            OPENAI_RETRY_AFTER_SECONDS.set(float(headers.get('retry-after')))
+        except (TypeError, ValueError):
+            pass
+
+
+# ============================================================================
+# Métricas de API y base de datos
+# ============================================================================
+
+HTTP_REQUESTS_TOTAL = REGISTRY.counter(
+    'api_http_requests_total', 'Requests HTTP atendidas', ['method', 'route', 'status']
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'api_http_request_duration_seconds', 'Duración de requests HTTP', ['method', 'route']
+)
+# Un par de gauges por proceso: /metrics concatena las métricas de la API y el
+# archivo de la ingesta, y un mismo nombre no puede aparecer en ambos
+_POOL_GAUGES = {
+    process: (
+        REGISTRY.gauge(f'{prefix}_db_pool_connections', f'Conexiones del pool ({process}) por estado', ['state']),
+        REGISTRY.gauge(f'{prefix}_db_pool_wait_seconds_total', f'Tiempo acumulado esperando conexión del pool ({process})'),
+    )
+    for process, prefix in (('api', 'api'), ('ingest', 'invoice_ingest'))
+}
+
+
+def record_pool_usage(db, process: str):
+    """
+    Actualizar gauges de uso del pool de conexiones
+
+    Args:
+        db: Instancia de Database
+        process: Proceso que publica las métricas ('api' o 'ingest')
+    """
+    connections, wait_total = _POOL_GAUGES[process]
+    stats = db.get_pool_stats()
+    for state in ('checked_out', 'checked_in', 'overflow', 'pool_size'):
+        if stats.get(state) is not None:
+            connections.set(stats[state], state=state)
+    if 'wait_time_total_ms' in stats:
+        wait_total.set(stats['wait_time_total_ms'] / 1000)
+
+
+def flush_pipeline_metrics(worker: str, db=None):
+    """
+    Publicar métricas de ingesta en el archivo de texto de este worker
+
+    Args:
+        worker: Identificador del proceso (host:pid)
+        db: Instancia de Database para incluir uso del pool (opcional)
+    """
+    if db is not None:
+        try:
+            record_pool_usage(db, 'ingest')
+        except Exception as e:
+            logger.debug(f"No se pudo leer el uso del pool: {e}")
+    INGEST_LAST_RUN_TIMESTAMP.set(time.time())
+    REGISTRY.write_textfile(worker)
@@ -3,18 +3,27 @@ Extracción de datos de facturas usando OpenAI GPT-4.1 Vision API y Tesseract OC
 """
 import base64
 import json
+import logging
 import os
 import time
 from pathlib import Path
 from typing import Dict, List, Optional
 from tenacity import retry, wait_random_exponential, stop_after_attempt
 import openai
-import pytesseract
-from PIL import Image
 import io
 
 from src.pdf_utils import pdf_to_base64, pdf_to_image
 from src.logging_conf import get_logger
+from src.metrics import (
+    PDF_RENDER_SECONDS,
+    OPENAI_REQUEST_SECONDS,
+    OPENAI_TOKENS_TOTAL,
+    OPENAI_RATE_LIMITED_TOTAL,
+    TESSERACT_SECONDS,
+    EXTRACTION_FALLBACKS_TOTAL,
+    record_openai_ratelimit_headers,
+)
+from src.pipeline.stage_timings import stage
 
 logger = get_logger(__name__)
 
@@ -109,10 +118,6 @@ class InvoiceExtractor:
         self.tesseract_cmd = os.getenv('TESSERACT_CMD', '/usr/bin/tesseract')
         self.tesseract_lang = os.getenv('TESSERACT_LANG', 'spa+eng')
         
-        # Configurar Tesseract
-        if os.path.exists(self.tesseract_cmd):
-            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
-        
         logger.info(f"InvoiceExtractor inicializado - OpenAI modelo: {self.model}")
 
     def _pdf_to_base64_image(self, pdf_path: str) -> Optional[str]:
@@ -127,9 +132,11 @@ class InvoiceExtractor:
         """
         try:
             from pdf2image import convert_from_path
+            from PIL import Image
 
             # Convertir primera página a imagen
-            images = convert_from_path(pdf_path, dpi=200, first_page=1, last_page=1)
+            with PDF_RENDER_SECONDS.time(), stage('render'):
+                images = convert_from_path(pdf_path, dpi=200, first_page=1, last_page=1)
 
             if not images:
                 logger.error("No se pudo convertir PDF a imagen")
@@ -137,20 +144,21 @@ class InvoiceExtractor:
 
             img = images[0]
 
-            # Convertir a RGB si es necesario
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            with stage('encode'):
+                # Convertir a RGB si es necesario
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
 
-            # Redimensionar si es demasiado grande (límite de OpenAI)
-            max_size = 1024  # Máximo 1024x1024 para evitar problemas
-            if img.width > max_size or img.height > max_size:
-                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                logger.debug(f"Imagen redimensionada a: {img.size}")
+                # Redimensionar si es demasiado grande (límite de OpenAI)
+                max_size = 1024  # Máximo 1024x1024 para evitar problemas
+                if img.width > max_size or img.height > max_size:
+                    img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+                    logger.debug(f"Imagen redimensionada a: {img.size}")
 
-            # Convertir a base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG', optimize=True)
-            img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+                # Convertir a base64
+                buffer = io.BytesIO()
+                img.save(buffer, format='PNG', optimize=True)
+                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
 
             logger.debug(f"PDF convertido a base64 ({len(img_base64)} caracteres)")
             return img_base64
@@ -176,40 +184,59 @@ class InvoiceExtractor:
         try:
             logger.debug("Enviando imagen a OpenAI Vision API")
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": PROMPT_TEMPLATE},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{img_base64}",
-                                    "detail": "high"  # Alta resolución para mejor lectura de texto
+            request_start = time.perf_counter()
+            try:
+                # with_raw_response: las cabeceras x-ratelimit alimentan el control adaptativo de lotes
+                raw_response = self.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": PROMPT_TEMPLATE},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/png;base64,{img_base64}",
+                                        "detail": "high"  # Alta resolución para mejor lectura de texto
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=400,  # Aumentado para incluir nombre_proveedor y nombre_cliente
-                temperature=0.1,  # Baja para respuestas deterministas
-                response_format={"type": "json_object"}  # Forzar JSON puro sin markdown
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=400,  # Aumentado para incluir nombre_proveedor y nombre_cliente
+                    temperature=0.1,  # Baja para respuestas deterministas
+                    response_format={"type": "json_object"}  # Forzar JSON puro sin markdown
+                )
+            except openai.RateLimitError as e:
+                OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - request_start, outcome='rate_limited')
+                OPENAI_RATE_LIMITED_TOTAL.inc()
+                record_openai_ratelimit_headers(getattr(e.response, 'headers', None), rate_limited=True)
+                raise
+            except Exception:
+                OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - request_start, outcome='error')
+                raise
+            OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - request_start, outcome='ok')
+            record_openai_ratelimit_headers(raw_response.headers)
+            response = raw_response.parse()
 
             # Extraer información de la respuesta
             choice = response.choices[0]
             finish_reason = choice.finish_reason
             content = choice.message.content
             
-            # Logging de metadata de la respuesta
-            logger.debug(f"OpenAI response metadata - Model: {response.model}, ID: {response.id}")
             if hasattr(response, 'usage') and response.usage:
-                logger.debug(f"OpenAI usage - Prompt tokens: {response.usage.prompt_tokens}, "
-                           f"Completion tokens: {response.usage.completion_tokens}, "
-                           f"Total tokens: {response.usage.total_tokens}")
-            logger.debug(f"OpenAI finish_reason: {finish_reason}")
+                OPENAI_TOKENS_TOTAL.inc(response.usage.prompt_tokens or 0, type='prompt')
+                OPENAI_TOKENS_TOTAL.inc(response.usage.completion_tokens or 0, type='completion')
+            
+            # Logging de metadata de la respuesta (solo se construye con DEBUG activo)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"OpenAI response metadata - Model: {response.model}, ID: {response.id}")
+                if hasattr(response, 'usage') and response.usage:
+                    logger.debug(f"OpenAI usage - Prompt tokens: {response.usage.prompt_tokens}, "
+                               f"Completion tokens: {response.usage.completion_tokens}, "
+                               f"Total tokens: {response.usage.total_tokens}")
+                logger.debug(f"OpenAI finish_reason: {finish_reason}")
             
             # Validar que hay contenido
             if not content:
@@ -235,8 +262,9 @@ class InvoiceExtractor:
             
             # Logging del contenido (solo primeros 200 chars para debug normal)
             content_stripped = content.strip()
-            logger.debug(f"OpenAI raw response (primeros 200 chars): '{content_stripped[:200]}...'")
-            logger.debug(f"OpenAI response length: {len(content_stripped)} caracteres")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"OpenAI raw response (primeros 200 chars): '{content_stripped[:200]}...'")
+                logger.debug(f"OpenAI response length: {len(content_stripped)} caracteres")
 
             # Limpiar markdown code blocks si existen (respaldo por si OpenAI no respeta response_format)
             if content_stripped.startswith('```'):
@@ -324,6 +352,18 @@ class InvoiceExtractor:
         """
         logger.info("Usando Tesseract como fallback")
         
+        with TESSERACT_SECONDS.time(), stage('fallback'):
+            return self._run_tesseract(pdf_path)
+
+    def _run_tesseract(self, pdf_path: str) -> dict:
+        """Renderizar la primera página y aplicar OCR + regex"""
+        # pytesseract solo hace falta en el fallback: no se importa al crear el extractor
+        import pytesseract
+        
+        # Configurar Tesseract
+        if os.path.exists(self.tesseract_cmd):
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        
         try:
             # Convertir PDF a imagen
             img = pdf_to_image(pdf_path, page=1, dpi=150)
@@ -457,7 +497,9 @@ class InvoiceExtractor:
             logger.info(f"Iniciando extracción de: {pdf_path}")
 
             # Verificar si el PDF está protegido con contraseña
-            if self._is_pdf_protected(pdf_path):
+            with stage('validate'):
+                protected = self._is_pdf_protected(pdf_path)
+            if protected:
                 logger.warning(f"PDF protegido con contraseña: {pdf_path} - omitiendo procesamiento")
                 return self._protected_pdf_result(pdf_path)
 
@@ -466,15 +508,18 @@ class InvoiceExtractor:
 
             if img_base64 is None:
                 logger.warning("No se pudo convertir PDF a base64, usando Tesseract")
+                EXTRACTION_FALLBACKS_TOTAL.inc(reason='render_error')
                 return self._extract_with_tesseract(pdf_path)
 
             try:
-                # Intentar con OpenAI primero
-                data = self._extract_with_openai(img_base64)
+                # Intentar con OpenAI primero (incluye reintentos y esperas de tenacity)
+                with stage('api'):
+                    data = self._extract_with_openai(img_base64)
 
                 # Si OpenAI dio confianza baja o no encontró importe, intentar Tesseract como complemento
                 if data.get('confianza') == 'baja' or not data.get('importe_total'):
                     logger.info("OpenAI confianza baja o sin importe, complementando con Tesseract")
+                    EXTRACTION_FALLBACKS_TOTAL.inc(reason='low_confidence')
                     tesseract_data = self._extract_with_tesseract(pdf_path)
 
                     # Combinar resultados (priorizar OpenAI pero llenar campos faltantes)
@@ -486,6 +531,7 @@ class InvoiceExtractor:
 
             except Exception as openai_error:
                 logger.warning(f"Error en OpenAI: {openai_error}, usando Tesseract")
+                EXTRACTION_FALLBACKS_TOTAL.inc(reason='openai_error')
                 return self._extract_with_tesseract(pdf_path)
         
         except Exception as e:
@@ -2,15 +2,14 @@
 Normalización y validación de datos extraídos de facturas
 """
 import re
+import importlib.util
 from datetime import datetime, timedelta, date
 from typing import Optional, Dict
 from decimal import Decimal
 
-try:
-    import dateparser
-    DATEPARSER_AVAILABLE = True
-except ImportError:
-    DATEPARSER_AVAILABLE = False
+# dateparser es opcional y lento de importar (compila sus tablas de idiomas):
+# solo se carga si una fecha no encaja en los formatos conocidos
+DATEPARSER_AVAILABLE = importlib.util.find_spec('dateparser') is not None
 
 from src.logging_conf import get_logger
 from src.utils.hash_generator import generate_content_hash
@@ -67,6 +66,8 @@ def normalize_date(date_str: str) -> Optional[str]:
     # Si dateparser está disponible, intentar parsear fechas en texto natural
     if DATEPARSER_AVAILABLE:
         try:
+            import dateparser
+            
             # Configurar dateparser para español
             parsed_date = dateparser.parse(
                 date_str,
@@ -317,6 +318,7 @@ def create_factura_dto(raw_data: dict, metadata: dict) -> dict:
         'drive_file_name': metadata.get('drive_file_name'),
         'drive_folder_name': metadata.get('drive_folder_name', 'unknown'),
         'drive_modified_time': metadata.get('drive_modified_time'),
+        'drive_md5_checksum': metadata.get('drive_md5_checksum'),
         
         # Campos extraídos
         'proveedor_text': raw_data.get('proveedor_text'),
@@ -1,14 +1,18 @@
 """
 Utilidades para procesamiento de archivos PDF
+
+pdf2image y PIL se importan dentro de las funciones que rasterizan: validar o
+borrar un PDF (lo que usa el pipeline antes de extraer) no los necesita.
 """
 import os
 import base64
 from pathlib import Path
-from typing import Optional
-from pdf2image import convert_from_path
-from PIL import Image
+from typing import Optional, TYPE_CHECKING
 import io
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 from src.logging_conf import get_logger
 
 logger = get_logger(__name__, component="backend")
@@ -58,6 +62,7 @@ def get_num_pages(pdf_path: str) -> int:
     except ImportError:
         # Fallback: usar pdf2image para contar
         try:
+            from pdf2image import convert_from_path
             images = convert_from_path(pdf_path)
             return len(images)
         except Exception:
@@ -99,7 +104,7 @@ def get_pdf_info(pdf_path: str) -> dict:
         logger.error(f"Error obteniendo info de PDF {pdf_path}: {e}")
         return {'error': str(e)}
 
-def pdf_to_image(pdf_path: str, page: int = 1, dpi: int = 200) -> Optional[Image.Image]:
+def pdf_to_image(pdf_path: str, page: int = 1, dpi: int = 200) -> Optional['Image.Image']:
     """
     Convertir página de PDF a imagen PIL
     
@@ -111,6 +116,9 @@ def pdf_to_image(pdf_path: str, page: int = 1, dpi: int = 200) -> Optional[Image
     Returns:
         Objeto PIL.Image o None si falla
     """
+    from pdf2image import convert_from_path
+    from PIL import Image
+    
     try:
         images = convert_from_path(
             pdf_path,
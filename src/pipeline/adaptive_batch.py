@@ -0,0 +1,237 @@
+"""
+Tamaño de lote y pausa entre lotes adaptativos (AIMD) para la ingesta incremental
+
+BATCH_SIZE, SLEEP_BETWEEN_BATCH_SEC e INTER_INVOICE_DELAY_SEC son solo el punto
+de partida. Al terminar cada lote se comparan las métricas de OpenAI y Drive
+(src.metrics) con las de antes del lote:
+
+- Congestión (429, tasa de errores, latencia media por encima del objetivo o
+  poca cuota restante según las cabeceras x-ratelimit): el lote se divide entre
+  dos, la pausa se duplica (como mínimo el retry-after de OpenAI) y la pausa
+  entre facturas también.
+- Sin congestión: el lote crece en uno, la pausa se reduce un paso y la pausa
+  entre facturas desaparece.
+
+Así el ritmo sigue la capacidad real de las APIs: sin pausas cuando no hay
+errores y frenando en cuanto aparecen.
+"""
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+from src.logging_conf import get_logger
+from src.metrics import (
+    DRIVE_DOWNLOAD_SECONDS,
+    DRIVE_RATE_LIMITED_TOTAL,
+    OPENAI_RATE_LIMITED_TOTAL,
+    OPENAI_RATELIMIT_REMAINING_RATIO,
+    OPENAI_REQUEST_SECONDS,
+    OPENAI_RETRY_AFTER_SECONDS,
+)
+
+logger = get_logger(__name__)
+
+# Decisiones recientes que se incluyen en las estadísticas de la ejecución
+_DECISIONES_RECIENTES = 20
+
+
+def _snapshot() -> Dict[str, float]:
+    """Valores acumulados de las métricas que usa el controlador"""
+    openai_ok, openai_ok_seconds = OPENAI_REQUEST_SECONDS.totals(outcome='ok')
+    openai_error, _ = OPENAI_REQUEST_SECONDS.totals(outcome='error')
+    openai_rate_limited, _ = OPENAI_REQUEST_SECONDS.totals(outcome='rate_limited')
+    drive_downloads, drive_seconds = DRIVE_DOWNLOAD_SECONDS.totals()
+
+    return {
+        'openai_requests': openai_ok + openai_error + openai_rate_limited,
+        'openai_ok': openai_ok,
+        'openai_ok_seconds': openai_ok_seconds,
+        'openai_errors': openai_error,
+        'openai_429': OPENAI_RATE_LIMITED_TOTAL.value(),
+        'drive_downloads': drive_downloads,
+        'drive_seconds': drive_seconds,
+        'drive_429': DRIVE_RATE_LIMITED_TOTAL.value(),
+    }
+
+
+class AdaptiveBatchController:
+    """Ajusta tamaño de lote, pausa entre lotes y pausa entre facturas según errores, latencias y cuota"""
+
+    def __init__(self, batch_size: int, sleep_seconds: float, invoice_delay_seconds: float = 0, enabled: bool = None):
+        """
+        Inicializar controlador
+
+        Args:
+            batch_size: Tamaño de lote inicial (BATCH_SIZE)
+            sleep_seconds: Pausa inicial entre lotes (SLEEP_BETWEEN_BATCH_SEC)
+            invoice_delay_seconds: Pausa inicial entre facturas de un lote (INTER_INVOICE_DELAY_SEC)
+            enabled: Ajustar lote y pausas (por defecto desde ADAPTIVE_BATCHING_ENABLED);
+                desactivado se mantienen los valores iniciales
+        """
+        if enabled is None:
+            enabled = os.getenv('ADAPTIVE_BATCHING_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+
+        self.min_batch = max(int(os.getenv('ADAPTIVE_BATCH_MIN', '1')), 1)
+        self.max_batch = max(int(os.getenv('ADAPTIVE_BATCH_MAX', '50')), batch_size)
+        self.min_sleep = float(os.getenv('ADAPTIVE_SLEEP_MIN_SEC', '0'))
+        self.max_sleep = max(float(os.getenv('ADAPTIVE_SLEEP_MAX_SEC', '120')), sleep_seconds)
+        self.sleep_step = float(os.getenv('ADAPTIVE_SLEEP_STEP_SEC', '2'))
+        self.max_invoice_delay = max(float(os.getenv('ADAPTIVE_INVOICE_DELAY_MAX_SEC', '30')), invoice_delay_seconds)
+        self.error_rate_max = float(os.getenv('ADAPTIVE_ERROR_RATE_MAX', '0.2'))
+        self.openai_latency_target = float(os.getenv('ADAPTIVE_OPENAI_LATENCY_TARGET_SEC', '30'))
+        self.drive_latency_target = float(os.getenv('ADAPTIVE_DRIVE_LATENCY_TARGET_SEC', '10'))
+        self.quota_min_ratio = float(os.getenv('ADAPTIVE_QUOTA_MIN_RATIO', '0.1'))
+
+        self.batch_size = batch_size
+        self.sleep_seconds = float(sleep_seconds)
+        self.invoice_delay_seconds = float(invoice_delay_seconds)
+
+        self.decisions_total = 0
+        self.increases = 0
+        self.decreases = 0
+        self.recent_decisions = deque(maxlen=_DECISIONES_RECIENTES)
+        self._before: Optional[Dict[str, float]] = None
+
+    def start_batch(self):
+        """Tomar las métricas de referencia antes de un lote"""
+        self._before = _snapshot()
+
+    def end_batch(self, download_errors: int = 0) -> Optional[Dict]:
+        """
+        Decidir tamaño de lote y pausas para el siguiente lote
+
+        Args:
+            download_errors: Descargas fallidas durante el lote
+
+        Returns:
+            Decisión tomada (observaciones, motivos, valores anteriores y nuevos)
+            o None si el controlador está desactivado o no se llamó a start_batch
+        """
+        if not self.enabled or self._before is None:
+            return None
+
+        observed = self._observe(download_errors)
+        self._before = None
+        reasons = self._congestion_reasons(observed)
+
+        previous_batch, previous_sleep = self.batch_size, self.sleep_seconds
+        previous_delay = self.invoice_delay_seconds
+        if reasons:
+            # Decremento multiplicativo: frenar en cuanto hay síntomas de saturación
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+            self.sleep_seconds = min(
+                self.max_sleep,
+                max(self.sleep_seconds * 2, observed['retry_after_sec'] or 0, 1.0)
+            )
+            self.invoice_delay_seconds = min(self.max_invoice_delay, max(self.invoice_delay_seconds * 2, 1.0))
+            action = 'decrease'
+            self.decreases += 1
+        elif observed['openai_requests'] or observed['drive_downloads']:
+            # Incremento aditivo: sondear poco a poco si cabe más
+            self.batch_size = min(self.max_batch, self.batch_size + 1)
+            self.sleep_seconds = max(self.min_sleep, self.sleep_seconds - self.sleep_step)
+            # Sin 429 ni congestión no hay motivo para esperar entre facturas
+            self.invoice_delay_seconds = 0.0
+            action = 'increase'
+            self.increases += 1
+        else:
+            # Lote sin llamadas a las APIs (todo omitido o rechazado): nada que medir
+            action = 'hold'
+
+        decision = {
+            'action': action,
+            'reasons': reasons,
+            'batch_size': {'before': previous_batch, 'after': self.batch_size},
+            'sleep_seconds': {'before': round(previous_sleep, 2), 'after': round(self.sleep_seconds, 2)},
+            'invoice_delay_seconds': {
+                'before': round(previous_delay, 2), 'after': round(self.invoice_delay_seconds, 2)
+            },
+            'observed': observed,
+        }
+        self.decisions_total += 1
+        self.recent_decisions.append(decision)
+
+        if action != 'hold':
+            logger.info(
+                f"Control adaptativo ({action}): lote {previous_batch} → {self.batch_size}, "
+                f"pausa {previous_sleep:.1f}s → {self.sleep_seconds:.1f}s, "
+                f"entre facturas {previous_delay:.1f}s → {self.invoice_delay_seconds:.1f}s"
+                + (f" ({', '.join(reasons)})" if reasons else ""),
+                extra={'adaptive_batching': decision}
+            )
+
+        return decision
+
+    def _observe(self, download_errors: int) -> Dict:
+        """Deltas de las métricas durante el lote"""
+        after = _snapshot()
+        delta = {key: after[key] - self._before[key] for key in after}
+
+        openai_errors = delta['openai_errors'] + delta['openai_429']
+        drive_errors = download_errors + delta['drive_429']
+        attempts = delta['openai_requests'] + delta['drive_downloads']
+
+        # El gauge de cuota conserva el último valor del proceso: solo cuenta si el lote
+        # llamó a OpenAI (si no, sería la cuota de un lote anterior)
+        quota_ratios = [
+            ratio for ratio in (
+                OPENAI_RATELIMIT_REMAINING_RATIO.value(resource='requests'),
+                OPENAI_RATELIMIT_REMAINING_RATIO.value(resource='tokens'),
+            ) if ratio is not None
+        ] if delta['openai_requests'] > 0 else []
+
+        return {
+            'openai_requests': int(delta['openai_requests']),
+            'openai_429': int(delta['openai_429']),
+            'openai_errors': int(delta['openai_errors']),
+            'openai_latency_avg_sec': (
+                round(delta['openai_ok_seconds'] / delta['openai_ok'], 3) if delta['openai_ok'] else None
+            ),
+            'drive_downloads': int(delta['drive_downloads']),
+            'drive_429': int(delta['drive_429']),
+            'drive_download_errors': download_errors,
+            'drive_latency_avg_sec': (
+                round(delta['drive_seconds'] / delta['drive_downloads'], 3) if delta['drive_downloads'] else None
+            ),
+            'error_rate': round((openai_errors + drive_errors) / attempts, 3) if attempts else 0.0,
+            'openai_quota_remaining_ratio': round(min(quota_ratios), 3) if quota_ratios else None,
+            'retry_after_sec': OPENAI_RETRY_AFTER_SECONDS.value() if delta['openai_429'] else None,
+        }
+
+    def _congestion_reasons(self, observed: Dict) -> List[str]:
+        """Motivos para reducir el ritmo (vacío si no hay congestión)"""
+        reasons = []
+        if observed['openai_429']:
+            reasons.append(f"openai_429={observed['openai_429']}")
+        if observed['drive_429']:
+            reasons.append(f"drive_429={observed['drive_429']}")
+        if observed['error_rate'] > self.error_rate_max:
+            reasons.append(f"error_rate={observed['error_rate']}")
+
+        openai_latency = observed['openai_latency_avg_sec']
+        if openai_latency is not None and openai_latency > self.openai_latency_target:
+            reasons.append(f"openai_latency={openai_latency}s")
+
+        drive_latency = observed['drive_latency_avg_sec']
+        if drive_latency is not None and drive_latency > self.drive_latency_target:
+            reasons.append(f"drive_latency={drive_latency}s")
+
+        quota = observed['openai_quota_remaining_ratio']
+        if quota is not None and quota < self.quota_min_ratio:
+            reasons.append(f"openai_quota={quota}")
+
+        return reasons
+
+    def to_dict(self) -> Dict:
+        """Estado y decisiones recientes (para IncrementalIngestStats)"""
+        return {
+            'enabled': self.enabled,
+            'batch_size': self.batch_size,
+            'sleep_seconds': round(self.sleep_seconds, 2),
+            'invoice_delay_seconds': round(self.invoice_delay_seconds, 2),
+            'decisions_total': self.decisions_total,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'recent_decisions': list(self.recent_decisions),
+        }
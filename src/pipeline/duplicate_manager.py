@@ -16,6 +16,7 @@ from typing import Optional, Dict, Tuple
 from enum import Enum
 
 from src.logging_conf import get_logger
+from src.pipeline.quarantine_catalog import register_quarantine_file
 
 logger = get_logger(__name__)
 
@@ -30,8 +31,14 @@ class DuplicateDecision(Enum):
 class DuplicateManager:
     """Gestor de duplicados"""
     
-    def __init__(self, quarantine_base_path: str = None):
-        """Inicializar gestor"""
+    def __init__(self, quarantine_base_path: str = None, db=None):
+        """Inicializar gestor
+        
+        Args:
+            quarantine_base_path: Ruta base de cuarentena (por defecto QUARANTINE_PATH)
+            db: Instancia de Database para registrar en el catálogo de cuarentena (opcional)
+        """
+        self.db = db
         self.quarantine_base_path = Path(
             quarantine_base_path or os.getenv('QUARANTINE_PATH', 'data/quarantine')
         )
@@ -180,6 +187,8 @@ class DuplicateManager:
             with open(meta_file, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
             
+            register_quarantine_file(self.db, metadata, meta_file, self.quarantine_base_path)
+            
             logger.info(f"Archivo movido a cuarentena: {quarantine_file}")
             
             return str(quarantine_file)
@@ -238,6 +247,7 @@ class DuplicateManager:
         from datetime import timedelta
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         removed_count = 0
+        removed_meta_files = []
         
         for folder in [self.duplicates_path, self.review_path]:
             if not folder.exists():
@@ -250,8 +260,17 @@ class DuplicateManager:
                         try:
                             file_path.unlink()
                             removed_count += 1
+                            if file_path.name.endswith('.meta.json'):
+                                removed_meta_files.append(str(file_path.relative_to(self.quarantine_base_path)))
                         except Exception as e:
                             logger.warning(f"Error eliminando archivo antiguo: {e}")
         
+        if removed_meta_files and self.db is not None:
+            try:
+                from src.db.repositories import QuarantineRepository
+                QuarantineRepository(self.db).delete_by_meta_files(removed_meta_files)
+            except Exception as e:
+                logger.warning(f"Error limpiando catálogo de cuarentena: {e}")
+        
         if removed_count > 0:
             logger.info(f"Limpiados {removed_count} archivos de cuarentena antiguos")
@@ -5,22 +5,46 @@ import os
 import json
 import shutil
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, TYPE_CHECKING
 from datetime import datetime
 import time
 
 from src.db.database import Database
 from src.db.repositories import FacturaRepository, EventRepository
-from src.ocr_extractor import InvoiceExtractor
 from src.parser_normalizer import create_factura_dto
 from src.pipeline.validate import validate_business_rules, validate_file_integrity
 from src.pdf_utils import validate_pdf, cleanup_temp_file
 from src.logging_conf import get_logger
 from src.pipeline.duplicate_manager import DuplicateManager, DuplicateDecision
+from src.pipeline.quarantine_catalog import register_quarantine_file
+from src.metrics import DB_UPSERT_SECONDS, DUPLICATE_DECISIONS_TOTAL, FILES_PROCESSED_TOTAL
+from src.pipeline.stage_timings import (
+    StageTimer,
+    stage,
+    activate_stage_timer,
+    deactivate_stage_timer,
+    summarize_stage_timings,
+)
+
+if TYPE_CHECKING:
+    # Solo para anotaciones: el extractor lo crea quien llama (importar openai aquí
+    # lo cargaría en todo lo que usa process_batch)
+    from src.ocr_extractor import InvoiceExtractor
 
 logger = get_logger(__name__)
 
-def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Database, force_reprocess: bool = False) -> dict:
+# Pausa entre facturas de un lote (segundos) para no disparar el rate limit de OpenAI.
+# En la ingesta incremental es el valor inicial: AdaptiveBatchController la ajusta
+INTER_INVOICE_DELAY_SEC = float(os.getenv('INTER_INVOICE_DELAY_SEC', '5'))
+
+
+def process_batch(
+    files_list: List[dict],
+    extractor: 'InvoiceExtractor',
+    db: Database,
+    force_reprocess: bool = False,
+    inter_invoice_delay: Optional[float] = None
+) -> dict:
     """
     Procesar un lote de archivos de facturas con detección de duplicados
     
@@ -29,10 +53,16 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
         extractor: Instancia de InvoiceExtractor
         db: Instancia de Database
         force_reprocess: Si es True, permite reprocesar archivos existentes en estado 'revisar' o 'error'
+        inter_invoice_delay: Pausa entre facturas en segundos (por defecto INTER_INVOICE_DELAY_SEC)
     
     Returns:
-        Diccionario con estadísticas del procesamiento
+        Diccionario con estadísticas del procesamiento. Cada entrada de
+        'archivos_procesados' incluye 'drive_file_id', 'timings_ms' (ms por etapa) y
+        'stage_timings_ms' agrega percentiles por etapa del lote
     """
+    if inter_invoice_delay is None:
+        inter_invoice_delay = INTER_INVOICE_DELAY_SEC
+    
     stats = {
         'total': len(files_list),
         'exitosos': 0,
@@ -48,12 +78,15 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
     
     factura_repo = FacturaRepository(db)
     event_repo = EventRepository(db)
-    duplicate_manager = DuplicateManager()
+    duplicate_manager = DuplicateManager(db=db)
     
     logger.info(f"Iniciando procesamiento batch de {stats['total']} archivos con detección de duplicados")
     
     for idx, file_info in enumerate(files_list, 1):
         start_time = time.time()
+        timer = StageTimer()
+        timer_token = activate_stage_timer(timer)
+        entries_before = len(stats['archivos_procesados'])
         
         drive_file_id = file_info.get('id')
         file_name = file_info.get('name', 'unknown')
@@ -88,6 +121,7 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                         stats['fallidos'] += 1
                         stats['archivos_procesados'].append({
                             'file_name': file_name,
+                            'drive_file_id': drive_file_id,
                             'status': 'rejected_size',
                             'error': error_msg
                         })
@@ -104,15 +138,18 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 except (ValueError, TypeError):
                     expected_size = None
             
-            if not validate_file_integrity(local_path, expected_size=expected_size):
+            with stage('validate'):
+                file_ok = validate_file_integrity(local_path, expected_size=expected_size)
+            if not file_ok:
                 raise ValueError(f"Archivo inválido o corrupto: {file_name}")
             
             # Extraer datos con OCR (arquitectura híbrida)
             logger.info(f"Extrayendo datos: {file_name}", extra={'drive_file_id': drive_file_id})
             
-            # Espera de 3 segundos entre facturas para evitar rate limiting de OpenAI
-            if idx > 1:  # No esperar antes de la primera factura
-                time.sleep(5)  # Delay de 5 segundos para evitar rate limits de OpenAI
+            # Espera entre facturas para evitar rate limiting de OpenAI
+            if idx > 1 and inter_invoice_delay > 0:  # No esperar antes de la primera factura
+                with stage('throttle'):
+                    time.sleep(inter_invoice_delay)
             
             raw_data = extractor.extract_invoice_data(local_path)
             
@@ -135,12 +172,14 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 'drive_file_name': file_name,
                 'drive_folder_name': file_info.get('folder_name', 'unknown'),
                 'drive_modified_time': file_info.get('modifiedTime'),
+                'drive_md5_checksum': file_info.get('md5Checksum'),
                 'extractor': extractor_used,
                 'processed_at': datetime.utcnow().isoformat()
             }
             
             # Crear DTO (incluye cálculo automático de hash_contenido)
-            factura_dto = create_factura_dto(raw_data, metadata)
+            with stage('dto'):
+                factura_dto = create_factura_dto(raw_data, metadata)
             
             # ====================================================================
             # VALIDACIÓN CRÍTICA: Proveedor/Emisor es OBLIGATORIO
@@ -154,7 +193,8 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 factura_dto['error_msg'] = error_msg
                 
                 # Mover a cuarentena (usar REVIEW como decisión para archivos problemáticos)
-                duplicate_manager.move_to_quarantine(file_info, DuplicateDecision.REVIEW, factura_dto, error_msg)
+                with stage('quarantine_move'):
+                    duplicate_manager.move_to_quarantine(file_info, DuplicateDecision.REVIEW, factura_dto, error_msg)
                 
                 # Registrar evento
                 event_repo.insert_event(
@@ -167,6 +207,7 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 stats['fallidos'] += 1
                 stats['archivos_procesados'].append({
                     'file_name': file_name,
+                    'drive_file_id': drive_file_id,
                     'status': 'failed',
                     'reason': error_msg,
                     'elapsed_ms': int((time.time() - start_time) * 1000)
@@ -188,7 +229,8 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 factura_dto['error_msg'] = error_msg
                 
                 # Mover a cuarentena
-                duplicate_manager.move_to_quarantine(file_info, DuplicateDecision.REVIEW, factura_dto, error_msg)
+                with stage('quarantine_move'):
+                    duplicate_manager.move_to_quarantine(file_info, DuplicateDecision.REVIEW, factura_dto, error_msg)
                 
                 # Registrar evento
                 event_repo.insert_event(
@@ -201,6 +243,7 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 stats['fallidos'] += 1
                 stats['archivos_procesados'].append({
                     'file_name': file_name,
+                    'drive_file_id': drive_file_id,
                     'status': 'failed',
                     'reason': error_msg,
                     'elapsed_ms': int((time.time() - start_time) * 1000)
@@ -214,22 +257,24 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
             # ====================================================================
             hash_contenido = factura_dto.get('hash_contenido')
             
-            # Buscar facturas existentes
-            existing_by_file_id = factura_repo.find_by_file_id(drive_file_id)
-            existing_by_hash = factura_repo.find_by_hash(hash_contenido) if hash_contenido else None
-            existing_by_number = factura_repo.find_by_invoice_number(
-                factura_dto.get('proveedor_text'),
-                factura_dto.get('numero_factura')
-            )
-            
-            # Decidir acción basándose en duplicados
-            decision, reason = duplicate_manager.decide_action(
-                factura_dto,
-                existing_by_file_id,
-                existing_by_hash,
-                existing_by_number,
-                force_reprocess=force_reprocess
-            )
+            with stage('duplicate_lookup'):
+                # Buscar facturas existentes
+                existing_by_file_id = factura_repo.find_by_file_id(drive_file_id)
+                existing_by_hash = factura_repo.find_by_hash(hash_contenido) if hash_contenido else None
+                existing_by_number = factura_repo.find_by_invoice_number(
+                    factura_dto.get('proveedor_text'),
+                    factura_dto.get('numero_factura')
+                )
+                
+                # Decidir acción basándose en duplicados
+                decision, reason = duplicate_manager.decide_action(
+                    factura_dto,
+                    existing_by_file_id,
+                    existing_by_hash,
+                    existing_by_number,
+                    force_reprocess=force_reprocess
+                )
+            DUPLICATE_DECISIONS_TOTAL.inc(decision=decision.value)
             
             logger.info(
                 f"Decisión de duplicado: {decision.value} - {reason}",
@@ -256,6 +301,7 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 stats['ignorados'] += 1
                 stats['archivos_procesados'].append({
                     'file_name': file_name,
+                    'drive_file_id': drive_file_id,
                     'status': 'ignored',
                     'reason': reason,
                     'elapsed_ms': int((time.time() - start_time) * 1000)
@@ -269,11 +315,13 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 factura_dto['error_msg'] = reason
                 
                 # Mover a cuarentena
-                duplicate_manager.move_to_quarantine(file_info, decision, factura_dto, reason)
+                with stage('quarantine_move'):
+                    duplicate_manager.move_to_quarantine(file_info, decision, factura_dto, reason)
                 
                 # No insertar en BD (ya existe)
                 stats['archivos_procesados'].append({
                     'file_name': file_name,
+                    'drive_file_id': drive_file_id,
                     'status': 'duplicate',
                     'reason': reason,
                     'elapsed_ms': int((time.time() - start_time) * 1000)
@@ -287,7 +335,8 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
                 factura_dto['error_msg'] = reason
                 
                 # Mover a cuarentena de revisión
-                duplicate_manager.move_to_quarantine(file_info, decision, factura_dto, reason)
+                with stage('quarantine_move'):
+                    duplicate_manager.move_to_quarantine(file_info, decision, factura_dto, reason)
                 
                 # Guardar en pending
                 save_to_pending_queue(factura_dto)
@@ -324,7 +373,8 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
             
             # Insertar/actualizar en BD
             increment_revision = (decision == DuplicateDecision.UPDATE_REVISION)
-            factura_id = factura_repo.upsert_factura(factura_dto, increment_revision=increment_revision)
+            with DB_UPSERT_SECONDS.time(), stage('upsert'):
+                factura_id = factura_repo.upsert_factura(factura_dto, increment_revision=increment_revision)
             
             # Calcular tiempo de procesamiento
             elapsed_ms = int((time.time() - start_time) * 1000)
@@ -340,6 +390,7 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
             stats['exitosos'] += 1
             stats['archivos_procesados'].append({
                 'file_name': file_name,
+                'drive_file_id': drive_file_id,
                 'status': 'success',
                 'elapsed_ms': elapsed_ms,
                 'factura_id': factura_id
@@ -368,11 +419,13 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
             )
             
             # Manejar fallo
-            handle_failure(file_info, e)
+            with stage('quarantine_move'):
+                handle_failure(file_info, e, db)
             
             stats['fallidos'] += 1
             stats['archivos_procesados'].append({
                 'file_name': file_name,
+                'drive_file_id': drive_file_id,
                 'status': 'failed',
                 'error': str(e),
                 'elapsed_ms': elapsed_ms
@@ -382,8 +435,17 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
             # Limpiar archivo temporal
             if local_path and os.path.exists(local_path):
                 cleanup_temp_file(local_path)
+            
+            deactivate_stage_timer(timer_token)
+            if len(stats['archivos_procesados']) > entries_before:
+                record_stage_timings(stats['archivos_procesados'][-1], timer, drive_file_id, event_repo)
     
     # Finalizar stats
+    stats['stage_timings_ms'] = summarize_stage_timings(
+        [a['timings_ms'] for a in stats['archivos_procesados'] if 'timings_ms' in a]
+    )
+    for archivo in stats['archivos_procesados']:
+        FILES_PROCESSED_TOTAL.inc(status=archivo.get('status', 'unknown'))
     stats['fin'] = datetime.utcnow().isoformat()
     stats['duracion_total_s'] = (
         datetime.fromisoformat(stats['fin']) - 
@@ -397,13 +459,39 @@ def process_batch(files_list: List[dict], extractor: InvoiceExtractor, db: Datab
     
     return stats
 
-def handle_failure(file_info: dict, error: Exception):
+def record_stage_timings(entry: dict, timer: StageTimer, drive_file_id: str, event_repo: EventRepository):
+    """
+    Adjuntar tiempos por etapa al resultado del archivo y persistirlos en ingest_events
+
+    Args:
+        entry: Entrada de 'archivos_procesados' del archivo
+        timer: Timer del archivo
+        drive_file_id: ID del archivo en Google Drive
+        event_repo: Repositorio de eventos
+    """
+    timings = timer.as_dict()
+    entry['timings_ms'] = timings
+    try:
+        event_repo.insert_event(
+            drive_file_id,
+            'ingest_timings',
+            'INFO',
+            f"{entry.get('status')} en {timings['total']}ms",
+            timings_ms=timings
+        )
+    except Exception as e:
+        # Los tiempos son diagnóstico: no deben romper el lote
+        logger.warning(f"No se pudieron guardar tiempos por etapa: {e}", extra={'drive_file_id': drive_file_id})
+
+
+def handle_failure(file_info: dict, error: Exception, db: Database = None):
     """
     Manejar fallo de procesamiento (mover a cuarentena)
     
     Args:
         file_info: Información del archivo
         error: Excepción capturada
+        db: Instancia de Database para registrar en el catálogo de cuarentena (opcional)
     """
     try:
         local_path = file_info.get('local_path')
@@ -449,6 +537,8 @@ def handle_failure(file_info: dict, error: Exception):
         with open(meta_file, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
         
+        register_quarantine_file(db, metadata, meta_file, quarantine_path)
+        
         logger.warning(f"Archivo movido a cuarentena: {quarantine_file}")
     
     except Exception as e:
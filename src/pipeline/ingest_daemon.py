@@ -0,0 +1,434 @@
+"""
+Daemon de ingesta incremental: un proceso de larga duración en lugar de cron
+
+Cada ejecución de cron arranca un Python nuevo: vuelve a importar openai y
+googleapiclient, autentica la service account, crea el engine de BD y el
+InvoiceExtractor y relee los alias de proveedores. El daemon crea un único
+IncrementalIngestPipeline y lo reutiliza, así que el cliente de Drive, el pool
+de conexiones, el cliente de OpenAI y las cachés en memoria siguen calientes.
+
+Cuándo se ejecuta:
+- Cada INGEST_DAEMON_INTERVAL_SEC (como el cron).
+- Antes, si llega una notificación push de Drive (changes.watch) al endpoint
+  POST /drive/notifications; las ráfagas se agrupan en una sola ejecución
+  (como mucho una cada INGEST_DAEMON_MIN_GAP_SEC).
+- Enseguida, si la ejecución anterior dejó el listado de Drive a medias
+  (MAX_PAGES_PER_RUN).
+
+GET /health devuelve el estado en JSON (200 sano, 503 si fallan las ejecuciones
+o no termina ninguna a tiempo). SIGTERM/SIGINT piden una parada ordenada: se
+termina el lote en curso, el listado queda con su punto de continuación y se da
+de baja el canal de Drive; una segunda señal sale inmediatamente.
+"""
+import hmac
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from filelock import Timeout
+
+from src.pipeline.ingest_incremental import IncrementalIngestPipeline
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+# Estados de notificación de Drive que indican cambios ('sync' es el saludo inicial)
+_ESTADOS_CAMBIO = {'change', 'add', 'update', 'remove', 'trash', 'untrash'}
+
+
+class IngestDaemon:
+    """Ejecuta el pipeline incremental en bucle con los recursos ya inicializados"""
+
+    def __init__(
+        self,
+        pipeline: IncrementalIngestPipeline = None,
+        interval_sec: int = None,
+        min_gap_sec: int = None,
+        http_port: int = None,
+        webhook_url: str = None,
+        webhook_token: str = None
+    ):
+        """
+        Inicializar daemon
+
+        Args:
+            pipeline: Pipeline a reutilizar (por defecto uno nuevo desde env)
+            interval_sec: Segundos entre ejecuciones (por defecto desde INGEST_DAEMON_INTERVAL_SEC)
+            min_gap_sec: Separación mínima entre ejecuciones adelantadas por notificaciones
+                o listados pendientes (por defecto desde INGEST_DAEMON_MIN_GAP_SEC)
+            http_port: Puerto de /health y /drive/notifications (0 = sin servidor HTTP)
+            webhook_url: URL pública de /drive/notifications para registrar el canal de
+                Drive (por defecto desde DRIVE_WEBHOOK_URL; vacío = no registrar)
+            webhook_token: Token que deben traer las notificaciones (por defecto desde
+                DRIVE_WEBHOOK_TOKEN; vacío = endpoint desactivado)
+        """
+        self.interval_sec = interval_sec or int(os.getenv('INGEST_DAEMON_INTERVAL_SEC', '900'))
+        self.min_gap_sec = min_gap_sec if min_gap_sec is not None else int(os.getenv('INGEST_DAEMON_MIN_GAP_SEC', '30'))
+        self.http_port = http_port if http_port is not None else int(os.getenv('INGEST_DAEMON_HTTP_PORT', '8081'))
+        self.webhook_url = webhook_url if webhook_url is not None else os.getenv('DRIVE_WEBHOOK_URL', '')
+        self.webhook_token = webhook_token if webhook_token is not None else os.getenv('DRIVE_WEBHOOK_TOKEN', '')
+        self.channel_ttl_sec = int(os.getenv('DRIVE_WEBHOOK_CHANNEL_TTL_SEC', '86400'))
+        self.max_consecutive_failures = int(os.getenv('INGEST_DAEMON_MAX_FAILURES', '3'))
+        # Sin ninguna ejecución correcta en este tiempo, /health responde 503
+        self.stale_after_sec = int(os.getenv('INGEST_DAEMON_STALE_SEC', str(self.interval_sec * 3)))
+
+        if self.webhook_url and not self.webhook_token:
+            raise ValueError("DRIVE_WEBHOOK_URL requiere DRIVE_WEBHOOK_TOKEN")
+
+        self.pipeline = pipeline or IncrementalIngestPipeline()
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._channel: Optional[Dict] = None
+
+        # Estado para /health
+        self.started_at = datetime.utcnow()
+        self.running = False
+        self.runs_total = 0
+        self.runs_failed = 0
+        self.consecutive_failures = 0
+        self.notifications_total = 0
+        self.last_run: Optional[Dict] = None
+        self.last_success_at: Optional[datetime] = None
+        self._last_success_monotonic = time.monotonic()
+        self._pending_reason: Optional[str] = None
+        self.next_run_at: Optional[datetime] = None
+
+        logger.info(
+            f"IngestDaemon inicializado: interval={self.interval_sec}s, min_gap={self.min_gap_sec}s, "
+            f"http_port={self.http_port or 'desactivado'}, "
+            f"webhook={'registrado en ' + self.webhook_url if self.webhook_url else 'sin canal'}"
+        )
+
+    def run_forever(self) -> int:
+        """
+        Bucle principal: ejecutar, esperar al siguiente disparo y repetir hasta la parada
+
+        Returns:
+            Código de salida (0 parada ordenada, 1 si la última ejecución falló)
+        """
+        self._install_signal_handlers()
+        self._start_http_server()
+
+        try:
+            reason = 'startup'
+            while not self._stopping.is_set():
+                self._renew_channel_if_needed()
+                ran_ok = self._run_once(reason)
+
+                # Listado de Drive a medias: seguir enseguida en lugar de esperar al intervalo
+                pending = bool(ran_ok and self.last_run['stats'].get('drive_list_continuation_pending'))
+                reason = self._wait_next_run(self.min_gap_sec if pending else self.interval_sec)
+                if reason is None:
+                    break
+                if pending and reason == 'interval':
+                    reason = 'continuation'
+        finally:
+            self.shutdown()
+
+        return 1 if self.last_run and self.last_run['status'] == 'error' else 0
+
+    def request_run(self, reason: str = 'manual'):
+        """
+        Adelantar la siguiente ejecución (respetando INGEST_DAEMON_MIN_GAP_SEC)
+
+        Args:
+            reason: Motivo (aparece en /health y en los logs)
+        """
+        with self._lock:
+            self._pending_reason = reason
+        self._wakeup.set()
+
+    def stop(self, reason: str = 'stop'):
+        """
+        Pedir la parada ordenada: la ejecución en curso termina su lote y no se inician más
+
+        Args:
+            reason: Motivo de la parada (para logs)
+        """
+        if self._stopping.is_set():
+            return
+        logger.info(f"Parada del daemon solicitada ({reason}): terminando el lote en curso...")
+        self._stopping.set()
+        self.pipeline.request_stop()
+        self._wakeup.set()
+
+    def shutdown(self):
+        """Liberar recursos: servidor HTTP, canal de Drive y pool de BD"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+        if self._channel is not None:
+            try:
+                self.pipeline.drive_client.stop_channel(self._channel)
+            except Exception as e:
+                # Sin baja explícita el canal caduca solo en su expiración
+                logger.warning(f"No se pudo cerrar el canal de Drive {self._channel['id']}: {e}")
+            self._channel = None
+
+        self.pipeline.db.close()
+        logger.info("Daemon de ingesta detenido")
+
+    def _run_once(self, reason: str) -> bool:
+        """
+        Ejecutar el pipeline una vez y registrar el resultado para /health
+
+        Args:
+            reason: Motivo de la ejecución (startup, interval, notification, continuation...)
+
+        Returns:
+            True si la ejecución terminó correctamente
+        """
+        started_at = datetime.utcnow()
+        inicio = time.monotonic()
+        self.running = True
+        self.next_run_at = None
+        logger.info(f"Ejecución del daemon #{self.runs_total + 1} ({reason})")
+
+        status = 'ok'
+        error = None
+        stats = {}
+        try:
+            stats = self.pipeline.run()
+        except Timeout:
+            # Otra instancia (p. ej. el cron aún activo) tiene el JobLock: no es un fallo del daemon
+            status = 'locked'
+            logger.warning("Otra instancia de la ingesta tiene el lock; se reintentará en el siguiente disparo")
+        except Exception as e:
+            status = 'error'
+            error = str(e)[:500]
+            logger.error(f"Ejecución del daemon fallida: {e}", exc_info=True)
+        finally:
+            self.running = False
+
+        with self._lock:
+            self.runs_total += 1
+            if status == 'error':
+                self.runs_failed += 1
+                self.consecutive_failures += 1
+            elif status == 'ok':
+                self.consecutive_failures = 0
+                self.last_success_at = datetime.utcnow()
+                self._last_success_monotonic = time.monotonic()
+
+            self.last_run = {
+                'reason': reason,
+                'status': status,
+                'error': error,
+                'started_at': started_at.isoformat(),
+                'duration_seconds': round(time.monotonic() - inicio, 2),
+                'stats': stats,
+            }
+
+        logger.info(
+            f"Ejecución del daemon terminada ({status}) en {self.last_run['duration_seconds']}s",
+            extra={'ingest_daemon_run': {k: v for k, v in self.last_run.items() if k != 'stats'}}
+        )
+        return status == 'ok'
+
+    def _wait_next_run(self, delay_sec: float) -> Optional[str]:
+        """
+        Esperar hasta el siguiente disparo: intervalo, notificación o parada
+
+        Las notificaciones adelantan la ejecución, pero nunca a menos de
+        INGEST_DAEMON_MIN_GAP_SEC de la anterior: una ráfaga de cambios en Drive
+        se procesa en una sola ejecución.
+
+        Args:
+            delay_sec: Segundos hasta la siguiente ejecución si no llega nada antes
+
+        Returns:
+            Motivo de la siguiente ejecución, o None si se pidió la parada
+        """
+        ahora = time.monotonic()
+        deadline = ahora + delay_sec
+        earliest = ahora + self.min_gap_sec
+        reason = 'interval'
+
+        while not self._stopping.is_set():
+            self.next_run_at = datetime.utcfromtimestamp(time.time() + max(deadline - time.monotonic(), 0))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return reason
+
+            if self._wakeup.wait(remaining):
+                self._wakeup.clear()
+                with self._lock:
+                    pending_reason, self._pending_reason = self._pending_reason, None
+                if pending_reason:
+                    reason = pending_reason
+                    deadline = min(deadline, max(earliest, time.monotonic()))
+
+        return None
+
+    def health(self) -> Dict:
+        """
+        Estado del daemon para GET /health
+
+        Returns:
+            Diccionario con 'healthy' y el detalle de ejecuciones, canal y configuración
+        """
+        with self._lock:
+            since_success = time.monotonic() - self._last_success_monotonic
+            problems = []
+            if self._stopping.is_set():
+                problems.append('stopping')
+            if self.consecutive_failures >= self.max_consecutive_failures:
+                problems.append(f'consecutive_failures={self.consecutive_failures}')
+            if since_success > self.stale_after_sec:
+                problems.append(f'no_successful_run_for={int(since_success)}s')
+
+            last_run = None
+            if self.last_run:
+                last_run = {k: v for k, v in self.last_run.items() if k != 'stats'}
+                last_run['stats'] = {
+                    key: self.last_run['stats'].get(key)
+                    for key in (
+                        'drive_items_listed_total', 'files_downloaded', 'files_skipped_unchanged',
+                        'invoices_processed_ok_total', 'invoices_error_total',
+                        'invoices_reprocessed_total', 'drive_list_continuation_pending',
+                        'last_sync_time_after', 'interrupted'
+                    )
+                } if self.last_run['stats'] else None
+
+            return {
+                'healthy': not problems,
+                'problems': problems,
+                'started_at': self.started_at.isoformat(),
+                'uptime_seconds': round((datetime.utcnow() - self.started_at).total_seconds(), 1),
+                'running': self.running,
+                'runs_total': self.runs_total,
+                'runs_failed': self.runs_failed,
+                'consecutive_failures': self.consecutive_failures,
+                'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+                'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+                'last_run': last_run,
+                'notifications_total': self.notifications_total,
+                'drive_channel': {
+                    'id': self._channel['id'],
+                    'expiration': datetime.utcfromtimestamp(self._channel['expiration']).isoformat()
+                } if self._channel else None,
+                'interval_sec': self.interval_sec,
+            }
+
+    def handle_notification(self, headers) -> int:
+        """
+        Procesar una notificación push de Drive
+
+        Args:
+            headers: Cabeceras HTTP de la notificación (X-Goog-*)
+
+        Returns:
+            Código HTTP de respuesta
+        """
+        if not self.webhook_token:
+            return 404
+
+        token = headers.get('X-Goog-Channel-Token') or ''
+        if not hmac.compare_digest(token.encode(), self.webhook_token.encode()):
+            logger.warning("Notificación de Drive rechazada: token inválido")
+            return 403
+
+        state = headers.get('X-Goog-Resource-State', '')
+        if state in _ESTADOS_CAMBIO:
+            with self._lock:
+                self.notifications_total += 1
+            self.request_run('notification')
+        # Drive reintenta lo que no reciba 2xx; el saludo 'sync' solo se confirma
+        return 200
+
+    def _renew_channel_if_needed(self):
+        """Registrar el canal de Drive o renovarlo antes de que expire"""
+        if not self.webhook_url:
+            return
+
+        # Renovar con margen: el bucle puede tardar un intervalo en volver a comprobarlo
+        margin = max(self.interval_sec * 2, 3600)
+        if self._channel and self._channel['expiration'] - time.time() > margin:
+            return
+
+        previous = self._channel
+        try:
+            self._channel = self.pipeline.drive_client.watch_changes(
+                self.webhook_url, self.webhook_token, self.channel_ttl_sec
+            )
+        except Exception as e:
+            # Sin canal el daemon sigue funcionando por intervalo
+            logger.error(f"No se pudo registrar el canal de notificaciones de Drive: {e}")
+            return
+
+        if previous:
+            try:
+                self.pipeline.drive_client.stop_channel(previous)
+            except Exception as e:
+                logger.warning(f"No se pudo cerrar el canal anterior {previous['id']}: {e}")
+
+    def _start_http_server(self):
+        """Arrancar /health y /drive/notifications en un hilo aparte"""
+        if not self.http_port:
+            return
+
+        self._server = ThreadingHTTPServer(('0.0.0.0', self.http_port), _build_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='ingest-daemon-http', daemon=True).start()
+        logger.info(f"Servidor HTTP del daemon escuchando en :{self.http_port}")
+
+    def _install_signal_handlers(self):
+        """SIGTERM/SIGINT: parada ordenada; una segunda señal sale inmediatamente"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def _handler(signum, frame):
+            if self._stopping.is_set():
+                logger.warning("Segunda señal recibida: saliendo sin esperar al lote en curso")
+                raise KeyboardInterrupt
+            self.stop(signal.Signals(signum).name)
+
+        signal.signal(signal.SIGTERM, _handler)
+        signal.signal(signal.SIGINT, _handler)
+
+
+def _build_handler(daemon: IngestDaemon):
+    """Handler HTTP ligado a una instancia del daemon"""
+
+    class _DaemonRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/health':
+                self._send(404, {'detail': 'Not found'})
+                return
+            health = daemon.health()
+            self._send(200 if health['healthy'] else 503, health)
+
+        def do_POST(self):
+            if self.path.split('?')[0] != '/drive/notifications':
+                self._send(404, {'detail': 'Not found'})
+                return
+            # Las notificaciones de Drive no traen cuerpo útil; vaciarlo si lo hay
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            status = daemon.handle_notification(self.headers)
+            self._send(status, {'accepted': status == 200})
+
+        def _send(self, status: int, payload: Dict):
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Los health checks cada pocos segundos no deben llenar el log
+            logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    return _DaemonRequestHandler
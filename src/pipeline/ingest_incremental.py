@@ -3,11 +3,14 @@ Pipeline de ingesta incremental desde Google Drive
 Procesa solo archivos nuevos o modificados desde la última sincronización
 """
 import os
-import time
+import socket
 import tempfile
+import threading
 import shutil
 from pathlib import Path
 from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 from src.drive.drive_incremental import DriveIncrementalClient
@@ -15,11 +18,13 @@ from src.drive_client import DriveClient
 from src.sync.state_store import get_state_store
 from src.ocr_extractor import InvoiceExtractor
 from src.db.database import Database
-from src.db.repositories import FacturaRepository, EventRepository
-from src.pipeline.ingest import process_batch
+from src.db.repositories import FacturaRepository, EventRepository, IngestQueueRepository
+from src.pipeline.ingest import process_batch, INTER_INVOICE_DELAY_SEC
+from src.pipeline.adaptive_batch import AdaptiveBatchController
 from src.pipeline.job_lock import JobLock
 from src.logging_conf import get_logger
 from src.utils.disk_space import check_disk_space
+from src.metrics import DRIVE_DOWNLOAD_SECONDS, INGEST_QUEUE_DEPTH, flush_pipeline_metrics
 from filelock import Timeout
 
 logger = get_logger(__name__)
@@ -32,6 +37,8 @@ class IncrementalIngestStats:
         self.start_time = datetime.utcnow()
         self.drive_items_listed_total = 0
         self.drive_pages_fetched_total = 0
+        self.drive_list_resumed = False
+        self.drive_list_continuation_pending = False
         self.invoices_processed_ok_total = 0
         self.invoices_duplicate_total = 0
         self.invoices_revision_total = 0
@@ -48,7 +55,14 @@ class IncrementalIngestStats:
         self.files_downloaded = 0
         self.download_errors = 0
         self.files_rejected_size = 0
+        self.files_skipped_unchanged = 0
         self.batch_errors = 0
+        self.queue_enqueued_total = 0
+        self.queue_claimed_total = 0
+        self.queue_failed_total = 0
+        self.max_modified_time_enqueued = None
+        self.interrupted = False
+        self.adaptive_batching = None
         
     def to_dict(self) -> Dict:
         """Convertir a diccionario"""
@@ -61,10 +75,16 @@ class IncrementalIngestStats:
             'duration_seconds': round(duration, 2),
             'drive_items_listed_total': self.drive_items_listed_total,
             'drive_pages_fetched_total': self.drive_pages_fetched_total,
+            'drive_list_resumed': self.drive_list_resumed,
+            'drive_list_continuation_pending': self.drive_list_continuation_pending,
             'files_downloaded': self.files_downloaded,
             'download_errors': self.download_errors,
             'files_rejected_size': self.files_rejected_size,
+            'files_skipped_unchanged': self.files_skipped_unchanged,
             'batch_errors': self.batch_errors,
+            'queue_enqueued_total': self.queue_enqueued_total,
+            'queue_claimed_total': self.queue_claimed_total,
+            'queue_failed_total': self.queue_failed_total,
             'invoices_processed_ok_total': self.invoices_processed_ok_total,
             'invoices_duplicate_total': self.invoices_duplicate_total,
             'invoices_revision_total': self.invoices_revision_total,
@@ -77,7 +97,9 @@ class IncrementalIngestStats:
             'invoices_reprocessed_permanent_error': self.invoices_reprocessed_permanent_error,
             'last_sync_time_before': self.last_sync_time_before.isoformat() if self.last_sync_time_before else None,
             'last_sync_time_after': self.last_sync_time_after.isoformat() if self.last_sync_time_after else None,
-            'max_modified_time_processed': self.max_modified_time_processed.isoformat() if self.max_modified_time_processed else None
+            'max_modified_time_processed': self.max_modified_time_processed.isoformat() if self.max_modified_time_processed else None,
+            'interrupted': self.interrupted,
+            'adaptive_batching': self.adaptive_batching
         }
     
     def update_from_batch_stats(self, batch_stats: Dict):
@@ -99,7 +121,11 @@ class IncrementalIngestPipeline:
         batch_size: int = None,
         sleep_between_batch: int = None,
         max_pages_per_run: int = None,
-        advance_strategy: str = None
+        advance_strategy: str = None,
+        db: Database = None,
+        drive_client: DriveIncrementalClient = None,
+        drive_client_base: DriveClient = None,
+        extractor: InvoiceExtractor = None
     ):
         """
         Inicializar pipeline
@@ -110,6 +136,10 @@ class IncrementalIngestPipeline:
             sleep_between_batch: Segundos entre lotes (por defecto desde env)
             max_pages_per_run: Límite de páginas Drive por run (por defecto desde env)
             advance_strategy: Estrategia para avanzar last_sync_time (por defecto desde env)
+            db: Instancia de Database (por defecto una nueva desde DATABASE_URL)
+            drive_client: Cliente incremental de Drive (por defecto DriveIncrementalClient)
+            drive_client_base: Cliente de Drive para get_files_by_ids (por defecto DriveClient)
+            extractor: Extractor de facturas (por defecto InvoiceExtractor)
         """
         # Configuración
         self.folder_id = folder_id or os.getenv('GOOGLE_DRIVE_FOLDER_ID')
@@ -118,6 +148,12 @@ class IncrementalIngestPipeline:
         self.max_pages_per_run = max_pages_per_run or int(os.getenv('MAX_PAGES_PER_RUN', '10'))
         self.advance_strategy = advance_strategy or os.getenv('ADVANCE_STRATEGY', 'MAX_OK_TIME')
         
+        # batch_size, sleep_between_batch e INTER_INVOICE_DELAY_SEC son los valores iniciales:
+        # el controlador los ajusta tras cada lote según 429, errores, latencias y cuota de OpenAI/Drive
+        self.batch_controller = AdaptiveBatchController(
+            self.batch_size, self.sleep_between_batch, INTER_INVOICE_DELAY_SEC
+        )
+        
         # Configuración de reprocesamiento
         self.reprocess_enabled = os.getenv('REPROCESS_REVIEW_ENABLED', 'true').lower() == 'true'
         self.reprocess_max_days = int(os.getenv('REPROCESS_REVIEW_MAX_DAYS', '30'))
@@ -125,6 +161,13 @@ class IncrementalIngestPipeline:
         self.reprocess_max_attempts = int(os.getenv('REPROCESS_REVIEW_MAX_ATTEMPTS', '3'))
         self.reprocess_dry_run = os.getenv('REPROCESS_REVIEW_DRY_RUN', 'false').lower() == 'true'
         self.reprocess_include_quarantine = os.getenv('REPROCESS_INCLUDE_QUARANTINE', 'true').lower() == 'true'
+        # Reintentos intercalados por lote de archivos nuevos y backoff exponencial entre intentos
+        self.reprocess_per_batch = int(os.getenv('REPROCESS_PER_BATCH', '2'))
+        self.reprocess_backoff_base_min = int(os.getenv('REPROCESS_BACKOFF_BASE_MIN', '60'))
+        self.reprocess_backoff_max_hours = int(os.getenv('REPROCESS_BACKOFF_MAX_HOURS', '48'))
+        self.reprocess_pending = deque()
+        self.reprocess_loaded = 0
+        self.reprocess_metadata = {}
         
         # Configuración de limpieza de facturas pendientes
         self.cleanup_pending_hours = int(os.getenv('CLEANUP_PENDING_HOURS', '24'))
@@ -133,35 +176,54 @@ class IncrementalIngestPipeline:
         self.disk_space_warning_percent = int(os.getenv('DISK_SPACE_WARNING_PERCENT', '10'))
         self.disk_space_critical_percent = int(os.getenv('DISK_SPACE_CRITICAL_PERCENT', '5'))
         
+        # Descargas simultáneas por lote (nuevos y reprocesamiento)
+        self.download_concurrency = max(int(os.getenv('DRIVE_DOWNLOAD_CONCURRENCY', '4')), 1)
+        
+        # Descartar antes de descargar los archivos ya procesados sin cambios (md5Checksum/modifiedTime)
+        self.skip_unchanged = os.getenv('SKIP_UNCHANGED_FILES', 'true').lower() == 'true'
+        
         # Modo temporal: procesar todos los archivos sin restricciones de fecha
         self.process_all_files = os.getenv('PROCESS_ALL_FILES', 'false').lower() == 'true'
         
+        # Cola persistente de ingesta (migración 20261019_add_ingest_queue.sql): el listado
+        # encola y los workers reclaman con SKIP LOCKED; varios procesos pueden drenarla
+        self.queue_enabled = os.getenv('INGEST_QUEUE_ENABLED', 'false').lower() == 'true'
+        self.queue_lease_sec = int(os.getenv('INGEST_QUEUE_LEASE_SEC', '1800'))
+        self.queue_max_attempts = int(os.getenv('INGEST_QUEUE_MAX_ATTEMPTS', '3'))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        
         # Sistema de lock para prevenir ejecuciones concurrentes
         lock_timeout = int(os.getenv('JOB_LOCK_TIMEOUT_SEC', '300'))  # 5 minutos por defecto
         self.job_lock = JobLock(timeout=lock_timeout)
         
+        # Parada ordenada (modo daemon): se termina el lote en curso y no se empiezan más
+        self.stop_event = threading.Event()
+        
         # Validaciones
         if not self.folder_id:
             raise ValueError("GOOGLE_DRIVE_FOLDER_ID no configurado")
         
         # Inicializar componentes
-        self.drive_client = DriveIncrementalClient()
-        self.drive_client_base = DriveClient()  # Para get_file_by_id
-        self.db = Database()
+        self.drive_client = drive_client or DriveIncrementalClient()
+        self.drive_client_base = drive_client_base or DriveClient()  # Para get_files_by_ids
+        self.db = db or Database()
         self.state_store = get_state_store(self.db)
-        self.extractor = InvoiceExtractor()
+        self.extractor = extractor or InvoiceExtractor()
         
         # Repositorios
         self.factura_repo = FacturaRepository(self.db)
         self.event_repo = EventRepository(self.db)
+        self.queue_repo = IngestQueueRepository(self.db)
         
         # Estadísticas
         self.stats = IncrementalIngestStats()
+        self.stats.adaptive_batching = self.batch_controller.to_dict()
         
         logger.info(
             f"IncrementalIngestPipeline inicializado: "
             f"folder_id={self.folder_id}, batch_size={self.batch_size}, "
-            f"max_pages={self.max_pages_per_run}, advance_strategy={self.advance_strategy}"
+            f"max_pages={self.max_pages_per_run}, advance_strategy={self.advance_strategy}, "
+            f"queue_enabled={self.queue_enabled}"
         )
     
     def run(self) -> Dict:
@@ -178,6 +240,9 @@ class IncrementalIngestPipeline:
         logger.info("INICIANDO INGESTA INCREMENTAL")
         logger.info("="*70)
         
+        # La misma instancia puede ejecutarse muchas veces (ingest daemon)
+        self._reset_run_state()
+        
         # Adquirir lock para prevenir ejecuciones concurrentes
         try:
             with self.job_lock.acquire():
@@ -189,6 +254,23 @@ class IncrementalIngestPipeline:
             )
             raise
     
+    def request_stop(self):
+        """
+        Pedir una parada ordenada de la ejecución en curso
+        
+        Se termina el lote que se está procesando y no se empiezan más; el listado
+        de Drive queda con su punto de continuación para la siguiente ejecución.
+        """
+        self.stop_event.set()
+    
+    def _reset_run_state(self):
+        """Reiniciar estadísticas y reintentos pendientes antes de cada ejecución"""
+        self.stats = IncrementalIngestStats()
+        self.stats.adaptive_batching = self.batch_controller.to_dict()
+        self.reprocess_pending.clear()
+        self.reprocess_loaded = 0
+        self.reprocess_metadata = {}
+    
     def _run_with_lock(self) -> Dict:
         """
         Ejecutar pipeline (método interno, ya con lock adquirido)
@@ -246,15 +328,27 @@ class IncrementalIngestPipeline:
             logger.info(f"Directorio temporal: {temp_dir}")
             
             try:
-                # Reprocesar facturas en estado "revisar" (si está habilitado)
+                # Facturas en estado "revisar" cuyo reintento toca (se intercalan con los lotes nuevos)
                 if self.reprocess_enabled:
-                    self._reprocess_review_invoices(temp_dir)
+                    self._load_reprocess_candidates()
+                
+                if self.queue_enabled:
+                    # Encolar lo listado; el timestamp avanza en cuanto la cola lo tiene
+                    # guardado y el procesamiento puede retomarse desde la cola
+                    self._enqueue_incremental_files(last_sync_time)
+                    self._advance_sync_time()
+                    self._drain_queue(temp_dir)
+                else:
+                    # Procesar archivos incrementales
+                    self._process_incremental_files(temp_dir, last_sync_time)
+                    
+                    # Avanzar timestamp según estrategia
+                    self._advance_sync_time()
                 
-                # Procesar archivos incrementales
-                self._process_incremental_files(temp_dir, last_sync_time)
+                # Reintentos que no cupieron entre los lotes nuevos
+                self._finish_reprocess(temp_dir)
                 
-                # Avanzar timestamp según estrategia
-                self._advance_sync_time()
+                self.stats.interrupted = self.stop_event.is_set()
                 
             finally:
                 # Limpiar directorio temporal
@@ -303,11 +397,13 @@ class IncrementalIngestPipeline:
         """
         logger.info("Consultando archivos modificados desde Drive...")
         
-        # Iterar páginas de resultados
+        # Iterar páginas de resultados (continuando donde se cortó la ejecución anterior)
+        interrumpido = False
         for page_files in self.drive_client.list_modified_since(
             self.folder_id,
             since_time,
-            max_pages=self.max_pages_per_run
+            max_pages=self.max_pages_per_run,
+            continuation=self._load_list_continuation()
         ):
             self.stats.drive_pages_fetched_total += 1
             self.stats.drive_items_listed_total += len(page_files)
@@ -318,30 +414,119 @@ class IncrementalIngestPipeline:
             )
             
             # Procesar en lotes
-            self._process_files_in_batches(page_files, temp_dir)
+            if not self._process_files_in_batches(self._skip_unchanged_files(page_files), temp_dir):
+                # Página a medias: sin guardar continuación, la próxima ejecución la vuelve a listar
+                logger.warning("Parada solicitada: la página en curso se retomará en la próxima ejecución")
+                interrumpido = True
+                break
+            
+            # Página procesada: una ejecución posterior puede seguir desde la siguiente
+            self._save_list_continuation()
+            
+            if self.stop_event.is_set():
+                logger.warning("Parada solicitada: el listado continuará en la próxima ejecución")
+                interrumpido = True
+                break
+        
+        if not interrumpido:
+            self._save_list_continuation()
         
         logger.info(
             f"Búsqueda completada: {self.stats.drive_items_listed_total} archivos, "
             f"{self.stats.drive_pages_fetched_total} páginas"
         )
     
-    def _process_files_in_batches(self, files_list: List[Dict], temp_dir: Path):
+    def _load_list_continuation(self) -> Optional[Dict]:
+        """
+        Continuación del listado de Drive guardada por la ejecución anterior
+        
+        Returns:
+            Continuación (nextPageToken + huella de la query) o None
+        """
+        continuation = self.state_store.get_list_continuation()
+        if continuation:
+            self.stats.drive_list_resumed = True
+            logger.info(
+                f"Listado de Drive pendiente de la ejecución anterior: "
+                f"se continúa en la página {continuation.get('pages_fetched', 0) + 1}"
+            )
+        return continuation
+    
+    def _save_list_continuation(self):
+        """Guardar (o borrar si el listado terminó) el punto de continuación del listado"""
+        continuation = self.drive_client.continuation
+        self.state_store.set_list_continuation(continuation)
+        self.stats.drive_list_continuation_pending = continuation is not None
+    
+    def _skip_unchanged_files(self, files_list: List[Dict]) -> List[Dict]:
+        """
+        Quitar de una página de Drive los archivos ya procesados y sin cambios
+        
+        Con el solape de SYNC_WINDOW_MINUTES la mayoría de archivos listados ya están
+        en facturas; así se evita descargarlos, rasterizarlos y pagar su extracción.
+        
+        Args:
+            files_list: Lista de archivos desde Drive API
+        
+        Returns:
+            Archivos nuevos o modificados
+        """
+        if not self.skip_unchanged or not files_list:
+            return files_list
+        
+        sin_cambios = self.factura_repo.find_unchanged_file_ids(files_list)
+        if not sin_cambios:
+            return files_list
+        
+        self.stats.files_skipped_unchanged += len(sin_cambios)
+        logger.info(f"{len(sin_cambios)}/{len(files_list)} archivos sin cambios desde su último procesamiento, se omiten")
+        
+        # Ya están procesados: cuentan para avanzar last_sync_time (MAX_OK_TIME)
+        omitidos = [f for f in files_list if f['id'] in sin_cambios]
+        self._update_max_modified_time(
+            omitidos,
+            {'archivos_procesados': [{'file_name': f['name'], 'status': 'success'} for f in omitidos]}
+        )
+        
+        return [f for f in files_list if f['id'] not in sin_cambios]
+    
+    def _process_files_in_batches(self, files_list: List[Dict], temp_dir: Path) -> bool:
         """
         Procesar lista de archivos en lotes
         
         Args:
             files_list: Lista de archivos desde Drive API
             temp_dir: Directorio temporal para descargas
+        
+        Returns:
+            True si se procesaron todos los lotes, False si se pidió parar antes
         """
-        # Dividir en lotes
-        for i in range(0, len(files_list), self.batch_size):
-            batch = files_list[i:i + self.batch_size]
-            batch_num = (i // self.batch_size) + 1
+        # Dividir en lotes (el tamaño lo decide el controlador adaptativo tras cada lote)
+        i = 0
+        batch_num = 0
+        while i < len(files_list):
+            # Pausa entre lotes
+            if batch_num > 0:
+                self._sleep_between_batches()
+            
+            if self.stop_event.is_set():
+                return False
+            
+            batch = files_list[i:i + self.batch_controller.batch_size]
+            batch_num += 1
+            INGEST_QUEUE_DEPTH.set(len(files_list) - i)
+            
+            self.batch_controller.start_batch()
+            download_errors_before = self.stats.download_errors
+            
+            # Intercalar reintentos pendientes con los lotes de archivos nuevos
+            self._reprocess_pending(temp_dir, self.reprocess_per_batch)
             
             logger.info(
                 f"Procesando lote {batch_num}: "
                 f"{len(batch)} archivos (desde {i+1} hasta {i+len(batch)})"
             )
+            i += len(batch)
             
             try:
                 # Descargar archivos del lote
@@ -352,7 +537,10 @@ class IncrementalIngestPipeline:
                     continue
                 
                 # Procesar batch usando pipeline existente
-                batch_stats = process_batch(downloaded_files, self.extractor, self.db)
+                batch_stats = process_batch(
+                    downloaded_files, self.extractor, self.db,
+                    inter_invoice_delay=self.batch_controller.invoice_delay_seconds
+                )
                 
                 # Actualizar estadísticas
                 self.stats.update_from_batch_stats(batch_stats)
@@ -373,23 +561,259 @@ class IncrementalIngestPipeline:
                 # Continuar con siguiente lote (tolerancia a fallos)
                 continue
             
+            finally:
+                self._adapt_batching(self.stats.download_errors - download_errors_before)
+                
+                # Publicar métricas de ingesta para /metrics de la API
+                INGEST_QUEUE_DEPTH.set(max(len(files_list) - i, 0))
+                flush_pipeline_metrics(self.worker_id, self.db)
+        
+        return True
+    
+    def _adapt_batching(self, download_errors: int):
+        """
+        Ajustar tamaño de lote y pausa con lo observado en el lote recién terminado
+        
+        Args:
+            download_errors: Descargas fallidas durante el lote
+        """
+        try:
+            self.batch_controller.end_batch(download_errors)
+        except Exception as e:
+            # El control adaptativo nunca debe interrumpir la ingesta
+            logger.warning(f"Error en control adaptativo de lotes: {e}")
+        self.stats.adaptive_batching = self.batch_controller.to_dict()
+    
+    def _sleep_between_batches(self):
+        """Pausa entre lotes decidida por el controlador adaptativo"""
+        pause = self.batch_controller.sleep_seconds
+        if pause > 0:
+            logger.info(f"Pausa de {pause:.1f}s entre lotes...")
+            # Una parada solicitada corta la pausa
+            self.stop_event.wait(pause)
+    
+    def _enqueue_incremental_files(self, since_time: Optional[datetime]):
+        """
+        Listar archivos modificados desde Drive y encolarlos en ingest_queue
+        
+        Args:
+            since_time: Timestamp desde el cual buscar cambios
+        """
+        logger.info("Consultando archivos modificados desde Drive (modo cola)...")
+        
+        for page_files in self.drive_client.list_modified_since(
+            self.folder_id,
+            since_time,
+            max_pages=self.max_pages_per_run,
+            continuation=self._load_list_continuation()
+        ):
+            self.stats.drive_pages_fetched_total += 1
+            self.stats.drive_items_listed_total += len(page_files)
+            
+            encolados = self.queue_repo.enqueue(self._skip_unchanged_files(page_files))
+            self.stats.queue_enqueued_total += encolados
+            
+            # La página ya está guardada en la cola: cuenta para avanzar last_sync_time
+            for file_info in page_files:
+                modified_time_str = file_info.get('modifiedTime')
+                if not modified_time_str:
+                    continue
+                try:
+                    modified_time = datetime.fromisoformat(modified_time_str.replace('Z', '+00:00'))
+                except ValueError as e:
+                    logger.warning(f"Error parseando modifiedTime '{modified_time_str}': {e}")
+                    continue
+                if (self.stats.max_modified_time_enqueued is None or
+                        modified_time > self.stats.max_modified_time_enqueued):
+                    self.stats.max_modified_time_enqueued = modified_time
+            
+            logger.info(
+                f"Página {self.stats.drive_pages_fetched_total}: "
+                f"{len(page_files)} archivos encontrados, {encolados} encolados"
+            )
+            
+            # Página ya encolada: una ejecución posterior puede seguir desde la siguiente
+            self._save_list_continuation()
+            
+            if self.stop_event.is_set():
+                logger.warning("Parada solicitada: el listado continuará en la próxima ejecución")
+                break
+        
+        self._save_list_continuation()
+        
+        logger.info(
+            f"Búsqueda completada: {self.stats.drive_items_listed_total} archivos, "
+            f"{self.stats.drive_pages_fetched_total} páginas, "
+            f"{self.stats.queue_enqueued_total} encolados"
+        )
+    
+    def run_worker(self, max_batches: Optional[int] = None) -> Dict:
+        """
+        Drenar la cola de ingesta como worker independiente (sin JobLock)
+        
+        Pueden ejecutarse tantos workers como se quiera, en esta u otras máquinas:
+        cada lote se reclama con SKIP LOCKED, así que no se pisan entre sí.
+        
+        Args:
+            max_batches: Lotes máximos a procesar (None = hasta vaciar la cola)
+        
+        Returns:
+            Diccionario con estadísticas de ejecución
+        """
+        logger.info(f"Worker de ingesta {self.worker_id} iniciado")
+        
+        temp_dir = Path(tempfile.mkdtemp(prefix='invoice_worker_'))
+        try:
+            self._drain_queue(temp_dir, max_batches=max_batches)
+        finally:
+            if temp_dir.exists():
+                shutil.rmtree(temp_dir)
+        
+        return self.stats.to_dict()
+    
+    def _drain_queue(self, temp_dir: Path, max_batches: Optional[int] = None):
+        """
+        Reclamar y procesar lotes de la cola hasta vaciarla
+        
+        Args:
+            temp_dir: Directorio temporal para descargas
+            max_batches: Lotes máximos a procesar (None = sin límite)
+        """
+        batch_num = 0
+        
+        while max_batches is None or batch_num < max_batches:
+            if self.stop_event.is_set():
+                logger.warning("Parada solicitada: los archivos pendientes siguen en la cola")
+                break
+            
+            self.batch_controller.start_batch()
+            download_errors_before = self.stats.download_errors
+            
+            # Intercalar reintentos pendientes con los lotes de archivos nuevos
+            self._reprocess_pending(temp_dir, self.reprocess_per_batch)
+            
+            batch = self.queue_repo.claim(
+                self.worker_id,
+                self.batch_controller.batch_size,
+                self.queue_lease_sec,
+                self.queue_max_attempts
+            )
+            if not batch:
+                logger.info("Cola de ingesta vacía")
+                break
+            
+            batch_num += 1
+            self.stats.queue_claimed_total += len(batch)
+            logger.info(f"Lote {batch_num} reclamado de la cola: {len(batch)} archivos")
+            
+            try:
+                self._process_claimed_batch(batch, batch_num, temp_dir)
+            finally:
+                self._adapt_batching(self.stats.download_errors - download_errors_before)
+                
+                # Publicar métricas de ingesta para /metrics de la API
+                pendientes = self.queue_repo.count_by_estado()['pendiente']
+                INGEST_QUEUE_DEPTH.set(pendientes)
+                flush_pipeline_metrics(self.worker_id, self.db)
+            
             # Pausa entre lotes
-            if i + self.batch_size < len(files_list):
-                logger.info(f"Pausa de {self.sleep_between_batch}s entre lotes...")
-                time.sleep(self.sleep_between_batch)
+            if pendientes > 0 and (max_batches is None or batch_num < max_batches):
+                self._sleep_between_batches()
+    
+    def _process_claimed_batch(self, batch: List[Dict], batch_num: int, temp_dir: Path):
+        """
+        Procesar un lote reclamado y cerrar cada archivo en la cola
+        
+        Los resultados de process_batch (OK, duplicado, cuarentena...) quedan registrados
+        en facturas/cuarentena, así que el archivo se completa en la cola; solo se
+        devuelven a la cola los fallos de descarga o del lote entero.
+        
+        Args:
+            batch: Archivos reclamados (metadatos Drive)
+            batch_num: Número de lote (para logs)
+            temp_dir: Directorio temporal para descargas
+        """
+        cerrados = set()
+        downloaded_files = []
+        
+        try:
+            downloaded_files = self._download_batch(batch, temp_dir)
+            
+            if downloaded_files:
+                batch_stats = process_batch(
+                    downloaded_files, self.extractor, self.db,
+                    inter_invoice_delay=self.batch_controller.invoice_delay_seconds
+                )
+                self.stats.update_from_batch_stats(batch_stats)
+                self._update_max_modified_time(downloaded_files, batch_stats)
+                
+                logger.info(
+                    f"Lote {batch_num} completado: "
+                    f"{batch_stats.get('exitosos', 0)} OK, "
+                    f"{batch_stats.get('fallidos', 0)} errores"
+                )
+            
+            descargados = {f['id'] for f in downloaded_files}
+            for file_info in batch:
+                file_id = file_info['id']
+                if file_id in descargados or file_info.get('rejected_size'):
+                    if not self.queue_repo.complete(file_id, self.worker_id):
+                        logger.warning(f"Lease perdido antes de completar {file_info.get('name')} ({file_id})")
+                else:
+                    self._fail_queue_item(file_info, "Error descargando archivo desde Drive")
+                cerrados.add(file_id)
+        
+        except Exception as e:
+            logger.error(f"Error procesando lote {batch_num}: {e}", exc_info=True)
+            self.stats.batch_errors += 1
+            
+            for file_info in batch:
+                if file_info['id'] not in cerrados:
+                    self._fail_queue_item(file_info, f"Error procesando lote: {str(e)[:200]}")
+        
+        finally:
+            # El worker puede drenar muchos lotes: no acumular PDFs en el directorio temporal
+            for file_info in downloaded_files:
+                local_path = Path(file_info['local_path'])
+                if local_path.exists():
+                    local_path.unlink()
+    
+    def _fail_queue_item(self, file_info: Dict, error: str):
+        """
+        Devolver un archivo a la cola (o marcarlo como error si agotó los intentos)
+        
+        Args:
+            file_info: Metadatos Drive del archivo reclamado
+            error: Motivo del fallo
+        """
+        file_id = file_info['id']
+        estado = self.queue_repo.fail(file_id, self.worker_id, error, self.queue_max_attempts)
+        self.stats.queue_failed_total += 1
+        
+        if estado == 'error':
+            logger.warning(f"❌ Máximo de intentos en cola alcanzado: {file_info.get('name')} ({file_id})")
+            self.event_repo.insert_event(
+                file_id,
+                'queue_permanent_error',
+                'ERROR',
+                f'{error} (máximo de {self.queue_max_attempts} intentos alcanzado)'
+            )
     
     def _download_batch(self, batch: List[Dict], temp_dir: Path) -> List[Dict]:
         """
         Descargar lote de archivos desde Drive
         
+        Hasta DRIVE_DOWNLOAD_CONCURRENCY descargas simultáneas; la validación de
+        tamaño, los eventos y las estadísticas se hacen en el hilo principal.
+        
         Args:
             batch: Lista de metadatos de archivos
             temp_dir: Directorio temporal
         
         Returns:
-            Lista de archivos descargados con rutas locales
+            Lista de archivos descargados con rutas locales (en el orden del lote)
         """
-        downloaded = []
+        pendientes = []
         
         for file_info in batch:
             file_id = file_info['id']
@@ -412,6 +836,7 @@ class IncrementalIngestPipeline:
                         error_msg = f"Archivo excede tamaño máximo: {file_size_mb:.2f} MB > {max_size_mb} MB"
                         logger.warning(f"Rechazado por tamaño: {file_name} - {error_msg}")
                         self.stats.files_rejected_size += 1
+                        file_info['rejected_size'] = True
                         
                         # Registrar evento de auditoría
                         self.event_repo.insert_event(
@@ -425,29 +850,40 @@ class IncrementalIngestPipeline:
                 # Sanitizar nombre de archivo
                 safe_name = self._sanitize_filename(file_name)
                 local_path = temp_dir / f"{file_id}_{safe_name}"
-                
-                # Descargar (pasar tamaño para validación adicional en DriveClient)
-                logger.info(f"Descargando: {file_name} ({file_id})")
-                success = self.drive_client.download_file(file_id, str(local_path), file_size=file_size)
-                
-                if success and local_path.exists():
-                    # Agregar ruta local a metadatos
-                    file_info['local_path'] = str(local_path)
-                    file_info['folder_name'] = 'incremental'  # Marcar origen
-                    
-                    downloaded.append(file_info)
-                    self.stats.files_downloaded += 1
-                    
-                    logger.info(f"Descargado OK: {file_name}")
-                else:
-                    logger.error(f"Descarga falló: {file_name}")
-                    self.stats.download_errors += 1
+                pendientes.append((file_info, local_path, file_size))
             
             except Exception as e:
                 logger.error(f"Error descargando {file_name}: {e}", exc_info=True)
                 self.stats.download_errors += 1
                 continue
         
+        if self.download_concurrency > 1 and len(pendientes) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.download_concurrency, len(pendientes))) as executor:
+                resultados = list(executor.map(lambda p: self._download_file(*p), pendientes))
+        else:
+            resultados = [self._download_file(*p) for p in pendientes]
+        
+        downloaded = []
+        
+        for (file_info, local_path, _), error in zip(pendientes, resultados):
+            file_name = file_info['name']
+            
+            if error is not None:
+                logger.error(f"Error descargando {file_name}: {error}", exc_info=error)
+                self.stats.download_errors += 1
+            elif local_path.exists():
+                # Agregar ruta local a metadatos
+                file_info['local_path'] = str(local_path)
+                file_info['folder_name'] = file_info.get('folder_name') or 'incremental'  # Marcar origen
+                
+                downloaded.append(file_info)
+                self.stats.files_downloaded += 1
+                
+                logger.info(f"Descargado OK: {file_name}")
+            else:
+                logger.error(f"Descarga falló: {file_name}")
+                self.stats.download_errors += 1
+        
         logger.info(
             f"Descarga completada: {len(downloaded)}/{len(batch)} archivos OK, "
             f"{self.stats.download_errors} errores"
@@ -455,6 +891,29 @@ class IncrementalIngestPipeline:
         
         return downloaded
     
+    def _download_file(self, file_info: Dict, local_path: Path, file_size: Optional[int]) -> Optional[Exception]:
+        """
+        Descargar un archivo (puede ejecutarse en un hilo del pool de descargas)
+        
+        Args:
+            file_info: Metadatos Drive del archivo
+            local_path: Ruta de destino
+            file_size: Tamaño en bytes (para validación adicional en DriveClient)
+        
+        Returns:
+            None si no hubo excepción (el éxito se comprueba con local_path), o la excepción
+        """
+        try:
+            logger.info(f"Descargando: {file_info['name']} ({file_info['id']})")
+            with DRIVE_DOWNLOAD_SECONDS.time():
+                success = self.drive_client.download_file(file_info['id'], str(local_path), file_size=file_size)
+            if not success and local_path.exists():
+                # Descarga a medias: que no se tome por buena
+                local_path.unlink()
+            return None
+        except Exception as e:
+            return e
+    
     def _sanitize_filename(self, filename: str) -> str:
         """
         Sanitizar nombre de archivo para filesystem
@@ -531,8 +990,13 @@ class IncrementalIngestPipeline:
         
         if self.advance_strategy == 'MAX_OK_TIME':
             # Estrategia recomendada: usar máximo modifiedTime de archivos procesados OK
-            if self.stats.max_modified_time_processed:
-                new_sync_time = self.stats.max_modified_time_processed
+            # (con la cola, de archivos encolados: la cola ya garantiza que se procesen)
+            max_time = (
+                self.stats.max_modified_time_enqueued if self.queue_enabled
+                else self.stats.max_modified_time_processed
+            )
+            if max_time:
+                new_sync_time = max_time
                 self.state_store.set_last_sync_time(new_sync_time)
                 self.stats.last_sync_time_after = new_sync_time
                 
@@ -547,6 +1011,12 @@ class IncrementalIngestPipeline:
                 self.stats.last_sync_time_after = self.stats.last_sync_time_before
         
         elif self.advance_strategy == 'CURRENT_TIME':
+            if self.stop_event.is_set():
+                # Con la ejecución interrumpida, "ahora" dejaría atrás archivos sin procesar
+                logger.warning("Ejecución interrumpida: last_sync_time NO se actualiza (CURRENT_TIME)")
+                self.stats.last_sync_time_after = self.stats.last_sync_time_before
+                return
+            
             # Estrategia alternativa: usar tiempo actual (menos segura)
             new_sync_time = datetime.utcnow()
             self.state_store.set_last_sync_time(new_sync_time)
@@ -559,12 +1029,13 @@ class IncrementalIngestPipeline:
         else:
             raise ValueError(f"ADVANCE_STRATEGY inválida: {self.advance_strategy}")
     
-    def _reprocess_review_invoices(self, temp_dir: Path):
+    def _load_reprocess_candidates(self):
         """
-        Reprocesar facturas en estado 'revisar'
+        Seleccionar las facturas en 'revisar' cuyo reintento ya toca
         
-        Args:
-            temp_dir: Directorio temporal para descargas
+        No se reprocesan aquí: _reprocess_pending las intercala con los lotes de
+        archivos nuevos (REPROCESS_PER_BATCH por lote) para que los reintentos no
+        retrasen la ingesta, y el resto se procesa al final de la ejecución.
         """
         if self.reprocess_dry_run:
             logger.info("="*70)
@@ -590,13 +1061,18 @@ class IncrementalIngestPipeline:
                 limite=self.reprocess_max_count
             )
             
+            # Obtener metadata actual desde Drive (en batch; se reutiliza al reprocesar)
+            if cuarentena_facturas:
+                self.reprocess_metadata.update(self.drive_client_base.get_files_by_ids(
+                    [f['drive_file_id'] for f in cuarentena_facturas]
+                ))
+            
             # Filtrar solo los que fueron modificados en Drive después de último procesamiento
             for factura in cuarentena_facturas:
                 drive_file_id = factura['drive_file_id']
                 actualizado_en = factura['actualizado_en']
                 
-                # Obtener metadata actual desde Drive
-                file_metadata = self.drive_client_base.get_file_by_id(drive_file_id)
+                file_metadata = self.reprocess_metadata.get(drive_file_id)
                 
                 if file_metadata and file_metadata.get('modifiedTime'):
                     try:
@@ -624,6 +1100,10 @@ class IncrementalIngestPipeline:
             if cuarentena_facturas:
                 logger.info(f"Archivos en cuarentena verificados: {len(cuarentena_facturas)}")
         
+        # Una factura en 'revisar' puede venir de ambas consultas
+        vistas = set()
+        facturas = [f for f in facturas if not (f['id'] in vistas or vistas.add(f['id']))]
+        
         if not facturas:
             logger.info("No hay facturas para reprocesar")
             return
@@ -643,40 +1123,138 @@ class IncrementalIngestPipeline:
                 )
             return
         
-        # Procesar cada factura
-        for idx, factura_info in enumerate(facturas, 1):
-            factura_id = factura_info['id']
-            drive_file_id = factura_info['drive_file_id']
-            drive_file_name = factura_info['drive_file_name']
-            attempts = factura_info['reprocess_attempts']
+        logger.info(f"Se intercalarán con los lotes nuevos: hasta {self.reprocess_per_batch} por lote")
+        self.reprocess_pending.extend(facturas)
+        self.reprocess_loaded = len(facturas)
+    
+    def _reprocess_pending(self, temp_dir: Path, max_count: Optional[int] = None):
+        """
+        Reprocesar en un lote facturas seleccionadas por _load_reprocess_candidates
+        
+        Args:
+            temp_dir: Directorio temporal para descargas
+            max_count: Máximo a reprocesar ahora (None = un lote del tamaño actual)
+        """
+        limite = max_count if max_count is not None else self.batch_controller.batch_size
+        lote = []
+        while self.reprocess_pending and len(lote) < limite:
+            lote.append(self.reprocess_pending.popleft())
+        
+        if lote:
+            self._reprocess_batch(lote, temp_dir)
+    
+    def _finish_reprocess(self, temp_dir: Path):
+        """
+        Reprocesar las facturas que no cupieron entre los lotes nuevos y registrar resumen
+        
+        Se procesan en lotes con el mismo control adaptativo (tamaño y pausa) que los
+        archivos nuevos.
+        
+        Args:
+            temp_dir: Directorio temporal para descargas
+        """
+        if not self.reprocess_loaded:
+            return
+        
+        primero = True
+        while self.reprocess_pending:
+            if not primero:
+                self._sleep_between_batches()
+            primero = False
             
+            if self.stop_event.is_set():
+                # Siguen en su próximo reintento programado: la siguiente ejecución los carga
+                logger.warning(f"Parada solicitada: {len(self.reprocess_pending)} reintentos quedan para la próxima ejecución")
+                break
+            
+            self.batch_controller.start_batch()
+            download_errors_before = self.stats.download_errors
+            try:
+                self._reprocess_pending(temp_dir)
+            finally:
+                self._adapt_batching(self.stats.download_errors - download_errors_before)
+        
+        logger.info("="*70)
+        logger.info("REPROCESAMIENTO COMPLETADO")
+        logger.info("="*70)
+        logger.info(f"Total reprocesadas: {self.stats.invoices_reprocessed_total}")
+        logger.info(f"Exitosas: {self.stats.invoices_reprocessed_success}")
+        logger.info(f"Fallidas: {self.stats.invoices_reprocessed_failed}")
+        logger.info(f"Error permanente: {self.stats.invoices_reprocessed_permanent_error}")
+    
+    def _increment_reprocess_attempts(self, factura_id: int, reason: str) -> bool:
+        """Registrar un intento de reprocesamiento fallido con el backoff configurado"""
+        return self.factura_repo.increment_reprocess_attempts(
+            factura_id,
+            reason,
+            self.reprocess_max_attempts,
+            backoff_base_minutes=self.reprocess_backoff_base_min,
+            backoff_max_minutes=self.reprocess_backoff_max_hours * 60
+        )
+    
+    def _get_reprocess_metadata(self, drive_file_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Metadata actual en Drive de las facturas a reprocesar
+        
+        Reutiliza la obtenida al revisar la cuarentena y pide el resto en batch.
+        
+        Args:
+            drive_file_ids: drive_file_id de las facturas
+        
+        Returns:
+            Diccionario {drive_file_id: metadata} (sin los que no se pudieron obtener)
+        """
+        faltan = [file_id for file_id in drive_file_ids if file_id not in self.reprocess_metadata]
+        if faltan:
+            self.reprocess_metadata.update(self.drive_client_base.get_files_by_ids(faltan))
+        
+        return {
+            file_id: self.reprocess_metadata.pop(file_id)
+            for file_id in drive_file_ids if file_id in self.reprocess_metadata
+        }
+    
+    def _reprocess_batch(self, facturas: List[Dict], temp_dir: Path):
+        """
+        Reprocesar un lote de facturas en 'revisar' (o en cuarentena y modificadas en Drive)
+        
+        Metadata en peticiones batch a Drive, descargas con _download_batch (mismos
+        límites que los archivos nuevos) y un único process_batch con force_reprocess;
+        el resultado de cada archivo se atribuye a su factura para el contador de intentos.
+        
+        Args:
+            facturas: Facturas de get_facturas_para_reprocesar
+            temp_dir: Directorio temporal para descargas
+        """
+        for factura_info in facturas:
             logger.info(
-                f"[{idx}/{len(facturas)}] Reprocesando: {drive_file_name} "
-                f"(intento {attempts + 1}/{self.reprocess_max_attempts})"
+                f"Reprocesando: {factura_info['drive_file_name']} "
+                f"(intento {factura_info['reprocess_attempts'] + 1}/{self.reprocess_max_attempts}, "
+                f"prioridad {factura_info.get('reprocess_prioridad', 'N/A')})"
             )
+        
+        # Facturas aún sin resultado (cada una se registra una sola vez)
+        pendientes = {f['drive_file_id']: f for f in facturas}
+        
+        try:
+            # Obtener metadata de los archivos desde Drive
+            metadatos = self._get_reprocess_metadata([f['drive_file_id'] for f in facturas])
             
-            try:
-                # Obtener metadata del archivo desde Drive
-                file_metadata = self.drive_client_base.get_file_by_id(drive_file_id)
+            lote = []
+            for factura_info in facturas:
+                drive_file_id = factura_info['drive_file_id']
+                file_metadata = metadatos.get(drive_file_id)
                 
                 if not file_metadata:
                     logger.warning(f"No se pudo obtener metadata de {drive_file_id}")
-                    self.stats.invoices_reprocessed_failed += 1
-                    self.factura_repo.increment_reprocess_attempts(
-                        factura_id,
-                        f"No se pudo obtener metadata desde Drive",
-                        self.reprocess_max_attempts
-                    )
+                    self._record_reprocess_failure(pendientes.pop(drive_file_id), "No se pudo obtener metadata desde Drive")
                     continue
                 
                 # Validar que es PDF
                 if file_metadata.get('mimeType') != 'application/pdf':
                     logger.warning(f"Archivo {drive_file_id} no es PDF: {file_metadata.get('mimeType')}")
-                    self.stats.invoices_reprocessed_failed += 1
-                    self.factura_repo.increment_reprocess_attempts(
-                        factura_id,
-                        f"Archivo no es PDF: {file_metadata.get('mimeType')}",
-                        self.reprocess_max_attempts
+                    self._record_reprocess_failure(
+                        pendientes.pop(drive_file_id),
+                        f"Archivo no es PDF: {file_metadata.get('mimeType')}"
                     )
                     continue
                 
@@ -685,117 +1263,131 @@ class IncrementalIngestPipeline:
                     drive_file_id,
                     'reprocess_start',
                     'INFO',
-                    f'Iniciando reprocesamiento (intento {attempts + 1})'
+                    f"Iniciando reprocesamiento (intento {factura_info['reprocess_attempts'] + 1})"
                 )
                 
-                # Descargar archivo
-                from src.pipeline.validate import sanitize_filename
-                safe_name = sanitize_filename(drive_file_name)
-                local_path = temp_dir / f"{drive_file_id}_{safe_name}"
-                
-                success = self.drive_client_base.download_file(drive_file_id, str(local_path))
-                
-                if not success:
-                    logger.error(f"No se pudo descargar {drive_file_id}")
-                    self.stats.invoices_reprocessed_failed += 1
-                    self.factura_repo.increment_reprocess_attempts(
-                        factura_id,
-                        "Error descargando archivo desde Drive",
-                        self.reprocess_max_attempts
-                    )
-                    continue
-                
                 # Preparar file_info compatible con process_batch
-                file_info = {
+                lote.append({
                     'id': drive_file_id,
-                    'name': drive_file_name,
-                    'local_path': str(local_path),
-                    'folder_name': factura_info.get('drive_folder_name', file_metadata.get('folder_name', 'unknown')),
+                    'name': factura_info['drive_file_name'],
+                    'folder_name': factura_info.get('drive_folder_name') or file_metadata.get('folder_name', 'unknown'),
                     'modifiedTime': file_metadata.get('modifiedTime'),
+                    'md5Checksum': file_metadata.get('md5Checksum'),
                     'size': file_metadata.get('size')
-                }
-                
-                # Reprocesar con process_batch (forzar reprocesamiento para facturas en 'revisar' o 'error')
-                batch_stats = process_batch([file_info], self.extractor, self.db, force_reprocess=True)
-                
-                # Verificar resultado
-                if batch_stats.get('exitosos', 0) > 0:
-                    # Reprocesamiento exitoso
-                    logger.info(f"✅ Reprocesamiento exitoso: {drive_file_name}")
-                    self.stats.invoices_reprocessed_success += 1
-                    
-                    # Verificar si cambió de estado
-                    factura_actualizada = self.factura_repo.find_by_file_id(drive_file_id)
-                    if factura_actualizada and factura_actualizada.get('estado') == 'procesado':
-                        # Resetear contador (implícito al cambiar estado, pero registrar evento)
-                        self.event_repo.insert_event(
-                            drive_file_id,
-                            'reprocess_success',
-                            'INFO',
-                            f'Reprocesamiento exitoso, estado cambiado a "procesado"'
-                        )
-                else:
-                    # Reprocesamiento falló
-                    logger.warning(f"⚠️ Reprocesamiento falló: {drive_file_name}")
-                    self.stats.invoices_reprocessed_failed += 1
-                    
-                    # Incrementar contador
-                    permanent_error = self.factura_repo.increment_reprocess_attempts(
-                        factura_id,
-                        f"Reprocesamiento falló: {batch_stats.get('fallidos', 0)} errores",
-                        self.reprocess_max_attempts
+                })
+            
+            if not lote:
+                return
+            
+            # Descargar archivos
+            downloaded_files = self._download_batch(lote, temp_dir)
+            
+            descargados = {f['id'] for f in downloaded_files}
+            for file_info in lote:
+                if file_info['id'] not in descargados:
+                    logger.error(f"No se pudo descargar {file_info['id']}")
+                    self._record_reprocess_failure(
+                        pendientes.pop(file_info['id']),
+                        "Archivo excede tamaño máximo" if file_info.get('rejected_size')
+                        else "Error descargando archivo desde Drive"
                     )
-                    
-                    if permanent_error:
-                        logger.warning(f"❌ Máximo de intentos alcanzado: {drive_file_name}")
-                        self.stats.invoices_reprocessed_permanent_error += 1
-                        self.event_repo.insert_event(
-                            drive_file_id,
-                            'reprocess_permanent_error',
-                            'ERROR',
-                            f'Máximo de intentos ({self.reprocess_max_attempts}) alcanzado'
-                        )
-                    else:
-                        self.event_repo.insert_event(
-                            drive_file_id,
-                            'reprocess_attempt',
-                            'WARNING',
-                            f'Reprocesamiento falló (intento {attempts + 1}/{self.reprocess_max_attempts})'
-                        )
-                
+            
+            if not downloaded_files:
+                return
+            
+            # Reprocesar con process_batch (forzar reprocesamiento para facturas en 'revisar' o 'error')
+            batch_stats = process_batch(
+                downloaded_files, self.extractor, self.db, force_reprocess=True,
+                inter_invoice_delay=self.batch_controller.invoice_delay_seconds
+            )
+            
+            # Atribuir el resultado de cada archivo a su factura
+            resultados = {
+                r.get('drive_file_id'): r for r in batch_stats.get('archivos_procesados', [])
+            }
+            for file_info in downloaded_files:
+                factura_info = pendientes.pop(file_info['id'])
+                resultado = resultados.get(file_info['id'], {})
                 self.stats.invoices_reprocessed_total += 1
                 
-            except Exception as e:
-                logger.error(
-                    f"Error reprocesando {drive_file_name}: {e}",
-                    exc_info=True,
-                    extra={'drive_file_id': drive_file_id}
-                )
-                self.stats.invoices_reprocessed_failed += 1
-                
-                # Incrementar contador
-                permanent_error = self.factura_repo.increment_reprocess_attempts(
-                    factura_id,
-                    f"Error en reprocesamiento: {str(e)[:200]}",
-                    self.reprocess_max_attempts
+                if resultado.get('status') == 'success':
+                    self._record_reprocess_success(factura_info)
+                else:
+                    motivo = resultado.get('reason') or resultado.get('error') or resultado.get('status', 'sin resultado')
+                    logger.warning(f"⚠️ Reprocesamiento falló: {factura_info['drive_file_name']}")
+                    self._record_reprocess_failure(factura_info, f"Reprocesamiento falló: {str(motivo)[:200]}")
+        
+        except Exception as e:
+            logger.error(f"Error reprocesando lote de {len(facturas)} facturas: {e}", exc_info=True)
+            
+            # Las que no tienen resultado cuentan como intento fallido
+            for factura_info in pendientes.values():
+                self._record_reprocess_failure(
+                    factura_info,
+                    f"Error en reprocesamiento: {str(e)[:200]}"
                 )
-                
-                if permanent_error:
-                    self.stats.invoices_reprocessed_permanent_error += 1
-                    self.event_repo.insert_event(
-                        drive_file_id,
-                        'reprocess_permanent_error',
-                        'ERROR',
-                        f'Error crítico y máximo de intentos alcanzado'
-                    )
+    
+    def _record_reprocess_success(self, factura_info: Dict):
+        """
+        Registrar un reprocesamiento exitoso
         
-        logger.info("="*70)
-        logger.info("REPROCESAMIENTO COMPLETADO")
-        logger.info("="*70)
-        logger.info(f"Total reprocesadas: {self.stats.invoices_reprocessed_total}")
-        logger.info(f"Exitosas: {self.stats.invoices_reprocessed_success}")
-        logger.info(f"Fallidas: {self.stats.invoices_reprocessed_failed}")
-        logger.info(f"Error permanente: {self.stats.invoices_reprocessed_permanent_error}")
+        Args:
+            factura_info: Factura de get_facturas_para_reprocesar
+        """
+        drive_file_id = factura_info['drive_file_id']
+        
+        logger.info(f"✅ Reprocesamiento exitoso: {factura_info['drive_file_name']}")
+        self.stats.invoices_reprocessed_success += 1
+        
+        # Verificar si cambió de estado
+        factura_actualizada = self.factura_repo.find_by_file_id(drive_file_id)
+        if factura_actualizada and factura_actualizada.get('estado') == 'procesado':
+            # Resetear contador (implícito al cambiar estado, pero registrar evento)
+            self.event_repo.insert_event(
+                drive_file_id,
+                'reprocess_success',
+                'INFO',
+                f'Reprocesamiento exitoso, estado cambiado a "procesado"'
+            )
+    
+    def _record_reprocess_failure(self, factura_info: Dict, reason: str):
+        """
+        Registrar un intento de reprocesamiento fallido (y el error permanente si agotó los intentos)
+        
+        Args:
+            factura_info: Factura de get_facturas_para_reprocesar
+            reason: Motivo del fallo
+        """
+        drive_file_id = factura_info['drive_file_id']
+        attempts = factura_info['reprocess_attempts']
+        
+        self.stats.invoices_reprocessed_failed += 1
+        
+        try:
+            permanent_error = self._increment_reprocess_attempts(factura_info['id'], reason)
+            
+            if permanent_error:
+                logger.warning(f"❌ Máximo de intentos alcanzado: {factura_info['drive_file_name']}")
+                self.stats.invoices_reprocessed_permanent_error += 1
+                self.event_repo.insert_event(
+                    drive_file_id,
+                    'reprocess_permanent_error',
+                    'ERROR',
+                    f'{reason} (máximo de {self.reprocess_max_attempts} intentos alcanzado)'
+                )
+            else:
+                self.event_repo.insert_event(
+                    drive_file_id,
+                    'reprocess_attempt',
+                    'WARNING',
+                    f'{reason} (intento {attempts + 1}/{self.reprocess_max_attempts})'
+                )
+        except Exception as e:
+            logger.error(
+                f"Error registrando intento de reprocesamiento de {factura_info['drive_file_name']}: {e}",
+                exc_info=True,
+                extra={'drive_file_id': drive_file_id}
+            )
     
     def get_stats(self) -> Dict:
         """Obtener estadísticas actuales"""
@@ -0,0 +1,273 @@
+"""
+Catálogo de cuarentena
+
+Indexa en BD (tabla quarantine_entries) los .meta.json que se escriben en
+QUARANTINE_PATH, para que los endpoints de facturas pendientes y estadísticas
+consulten con filtros y paginación en lugar de recorrer el disco en cada request.
+"""
+import os
+import re
+import json
+from pathlib import Path
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from src.db.database import Database
+from src.db.repositories import QuarantineRepository
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+
+# Mapeo de meses en español (incluyendo variantes)
+MESES_ES = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6,
+    'julio': 7, 'agosto': 8, 'agost': 8,  # Variante común
+    'septiembre': 9, 'sep': 9, 'sept': 9,
+    'octubre': 10, 'oct': 10,
+    'noviembre': 11, 'nov': 11,
+    'diciembre': 12, 'dec': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8
+}
+
+_MESES_REGEX = 'enero|febrero|marzo|abril|mayo|junio|julio|agosto|agost|septiembre|sep|sept|octubre|oct|noviembre|nov|diciembre|dec'
+
+# Patrones para nombres de archivos
+_FILENAME_DATE_PATTERNS = [
+    # "Enero 2024", "enero 2024"
+    re.compile(rf'({_MESES_REGEX})\s+(\d{{4}})', re.IGNORECASE),
+    # "jul 25", "julio 25", "agost 25" - con año de 2 dígitos
+    re.compile(rf'({_MESES_REGEX})\s+(\d{{2}})', re.IGNORECASE),
+    # "2024-01", "2024/01"
+    re.compile(r'(\d{4})[-/](\d{1,2})'),
+    # "Factura X Enero 2024" o "Fact X jul 25"
+    re.compile(rf'(?:factura|fact)\s+\w+\s+\d*\s*({_MESES_REGEX})\s+(\d{{2,4}})', re.IGNORECASE),
+]
+
+
+def get_quarantine_base_path() -> Path:
+    """Ruta base de cuarentena (QUARANTINE_PATH)"""
+    return Path(os.getenv('QUARANTINE_PATH', 'data/quarantine'))
+
+
+def parse_date_from_filename(filename: str, default_year: int = None) -> Optional[date]:
+    """
+    Intentar parsear fecha desde el nombre del archivo.
+    Ejemplos: "Factura REVO 1 Enero 2024" -> 2024-01-01
+              "Fact EVOLBE jul 25" -> 2025-07-01
+              "Factura REVO 2 Enero 2024.pdf" -> 2024-01-01
+    """
+    try:
+        # Normalizar nombre: remover extensión y convertir a minúsculas para búsqueda
+        filename_clean = filename.rsplit('.', 1)[0].lower()
+
+        for pattern in _FILENAME_DATE_PATTERNS:
+            match = pattern.search(filename_clean)
+            if not match:
+                continue
+
+            grupo1 = match.group(1).lower()
+            grupo2 = match.group(2)
+
+            # Mes + año (4 dígitos)
+            if grupo1 in MESES_ES and len(grupo2) == 4:
+                return date(int(grupo2), MESES_ES[grupo1], 1)
+
+            # Mes + año (2 dígitos)
+            if grupo1 in MESES_ES and len(grupo2) == 2:
+                return date(2000 + int(grupo2), MESES_ES[grupo1], 1)
+
+            # Año + mes
+            if len(grupo1) == 4 and grupo2.isdigit():
+                month = int(grupo2)
+                if 1 <= month <= 12:
+                    return date(int(grupo1), month, 1)
+
+        # Intentar con dateparser como último recurso
+        try:
+            import dateparser
+        except ImportError:
+            return None
+
+        settings = {}
+        if default_year:
+            settings['PREFER_DATES_FROM'] = 'future'
+            settings['RELATIVE_BASE'] = datetime(default_year, 1, 1)
+
+        parsed = dateparser.parse(filename, languages=['es', 'en'], settings=settings)
+        return parsed.date() if parsed else None
+    except Exception:
+        return None
+
+
+def _parse_iso_datetime(value) -> Optional[datetime]:
+    """Parsear fecha ISO8601 (ej: "2025-05-02T19:11:42.463Z") de forma tolerante"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        # Guardar en UTC naive, igual que el resto de columnas DateTime
+        if parsed.tzinfo is not None:
+            parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+        return parsed
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_decimal(value) -> Optional[Decimal]:
+    """Parsear importe (acepta coma decimal)"""
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value).replace(',', '.'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def build_catalog_entry(meta_data: dict, meta_file: Path, quarantine_base: Path = None) -> dict:
+    """
+    Construir entrada de catálogo a partir del contenido de un .meta.json
+
+    Args:
+        meta_data: Contenido del .meta.json
+        meta_file: Ruta del .meta.json
+        quarantine_base: Ruta base de cuarentena (por defecto QUARANTINE_PATH)
+
+    Returns:
+        Diccionario listo para QuarantineRepository.upsert_entry
+    """
+    quarantine_base = quarantine_base or get_quarantine_base_path()
+    file_info = meta_data.get('file_info') or {}
+    factura_data = meta_data.get('factura_data') or {}
+
+    # Nombre: metadata > file_info > derivado del nombre del .meta.json
+    stem = meta_file.name[:-len('.meta.json')] if meta_file.name.endswith('.meta.json') else meta_file.stem
+    nombre = (
+        meta_data.get('drive_file_name') or
+        file_info.get('name') or
+        (stem.split('_', 2)[-1] if '_' in stem else stem)
+    )
+
+    # Razón: priorizar 'reason', luego 'error', luego 'decision'
+    razon = (
+        meta_data.get('reason') or
+        meta_data.get('error') or
+        (f"Decisión: {meta_data.get('decision')}" if meta_data.get('decision') else None)
+    )
+
+    quarantined_at = _parse_iso_datetime(meta_data.get('quarantined_at')) or datetime.utcnow()
+    drive_modified_time = _parse_iso_datetime(file_info.get('modifiedTime'))
+
+    fecha_emision_dt = _parse_iso_datetime(
+        meta_data.get('fecha_emision') or factura_data.get('fecha_emision')
+    )
+    fecha_emision = fecha_emision_dt.date() if fecha_emision_dt else None
+
+    # Fecha efectiva: fecha_emision > nombre de archivo > modifiedTime > quarantined_at
+    fecha_referencia = (
+        fecha_emision or
+        parse_date_from_filename(nombre, quarantined_at.year) or
+        (drive_modified_time.date() if drive_modified_time else None) or
+        quarantined_at.date()
+    )
+
+    try:
+        meta_file_rel = str(meta_file.relative_to(quarantine_base))
+    except ValueError:
+        meta_file_rel = str(meta_file)
+
+    return {
+        'meta_file': meta_file_rel,
+        'drive_file_id': meta_data.get('drive_file_id') or file_info.get('id'),
+        'drive_file_name': nombre,
+        'drive_folder_name': meta_data.get('drive_folder_name') or file_info.get('folder_name'),
+        'decision': meta_data.get('decision'),
+        'reason': razon,
+        'proveedor_text': factura_data.get('proveedor_text'),
+        'importe_total': _parse_decimal(factura_data.get('importe_total')),
+        'impuestos_total': _parse_decimal(factura_data.get('impuestos_total')),
+        'fecha_emision': fecha_emision,
+        'fecha_referencia': fecha_referencia,
+        'drive_modified_time': drive_modified_time,
+        'quarantined_at': quarantined_at
+    }
+
+
+def register_quarantine_file(
+    db: Optional[Database],
+    meta_data: dict,
+    meta_file: Path,
+    quarantine_base: Path = None
+) -> Optional[int]:
+    """
+    Registrar un archivo en el catálogo de cuarentena.
+    Un fallo aquí no debe interrumpir la cuarentena: se registra y se continúa
+    (rebuild_catalog puede reconciliar después).
+
+    Args:
+        db: Instancia de Database (si es None no se registra)
+        meta_data: Contenido del .meta.json
+        meta_file: Ruta del .meta.json
+        quarantine_base: Ruta base de cuarentena
+
+    Returns:
+        ID de la entrada o None si no se registró
+    """
+    if db is None:
+        return None
+
+    try:
+        entry = build_catalog_entry(meta_data, meta_file, quarantine_base)
+        return QuarantineRepository(db).upsert_entry(entry)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar {meta_file} en catálogo de cuarentena: {e}")
+        return None
+
+
+def rebuild_catalog(db: Database, quarantine_base: Path = None) -> dict:
+    """
+    Reconstruir el catálogo desde disco (backfill y reconciliación).
+    Recorre QUARANTINE_PATH una sola vez; los endpoints ya no lo hacen.
+
+    Args:
+        db: Instancia de Database
+        quarantine_base: Ruta base de cuarentena
+
+    Returns:
+        Diccionario con estadísticas (registrados, eliminados, errores)
+    """
+    quarantine_base = quarantine_base or get_quarantine_base_path()
+    repo = QuarantineRepository(db)
+    stats = {'registrados': 0, 'eliminados': 0, 'errores': 0}
+
+    vistos = set()
+    if quarantine_base.exists():
+        for meta_file in quarantine_base.rglob('*.meta.json'):
+            # Marcar como visto aunque falle el parseo (el archivo sigue en disco)
+            vistos.add(str(meta_file.relative_to(quarantine_base)))
+            try:
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    meta_data = json.load(f)
+                repo.upsert_entry(build_catalog_entry(meta_data, meta_file, quarantine_base))
+                stats['registrados'] += 1
+            except Exception as e:
+                stats['errores'] += 1
+                logger.warning(f"Error catalogando {meta_file}: {e}")
+    else:
+        logger.warning(f"La ruta de cuarentena no existe: {quarantine_base}")
+
+    # Eliminar entradas cuyo .meta.json ya no existe
+    huerfanas = [m for m in repo.get_all_meta_files() if m not in vistos]
+    stats['eliminados'] = repo.delete_by_meta_files(huerfanas)
+
+    logger.info(
+        f"Catálogo de cuarentena reconstruido: {stats['registrados']} registrados, "
+        f"{stats['eliminados']} eliminados, {stats['errores']} errores"
+    )
+    return stats
@@ -0,0 +1,107 @@
+"""
+Tiempos por etapa del procesamiento de cada factura
+
+process_batch activa un StageTimer por archivo; el resto del código (extractor,
+detector de duplicados...) mide sus etapas con stage('nombre') sin recibir el
+timer como parámetro (se propaga con un ContextVar). Fuera de process_batch,
+stage() no hace nada.
+
+Etapas: validate, throttle, render, encode, api, fallback, dto,
+duplicate_lookup, upsert, quarantine_move
+"""
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional
+
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar('stage_timer', default=None)
+
+
+class StageTimer:
+    """Acumula milisegundos por etapa para un archivo"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        """Sumar duración a una etapa (una etapa puede repetirse, ej. reintentos)"""
+        self._stages[name] = self._stages.get(name, 0.0) + seconds * 1000
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Medir un bloque como etapa"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Tiempos en ms por etapa más 'total' (desde la creación del timer)"""
+        timings = {name: round(ms, 1) for name, ms in self._stages.items()}
+        timings['total'] = round((time.perf_counter() - self._start) * 1000, 1)
+        return timings
+
+
+def activate_stage_timer(timer: StageTimer) -> Token:
+    """Hacer que stage() registre en este timer (devuelve token para desactivar)"""
+    return _current_timer.set(timer)
+
+
+def deactivate_stage_timer(token: Token):
+    """Restaurar el timer anterior"""
+    _current_timer.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Medir un bloque en el timer activo (no hace nada si no hay timer)
+
+    Usage:
+        with stage('upsert'):
+            repo.upsert_factura(dto)
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano"""
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_stage_timings(per_file: List[Dict[str, float]]) -> Dict[str, dict]:
+    """
+    Agregar tiempos de varios archivos en percentiles por etapa
+
+    Args:
+        per_file: Lista de diccionarios etapa -> ms (StageTimer.as_dict)
+
+    Returns:
+        Diccionario etapa -> {count, p50, p95, p99, max, sum} en ms
+    """
+    by_stage: Dict[str, List[float]] = {}
+    for timings in per_file:
+        for name, ms in timings.items():
+            by_stage.setdefault(name, []).append(ms)
+
+    summary = {}
+    for name, values in sorted(by_stage.items()):
+        values.sort()
+        summary[name] = {
+            'count': len(values),
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+            'p99': _percentile(values, 99),
+            'max': values[-1],
+            'sum': round(sum(values), 1),
+        }
+    return summary
@@ -0,0 +1,133 @@
+"""
+Perfilado bajo demanda de ejecuciones del pipeline y requests de la API
+
+Se activa sin redesplegar:
+- Pipeline: PROFILE_RUN=true o --profile en scripts/run_ingest_incremental.py y src/main.py
+- API: cabecera X-Profile: 1 o ?profile=1, solo para sesiones en ADMIN_EMAILS
+
+Con pyinstrument instalado se usa su profiler por muestreo y se guardan un
+HTML navegable y un JSON de speedscope (flamegraph). Sin pyinstrument se usa
+cProfile y se guardan el .pstats y un resumen de texto. Los artefactos van a
+PROFILES_PATH (data/profiles/) con el run id en el nombre.
+"""
+import cProfile
+import importlib.util
+import io
+import os
+import pstats
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List
+
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__)
+
+# pyinstrument es opcional: sin él se usa cProfile (determinista, más overhead).
+# Se importa al perfilar, no al arrancar la API o los scripts
+PYINSTRUMENT_AVAILABLE = importlib.util.find_spec('pyinstrument') is not None
+
+PROFILES_PATH = os.getenv('PROFILES_PATH', 'data/profiles')
+# Intervalo de muestreo de pyinstrument (segundos)
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_SECONDS', '0.001'))
+
+
+def profiling_requested_by_env() -> bool:
+    """PROFILE_RUN=true activa el perfilado de la ejecución del pipeline"""
+    return os.getenv('PROFILE_RUN', 'false').lower() == 'true'
+
+
+def new_run_id(label: str) -> str:
+    """
+    Generar identificador de ejecución para nombrar los artefactos
+
+    Args:
+        label: Origen de la ejecución (ej. 'ingest_incremental', 'api')
+
+    Returns:
+        Identificador tipo ingest_incremental_20261019T103000_1a2b3c4d
+    """
+    return f"{label}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class ProfileSession:
+    """Perfilado de un bloque de código; al terminar, `artifacts` contiene las rutas generadas"""
+
+    def __init__(self, run_id: str, async_mode: bool = False):
+        self.run_id = run_id
+        self.async_mode = async_mode
+        self.artifacts: List[str] = []
+        self._profiler = None
+
+    def start(self):
+        if PYINSTRUMENT_AVAILABLE:
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler(
+                interval=PROFILE_INTERVAL,
+                async_mode='enabled' if self.async_mode else 'disabled'
+            )
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        """Detener y escribir artefactos (los errores de escritura no se propagan)"""
+        if self._profiler is None:
+            return
+        if PYINSTRUMENT_AVAILABLE:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+        try:
+            output_dir = Path(PROFILES_PATH)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            base = output_dir / self.run_id
+            if PYINSTRUMENT_AVAILABLE:
+                from pyinstrument.renderers import SpeedscopeRenderer
+
+                self._write(base.with_suffix('.html'), self._profiler.output_html())
+                self._write(base.with_suffix('.speedscope.json'), self._profiler.output(renderer=SpeedscopeRenderer()))
+            else:
+                self._profiler.dump_stats(str(base.with_suffix('.pstats')))
+                self.artifacts.append(str(base.with_suffix('.pstats')))
+                summary = io.StringIO()
+                pstats.Stats(self._profiler, stream=summary).sort_stats('cumulative').print_stats(60)
+                self._write(base.with_suffix('.txt'), summary.getvalue())
+            logger.info(f"Perfil guardado: {', '.join(self.artifacts)}")
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el perfil {self.run_id}: {e}")
+        finally:
+            self._profiler = None
+
+    def _write(self, path: Path, content: str):
+        path.write_text(content, encoding='utf-8')
+        self.artifacts.append(str(path))
+
+
+@contextmanager
+def profile_run(run_id: str, enabled: bool = True, async_mode: bool = False) -> Iterator[ProfileSession]:
+    """
+    Perfilar el bloque si enabled es True
+
+    Usage:
+        with profile_run(new_run_id('ingest_incremental'), enabled=args.profile):
+            pipeline.run()
+
+    Args:
+        run_id: Identificador de la ejecución (nombre de los artefactos)
+        enabled: Si es False, el bloque se ejecuta sin perfilar
+        async_mode: Atribuir los awaits a la corrutina actual (requests de la API)
+    """
+    session = ProfileSession(run_id, async_mode=async_mode)
+    if enabled:
+        session.start()
+    try:
+        yield session
+    finally:
+        if enabled:
+            session.stop()
@@ -6,7 +6,7 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from abc import ABC, abstractmethod
 
 from src.logging_conf import get_logger
@@ -26,12 +26,23 @@ class StateStore(ABC):
     def set_last_sync_time(self, timestamp: datetime):
         """Establecer última fecha de sincronización"""
         pass
+    
+    @abstractmethod
+    def get_list_continuation(self) -> Optional[Dict]:
+        """Obtener continuación del listado de Drive cortado por MAX_PAGES_PER_RUN"""
+        pass
+    
+    @abstractmethod
+    def set_list_continuation(self, continuation: Optional[Dict]):
+        """Guardar continuación del listado de Drive (None = listado completado)"""
+        pass
 
 
 class DBStateStore(StateStore):
     """Almacenamiento de estado en base de datos"""
     
     STATE_KEY = 'drive_last_sync_time'
+    CONTINUATION_KEY = 'drive_list_continuation'
     
     def __init__(self, db):
         """
@@ -75,6 +86,33 @@ class DBStateStore(StateStore):
         value = timestamp.isoformat()
         self.repo.set_value(self.STATE_KEY, value)
         logger.info(f"Estado de sincronización actualizado: {value}")
+    
+    def get_list_continuation(self) -> Optional[Dict]:
+        """
+        Obtener continuación del listado de Drive desde DB
+        
+        Returns:
+            Diccionario con page_token, query_fingerprint, since y pages_fetched, o None
+        """
+        value = self.repo.get_value(self.CONTINUATION_KEY)
+        
+        if not value:
+            return None
+        
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parseando continuación de listado: {e}")
+            return None
+    
+    def set_list_continuation(self, continuation: Optional[Dict]):
+        """
+        Guardar continuación del listado de Drive en DB
+        
+        Args:
+            continuation: Continuación a guardar (None la borra)
+        """
+        self.repo.set_value(self.CONTINUATION_KEY, json.dumps(continuation) if continuation else '')
 
 
 class FileStateStore(StateStore):
@@ -103,8 +141,7 @@ class FileStateStore(StateStore):
             return None
         
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._read()
             
             value = data.get('last_sync_time')
             if not value:
@@ -126,16 +163,54 @@ class FileStateStore(StateStore):
         Args:
             timestamp: Timestamp a guardar
         """
-        data = {
-            'last_sync_time': timestamp.isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
-        }
+        self._update(last_sync_time=timestamp.isoformat())
+        logger.info(f"Estado de sincronización actualizado: {timestamp.isoformat()}")
+    
+    def get_list_continuation(self) -> Optional[Dict]:
+        """
+        Obtener continuación del listado de Drive desde archivo
+        
+        Returns:
+            Diccionario con page_token, query_fingerprint, since y pages_fetched, o None
+        """
+        if not self.file_path.exists():
+            return None
+        
+        try:
+            return self._read().get('list_continuation')
+        except json.JSONDecodeError as e:
+            logger.error(f"Error leyendo archivo de estado: {e}")
+            return None
+    
+    def set_list_continuation(self, continuation: Optional[Dict]):
+        """
+        Guardar continuación del listado de Drive en archivo
+        
+        Args:
+            continuation: Continuación a guardar (None la borra)
+        """
+        self._update(list_continuation=continuation)
+    
+    def _read(self) -> Dict:
+        """Contenido actual del archivo de estado"""
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _update(self, **values):
+        """Actualizar claves del archivo de estado conservando el resto"""
+        data = {}
+        if self.file_path.exists():
+            try:
+                data = self._read()
+            except json.JSONDecodeError as e:
+                logger.warning(f"Archivo de estado corrupto, se reescribe: {e}")
+        
+        data.update(values)
+        data['updated_at'] = datetime.utcnow().isoformat()
         
         try:
             with open(self.file_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Estado de sincronización actualizado: {timestamp.isoformat()}")
         
         except Exception as e:
             logger.error(f"Error escribiendo archivo de estado: {e}")
@@ -1,15 +1,23 @@
 """
 Función para buscar o crear proveedores maestros automáticamente
-Sistema multicapa: NIF → Fuzzy → Nuevo
+Sistema multicapa: NIF → Alias exacto (normalizado) → Fuzzy → Nuevo
 """
-from typing import Dict, Optional
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, exists, delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from src.db.models import ProveedorMaestro
+from src.db.models import ProveedorMaestro, ProveedorAlias
 from src.utils.proveedor_normalizer_v2 import (
     normalizar_nombre_proveedor,
     calcular_similitud
 )
+from src.logging_conf import get_logger
+
+logger = get_logger(__name__, component="backend")
 
 try:
     from rapidfuzz import fuzz
@@ -17,6 +25,127 @@ try:
 except ImportError:
     RAPIDFUZZ_AVAILABLE = False
 
+# Candidatos fuzzy en memoria: en un proceso de larga duración (ingest daemon) no se
+# vuelven a leer todos los alias por cada factura. Se recargan de BD cada
+# PROVEEDOR_CANDIDATES_TTL_SEC (0 = sin caché) y los alias nuevos se añaden al registrarlos.
+_CANDIDATOS_TTL_SEC = float(os.getenv('PROVEEDOR_CANDIDATES_TTL_SEC', '300'))
+_candidatos_cache: Dict = {'items': None, 'loaded_at': 0.0}
+_candidatos_lock = threading.Lock()
+
+
+def _normalizar(nombre_raw: str) -> str:
+    """Forma normalizada usada como clave de proveedor_alias"""
+    normalizado = normalizar_nombre_proveedor(nombre_raw)
+    # Si después de normalizar no queda nada, usar nombre original
+    return normalizado or nombre_raw.upper().strip()
+
+
+def registrar_alias(
+    session: Session,
+    proveedor_maestro_id: int,
+    alias: str,
+    alias_normalizado: Optional[str] = None
+) -> bool:
+    """
+    Registrar un alias de proveedor maestro (no hace nada si la forma normalizada ya existe)
+    
+    Args:
+        session: Sesión de SQLAlchemy
+        proveedor_maestro_id: ID del proveedor maestro
+        alias: Nombre tal como viene en la factura
+        alias_normalizado: Forma normalizada (se calcula si no se pasa)
+    
+    Returns:
+        True si se insertó un alias nuevo
+    """
+    if not alias or not alias.strip():
+        return False
+    
+    alias_normalizado = alias_normalizado or _normalizar(alias)
+    stmt = insert(ProveedorAlias).values(
+        proveedor_maestro_id=proveedor_maestro_id,
+        alias=alias.strip(),
+        alias_normalizado=alias_normalizado,
+        tokens=alias_normalizado.split()
+    ).on_conflict_do_nothing(index_elements=['alias_normalizado'])
+    
+    insertado = session.execute(stmt).rowcount > 0
+    if insertado:
+        with _candidatos_lock:
+            if _candidatos_cache['items'] is not None:
+                _candidatos_cache['items'].append((proveedor_maestro_id, alias_normalizado))
+    return insertado
+
+
+def registrar_aliases_de_maestro(session: Session, proveedor: ProveedorMaestro) -> int:
+    """
+    Registrar nombre canónico y nombres_alternativos de un proveedor maestro como alias
+    (backfill de proveedores anteriores a la tabla proveedor_alias)
+    
+    Returns:
+        Número de alias nuevos
+    """
+    nombres = [proveedor.nombre_canonico] + [
+        alt for alt in (proveedor.nombres_alternativos or []) if isinstance(alt, str)
+    ]
+    return sum(1 for nombre in nombres if registrar_alias(session, proveedor.id, nombre))
+
+
+def _candidatos_fuzzy(session: Session) -> List[Tuple[int, str]]:
+    """
+    Alias normalizados de proveedores activos: (proveedor_maestro_id, alias_normalizado)
+    
+    Los proveedores que aún no tienen alias (creados antes de proveedor_alias y sin
+    backfill) se registran aquí, así no se pierden como candidatos.
+    """
+    sin_alias = session.execute(
+        select(ProveedorMaestro).where(
+            ProveedorMaestro.activo == True,
+            ~exists().where(ProveedorAlias.proveedor_maestro_id == ProveedorMaestro.id)
+        )
+    ).scalars().all()
+    for proveedor in sin_alias:
+        registrar_aliases_de_maestro(session, proveedor)
+    
+    return session.execute(
+        select(ProveedorAlias.proveedor_maestro_id, ProveedorAlias.alias_normalizado).join(
+            ProveedorMaestro, ProveedorMaestro.id == ProveedorAlias.proveedor_maestro_id
+        ).where(ProveedorMaestro.activo == True)
+    ).all()
+
+
+def _candidatos_cacheados(session: Session) -> List[Tuple[int, str]]:
+    """Candidatos fuzzy desde la caché en memoria (recargada al expirar el TTL)"""
+    if _CANDIDATOS_TTL_SEC <= 0:
+        return _candidatos_fuzzy(session)
+    
+    with _candidatos_lock:
+        expirada = time.monotonic() - _candidatos_cache['loaded_at'] > _CANDIDATOS_TTL_SEC
+        if _candidatos_cache['items'] is None or expirada:
+            _candidatos_cache['items'] = [tuple(row) for row in _candidatos_fuzzy(session)]
+            _candidatos_cache['loaded_at'] = time.monotonic()
+        return list(_candidatos_cache['items'])
+
+
+def invalidar_candidatos():
+    """Descartar la caché de candidatos fuzzy (p. ej. tras fusionar o desactivar proveedores)"""
+    with _candidatos_lock:
+        _candidatos_cache['items'] = None
+
+
+def _mejor_candidato(nombre_normalizado: str, candidatos: List[Tuple[int, str]]) -> Tuple[Optional[int], float]:
+    """Proveedor con mayor similitud entre los candidatos: (proveedor_maestro_id, score)"""
+    mejor_id = None
+    mejor_score = 0.0
+    
+    for proveedor_id, alias_normalizado in candidatos:
+        score = calcular_similitud(nombre_normalizado, alias_normalizado)
+        if score > mejor_score:
+            mejor_score = score
+            mejor_id = proveedor_id
+    
+    return mejor_id, mejor_score
+
 
 def normalizar_y_buscar_proveedor(
     nombre_raw: str,
@@ -28,8 +157,9 @@ def normalizar_y_buscar_proveedor(
     
     Sistema de matching (en orden de prioridad):
     1. NIF/CIF (si está disponible) - 100% confianza
-    2. Fuzzy matching con nombres normalizados - score >= 92
-    3. Crear nuevo proveedor maestro
+    2. Alias con la misma forma normalizada (búsqueda indexada) - 100% confianza
+    3. Fuzzy matching contra los alias normalizados - score >= 92
+    4. Crear nuevo proveedor maestro
     
     Args:
         nombre_raw: Nombre original del proveedor (como viene en la factura)
@@ -40,13 +170,15 @@ def normalizar_y_buscar_proveedor(
         {
             'proveedor_maestro_id': int,
             'nombre_canonico': str,
-            'metodo': 'nif' | 'fuzzy' | 'nuevo',
+            'metodo': 'nif' | 'alias' | 'fuzzy' | 'nuevo',
             'confianza': float (0-100)
         }
     """
     if not session:
         raise ValueError("Session es requerida")
     
+    nombre_normalizado = _normalizar(nombre_raw)
+    
     # CAPA 1: Búsqueda por NIF (prioridad máxima)
     if nif and nif.strip():
         nif_clean = nif.strip().upper()
@@ -56,10 +188,7 @@ def normalizar_y_buscar_proveedor(
         ).first()
         
         if proveedor:
-            # Actualizar nombres alternativos si es nuevo
-            if nombre_raw not in proveedor.nombres_alternativos:
-                proveedor.nombres_alternativos.append(nombre_raw)
-                session.flush()
+            registrar_alias(session, proveedor.id, nombre_raw, nombre_normalizado)
             
             return {
                 'proveedor_maestro_id': proveedor.id,
@@ -68,50 +197,54 @@ def normalizar_y_buscar_proveedor(
                 'confianza': 100.0
             }
     
-    # CAPA 2: Normalizar nombre
-    nombre_normalizado = normalizar_nombre_proveedor(nombre_raw)
+    # CAPA 2: Alias exacto por forma normalizada (índice único)
+    fila = session.execute(
+        select(ProveedorAlias.id, ProveedorMaestro).join(
+            ProveedorMaestro, ProveedorMaestro.id == ProveedorAlias.proveedor_maestro_id
+        ).where(
+            ProveedorAlias.alias_normalizado == nombre_normalizado
+        )
+    ).first()
+    
+    if fila and fila[1].activo:
+        proveedor = fila[1]
+        return {
+            'proveedor_maestro_id': proveedor.id,
+            'nombre_canonico': proveedor.nombre_canonico,
+            'metodo': 'alias',
+            'confianza': 100.0
+        }
     
-    if not nombre_normalizado:
-        # Si después de normalizar no queda nada, usar nombre original
-        nombre_normalizado = nombre_raw.upper().strip()
+    if fila:
+        # El alias es de un proveedor desactivado: liberarlo y seguir buscando entre los
+        # activos. Si se conservara, el proveedor que se cree o encuentre abajo no podría
+        # registrarlo (alias_normalizado es único) y cada factura crearía otro proveedor
+        logger.info(
+            f"Alias '{nombre_normalizado}' liberado del proveedor inactivo "
+            f"#{fila[1].id} ({fila[1].nombre_canonico})"
+        )
+        session.execute(delete(ProveedorAlias).where(ProveedorAlias.id == fila[0]))
     
-    # CAPA 3: Buscar en proveedores maestros existentes (fuzzy matching)
-    todos_proveedores = session.query(ProveedorMaestro).filter(
-        ProveedorMaestro.activo == True
-    ).all()
+    # CAPA 3: Fuzzy matching contra alias ya normalizados (sin renormalizar en cada llamada)
+    UMBRAL_FUZZY = 92.0
     
+    mejor_id, mejor_score = _mejor_candidato(nombre_normalizado, _candidatos_cacheados(session))
     mejor_match = None
-    mejor_score = 0.0
-    
-    for prov in todos_proveedores:
-        # Comparar con nombre canónico
-        nombre_canonico_norm = normalizar_nombre_proveedor(prov.nombre_canonico)
-        score1 = calcular_similitud(nombre_normalizado, nombre_canonico_norm)
-        
-        # Comparar con nombres alternativos
-        scores_alt = []
-        for alt in prov.nombres_alternativos:
-            alt_norm = normalizar_nombre_proveedor(alt)
-            score_alt = calcular_similitud(nombre_normalizado, alt_norm)
-            scores_alt.append(score_alt)
-        
-        score2 = max(scores_alt) if scores_alt else 0.0
-        
-        # Usar el mejor score
-        score_final = max(score1, score2)
-        
-        if score_final > mejor_score:
-            mejor_score = score_final
-            mejor_match = prov
+    if mejor_id is not None and mejor_score >= UMBRAL_FUZZY:
+        mejor_match = session.get(ProveedorMaestro, mejor_id)
+        if mejor_match is None or not mejor_match.activo:
+            # Caché desfasada (alias de una transacción revertida o proveedor desactivado)
+            invalidar_candidatos()
+            mejor_id, mejor_score = _mejor_candidato(nombre_normalizado, _candidatos_cacheados(session))
+            mejor_match = (
+                session.get(ProveedorMaestro, mejor_id)
+                if mejor_id is not None and mejor_score >= UMBRAL_FUZZY else None
+            )
     
     # CAPA 4: Decisión
-    UMBRAL_FUZZY = 92.0
-    
-    if mejor_match and mejor_score >= UMBRAL_FUZZY:
-        # Match encontrado - actualizar nombres alternativos
-        if nombre_raw not in mejor_match.nombres_alternativos:
-            mejor_match.nombres_alternativos.append(nombre_raw)
-            session.flush()
+    if mejor_match is not None:
+        # Registrar la variante: la próxima vez será un acierto exacto (capa 2)
+        registrar_alias(session, mejor_match.id, nombre_raw, nombre_normalizado)
         
         return {
             'proveedor_maestro_id': mejor_match.id,
@@ -125,12 +258,20 @@ def normalizar_y_buscar_proveedor(
             nombre_canonico=nombre_raw,  # Usar nombre original como canónico inicial
             nif_cif=nif.strip().upper() if nif and nif.strip() else None,
             nombres_alternativos=[nombre_raw],
+            # Los triggers de facturas suman la factura al insertarla
             total_facturas=0,
             total_importe=0.00,
             activo=True
         )
         session.add(nuevo_proveedor)
         session.flush()
+        if not registrar_alias(session, nuevo_proveedor.id, nombre_raw, nombre_normalizado):
+            # Otro proceso registró el mismo alias a la vez: las facturas siguientes irán a
+            # ese proveedor y este quedará como duplicado
+            logger.warning(
+                f"Alias '{nombre_normalizado}' ya registrado por otro proveedor: "
+                f"#{nuevo_proveedor.id} ({nombre_raw}) puede ser un duplicado"
+            )
         
         return {
             'proveedor_maestro_id': nuevo_proveedor.id,
@@ -138,4 +279,3 @@ def normalizar_y_buscar_proveedor(
             'metodo': 'nuevo',
             'confianza': 0.0
         }
-